@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the cost of measuring and truncating one frame worth of strings with
+kitchen's textual_width_chop() versus tuir.display, with and without the
+Terminal.clean() cache.
+
+Usage: python scripts/benchmark_display.py [n_frames]
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import sys
+import timeit
+from collections import OrderedDict
+
+from kitchen.text.display import textual_width_chop as kitchen_chop
+
+from tuir.display import textual_width_chop
+
+
+# Roughly what a subreddit page on a 200x60 terminal draws on every refresh
+FRAME = [
+    'Python 3.7 released with data classes and postponed annotations',
+    '2345 pts 5 hours ago /r/python u/someone',
+    '231 comments self.python',
+    'Übersicht der neuen Funktionen in café ñunru',
+    '日本語のタイトルが長い場合はどうなりますか',
+    'https://www.reddit.com/r/Python/comments/abcdef/some_title/',
+] * 10
+N_COLS = 200
+
+
+def kitchen_frame():
+    for text in FRAME:
+        kitchen_chop(text, N_COLS).encode('utf-8')
+
+
+def display_frame():
+    for text in FRAME:
+        textual_width_chop(text, N_COLS).encode('utf-8')
+
+
+_cache = OrderedDict()
+
+
+def cached_frame():
+    for text in FRAME:
+        key = (text, N_COLS, False)
+        try:
+            value = _cache.pop(key)
+        except KeyError:
+            value = textual_width_chop(text, N_COLS).encode('utf-8')
+        _cache[key] = value
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for name, func in [('kitchen', kitchen_frame),
+                       ('tuir.display', display_frame),
+                       ('tuir.display + cache', cached_frame)]:
+        seconds = min(timeit.repeat(func, number=n_frames, repeat=3))
+        print('{0:<22} {1:8.1f} us/frame'.format(
+            name, seconds / n_frames * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how much memory a large comment thread takes up, from the praw
+objects that are built out of the API response to the rows that are drawn on
+the screen.
+
+The thread is generated from a template comment that has the same fields as
+the ones returned by reddit's API. The comments are decoded into praw objects
+with the default praw settings and again with the settings used by tuir, and
+every row is then stripped into a dict like it would be if the user scrolled
+through the whole thread.
+
+Usage: python scripts/benchmark_memory.py [n_comments]
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import gc
+import sys
+import json
+import resource
+import subprocess
+from collections import OrderedDict
+
+from tuir.content import SubmissionContent, UNUSED_FIELDS
+from tuir.packages import praw
+
+AWARD = {
+    'giver_coin_reward': None, 'subreddit_id': None, 'is_new': False,
+    'days_of_drip_extension': 0, 'coin_price': 100,
+    'id': 'gid_1', 'penny_donate': None, 'award_sub_type': 'GLOBAL',
+    'coin_reward': 0, 'icon_url': 'https://www.redditstatic.com/gold/awards'
+                                  '/icon/silver_512.png',
+    'days_of_premium': 0, 'tiers_by_required_awardings': None,
+    'resized_icons': [
+        {'url': 'https://www.redditstatic.com/gold/awards/icon/'
+                'silver_{0}.png'.format(size), 'width': size, 'height': size}
+        for size in (16, 32, 48, 64, 128)],
+    'icon_width': 512, 'static_icon_width': 512, 'start_date': None,
+    'is_enabled': True, 'awardings_required_to_grant_benefits': None,
+    'description': "Shows the Silver Award... and that's it.",
+    'end_date': None, 'subreddit_coin_reward': 0, 'count': 1,
+    'static_icon_height': 512, 'name': 'Silver', 'icon_format': None,
+    'icon_height': 512, 'penny_price': None, 'award_type': 'global',
+    'static_icon_url': 'https://i.redd.it/award_images/t5_q0gj4/'
+                       'am40b8b08l581_Silver.png'}
+
+COMMENT = {
+    'total_awards_received': 1, 'approved_at_utc': None, 'edited': False,
+    'mod_reason_by': None, 'banned_by': None, 'author_flair_type': 'text',
+    'removal_reason': None, 'link_id': 't3_abcdef', 'author_flair_template_id':
+    None, 'likes': None, 'replies': '', 'user_reports': [], 'saved': False,
+    'id': None, 'banned_at_utc': None, 'mod_reason_title': None, 'gilded': 0,
+    'archived': False, 'no_follow': True, 'author': None,
+    'can_mod_post': False, 'send_replies': True, 'parent_id': 't3_abcdef',
+    'score': 12, 'author_fullname': 't2_abcde', 'report_reasons': None,
+    'approved_by': None, 'all_awardings': [AWARD], 'subreddit_id':
+    't5_2qh0y', 'body': 'This is a comment body that is about as long as '
+                        'a typical comment on reddit, give or take a few '
+                        'words here and there.',
+    'body_html': '&lt;div class="md"&gt;&lt;p&gt;This is a comment body that '
+                 'is about as long as a typical comment on reddit, give or '
+                 'take a few words here and there.&lt;/p&gt;&lt;/div&gt;',
+    'awarders': [], 'downs': 0, 'author_flair_css_class': None,
+    'name': None, 'is_submitter': False, 'collapsed': False,
+    'author_flair_richtext': [], 'author_patreon_flair': False,
+    'collapsed_reason': None, 'associated_award': None, 'stickied': False,
+    'author_premium': False, 'subreddit_type': 'public', 'can_gild': True,
+    'gildings': {'gid_1': 1}, 'unrepliable_reason': None,
+    'author_flair_text_color': None, 'score_hidden': False,
+    'permalink': '/r/python/comments/abcdef/title/', 'num_reports': None,
+    'locked': False, 'created': 1600000000.0,
+    'subreddit': 'Python', 'author_flair_text': None, 'treatment_tags': [],
+    'created_utc': 1600000000.0, 'subreddit_name_prefixed': 'r/Python',
+    'controversiality': 0, 'depth': 0, 'author_flair_background_color': None,
+    'collapsed_because_crowd_control': None, 'mod_reports': [],
+    'mod_note': None, 'distinguished': None, 'ups': 12}
+
+
+class SUBMISSION(object):
+    author = None
+
+
+def build_response(n_comments):
+    children = []
+    for i in range(n_comments):
+        data = dict(COMMENT, id='c{0}'.format(i), name='t1_c{0}'.format(i),
+                    author='user{0}'.format(i % 500))
+        children.append({'kind': 't1', 'data': data})
+    return json.dumps({'kind': 'Listing', 'data': {'children': children}})
+
+
+def rss():
+    """
+    Return the resident set size of the process in bytes.
+    """
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except IOError:
+        # Peak usage in kilobytes (bytes on macOS), the best that's available
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def measure(text, n_comments, **kwargs):
+    reddit = praw.Reddit(user_agent='tuir memory benchmark',
+                         disable_update_check=True, **kwargs)
+    reddit._request_url = 'https://oauth.reddit.com/comments/abcdef'
+
+    gc.collect()
+    start = rss()
+    listing = json.loads(text, object_hook=reddit._json_reddit_objecter)
+    comments = listing['data']['children']
+    objects = rss()
+    for comment in comments:
+        # Normally filled in when the submission flattens its comment tree
+        comment.nested_level = 0
+        comment._submission = SUBMISSION
+    rows = [SubmissionContent.strip_praw_comment(c) for c in comments]
+    gc.collect()
+    end = rss()
+
+    del listing, comments, rows
+    per_1k = 1000.0 / n_comments / 1024 / 1024
+    return (objects - start) * per_1k, (end - objects) * per_1k
+
+
+CONFIGS = OrderedDict([
+    ('praw defaults', {}),
+    ('tuir', {'discard_fields': UNUSED_FIELDS}),
+])
+
+
+def main():
+    n_comments = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    if len(sys.argv) > 2:
+        # Each configuration is measured in a fresh process, so that memory
+        # freed by one run can't be reused by the next
+        text = build_response(n_comments)
+        objects, rows = measure(text, n_comments, **CONFIGS[sys.argv[2]])
+        print('{0:<14} {1:6.2f} MB objects + {2:6.2f} MB rows '
+              'per 1k comments'.format(sys.argv[2], objects, rows))
+        return
+
+    for name in CONFIGS:
+        subprocess.check_call(
+            [sys.executable, __file__, str(n_comments), name])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Time the pages that users spend the most time waiting on, using the reddit
+traffic recorded in tests/cassettes and a fake curses screen, so the numbers
+are repeatable and don't depend on the network or the terminal.
+
+Each scenario is repeated several times and the results are written as JSON,
+which can be saved for one commit and passed to --compare on another.
+
+Usage:
+    python scripts/benchmark_pages.py [--repeat N] [--output FILE]
+                                      [--compare FILE] [scenario ...]
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import subprocess
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from vcr import VCR
+from vcr.errors import CannotOverwriteExistingCassetteException
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from tuir import session as page_session
+from tuir.__version__ import __version__
+from tuir.config import Config
+from tuir.content import Content, RequestHeaderRateLimiter, UNUSED_FIELDS
+from tuir.packages import praw
+from tuir.oauth import OAuthHelper
+from tuir.terminal import Terminal
+from tuir.subreddit_page import SubredditPage
+from tuir.submission_page import SubmissionPage
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+CASSETTE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'cassettes')
+
+
+class FakeWindow(object):
+    """
+    A curses window that keeps track of its size and ignores everything that
+    is drawn on it. This is much cheaper than the MagicMock used by the unit
+    tests, which records every call and would end up dominating the timings.
+    """
+
+    def __init__(self, nlines, ncols):
+        self.nlines = nlines
+        self.ncols = ncols
+
+    def getmaxyx(self):
+        return self.nlines, self.ncols
+
+    def getbegyx(self):
+        return 0, 0
+
+    def getyx(self):
+        return 0, 0
+
+    def derwin(self, *args):
+        if len(args) == 0:
+            nlines, ncols = self.nlines, self.ncols
+        elif len(args) == 2:
+            nlines, ncols = self.nlines - args[0], self.ncols - args[1]
+        else:
+            nlines = min(self.nlines - args[2], args[0])
+            ncols = min(self.ncols - args[3], args[1])
+        return FakeWindow(nlines, ncols)
+
+    def getch(self):
+        return -1
+
+    def _noop(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return self._noop
+
+
+def initialize_vcr():
+
+    def auth_matcher(r1, r2):
+        return (r1.headers.get('authorization') ==
+                r2.headers.get('authorization'))
+
+    def uri_with_query_matcher(r1, r2):
+        p1, p2 = urlparse(r1.uri), urlparse(r2.uri)
+        return (p1[:3] == p2[:3] and
+                parse_qs(p1.query, True) == parse_qs(p2.query, True))
+
+    vcr = VCR(
+        record_mode='none',
+        filter_headers=[('Authorization', '**********')],
+        filter_post_data_parameters=[('refresh_token', '**********')],
+        match_on=['method', 'uri_with_query', 'auth', 'body'],
+        cassette_library_dir=CASSETTE_DIR)
+    vcr.register_matcher('auth', auth_matcher)
+    vcr.register_matcher('uri_with_query', uri_with_query_matcher)
+    return vcr
+
+
+def patch_curses(stdscr):
+    """
+    Replace the curses functions that need a real terminal.
+    """
+    patches = [
+        mock.patch('curses.initscr', return_value=stdscr),
+        mock.patch('curses.newwin',
+                   side_effect=lambda *args: stdscr.derwin(*args)),
+        mock.patch('curses.color_pair', return_value=23),
+        mock.patch('curses.has_colors', return_value=True),
+        mock.patch('curses.ACS_VLINE', 0, create=True),
+        mock.patch('curses.COLORS', 256, create=True),
+        mock.patch('curses.COLOR_PAIRS', 256, create=True)]
+    for name in ('echo', 'flash', 'endwin', 'noecho', 'cbreak', 'doupdate',
+                 'nocbreak', 'curs_set', 'init_pair', 'start_color',
+                 'use_default_colors'):
+        patches.append(mock.patch('curses.' + name))
+
+    for patch in patches:
+        patch.start()
+    return patches
+
+
+class Session(object):
+    """
+    Everything that a page needs, built the same way as the unit tests.
+    """
+
+    def __init__(self):
+        self.stdscr = FakeWindow(40, 80)
+        self.config = Config()
+        self.term = Terminal(self.stdscr, config=self.config)
+        self.term.set_theme()
+        self.reddit = praw.Reddit(user_agent='tuir benchmarks',
+                                  decode_in_worker=True,
+                                  discard_fields=UNUSED_FIELDS,
+                                  disable_update_check=True,
+                                  handler=RequestHeaderRateLimiter())
+        self.reddit.config.api_request_delay = 0
+        self.oauth = OAuthHelper(self.reddit, self.term, self.config)
+
+    def login(self):
+        with mock.patch('tuir.packages.praw.Reddit.get_access_information'):
+            self.config.refresh_token = 'mock_refresh_token'
+            self.oauth.authorize(autologin=True)
+
+    def open_subreddit(self, name):
+        with self.term.loader():
+            page = SubredditPage(
+                self.reddit, self.term, self.config, self.oauth, name)
+        if self.term.loader.exception:
+            raise self.term.loader.exception
+        page.draw()
+        return page
+
+    def open_submission(self, url):
+        with self.term.loader():
+            page = SubmissionPage(
+                self.reddit, self.term, self.config, self.oauth, url=url)
+        if self.term.loader.exception:
+            raise self.term.loader.exception
+        page.draw()
+        return page
+
+
+def bench_subreddit_open(session):
+    yield
+    session.open_subreddit('/r/python')
+
+
+def bench_subreddit_scroll(session, n_items=1000):
+    page = session.open_subreddit('/r/python')
+
+    # Only scroll through the submissions that are in the recorded response,
+    # going any further would need another request
+    n_loaded = 0
+    while True:
+        try:
+            page.content.get(n_loaded + 1)
+        except (IndexError, CannotOverwriteExistingCassetteException):
+            break
+        n_loaded += 1
+    yield
+
+    direction = 1
+    for _ in range(n_items):
+        if not 0 <= page.nav.absolute_index + direction <= n_loaded:
+            direction = -direction
+        page._move_cursor(direction)
+        page.draw()
+
+
+def bench_submission_open(session):
+    # The largest thread in the cassettes
+    session.login()
+    yield
+    session.open_submission('https://www.reddit.com/r/IAmA/comments/z1c9z/')
+
+
+def bench_more_comments(session):
+    page = session.open_submission(
+        'https://www.reddit.com/r/AskReddit/comments/2np694/')
+    index = len(page.content._comment_data) - 1
+    yield
+
+    page.content.toggle(index)
+    while page.content.pending:
+        time.sleep(0.001)
+        page.content.update()
+    page.draw()
+
+
+def bench_theme_switch(session):
+    page = session.open_subreddit('/r/python')
+    session.term.theme_list.reload()
+    themes = [theme for theme in session.term.theme_list.themes
+              if session.term.check_theme(theme)]
+    yield
+
+    for theme in themes:
+        session.term.set_theme(theme)
+        page.draw()
+
+
+def bench_session_resume(session):
+    # Everything that's drawn before the first request when tuir is launched
+    # with resume_session enabled
+    pages = [session.open_subreddit('/r/python'), session.open_submission(
+        'https://www.reddit.com/r/Python/comments/6302cj/'
+        'rpython_official_job_board/')]
+    data = json.dumps(page_session.dump(pages))
+    yield
+
+    pages = page_session.restore(
+        session.reddit, session.term, session.config, session.oauth,
+        json.loads(data))
+    pages[-1].draw()
+
+
+def bench_extract_links(session, n_links=500):
+    # A long selftext, like a wiki page or a list of resources
+    html = '<div class="md">' + ''.join(
+        '<p>Item {0}: <a href="https://example.com/{0}">example <em>{0}</em>'
+        '</a> and <a href="/r/python/wiki/{0}">r/python</a></p>'.format(i)
+        for i in range(n_links // 2)) + '</div>'
+    content, data = Content(), {'html': html}
+    yield
+
+    # Opening the list of links twice on the same item
+    for _ in range(2):
+        content.get_links(data)
+
+
+class MockComment(object):
+    def __init__(self, comment_id, parent_id='t3_xxxxx'):
+        self.id = comment_id
+        self.parent_id = parent_id
+        self.replies = []
+
+
+def bench_flatten_comments(session, n_comments=50000):
+    # Every 5th comment starts a new thread and the rest reply to the comment
+    # above them, like the response when expanding a large MoreComments
+    flat = []
+    for i in range(n_comments):
+        if i % 5 == 0:
+            flat.append(MockComment('c%d' % i))
+        else:
+            flat.append(MockComment('c%d' % i, 't1_c%d' % (i - 1)))
+
+    # A wide tree with 10 replies to every comment, nested through .replies
+    roots = [MockComment('r%d' % i) for i in range(10)]
+    level, count = roots, len(roots)
+    while count < n_comments:
+        next_level = []
+        for parent in level:
+            for i in range(10):
+                child = MockComment('%s_%d' % (parent.id, i),
+                                    't1_' + parent.id)
+                parent.replies.append(child)
+                next_level.append(child)
+        level, count = next_level, count + len(next_level)
+    yield
+
+    Content.flatten_comments(flat)
+    Content.flatten_comments(roots)
+
+
+SCENARIOS = OrderedDict([
+    ('subreddit_open', ('test_subreddit_page_construct_default.yaml',
+                        bench_subreddit_open)),
+    ('subreddit_scroll', ('test_subreddit_page_construct_default.yaml',
+                          bench_subreddit_scroll)),
+    ('submission_open', ('test_submission_vote_archived.yaml',
+                         bench_submission_open)),
+    ('more_comments', ('test_content_submission_load_more_comments.yaml',
+                       bench_more_comments)),
+    ('theme_switch', ('test_subreddit_page_construct_default.yaml',
+                      bench_theme_switch)),
+    ('flatten_comments', (None, bench_flatten_comments)),
+    ('session_resume', ('test_session_restore.yaml', bench_session_resume)),
+    ('extract_links', (None, bench_extract_links)),
+])
+
+
+def run_scenario(vcr, cassette, bench, repeat):
+    """
+    Run the scenario `repeat` times and return the duration of each run.
+
+    The scenario is a generator that does its setup before the first yield,
+    and the work that's being measured after it.
+    """
+    timings = []
+    for _ in range(repeat):
+        session = Session()
+        with vcr.use_cassette(cassette) if cassette else _no_cassette():
+            steps = bench(session)
+            next(steps)
+            start = timeit.default_timer()
+            for _ in steps:
+                pass
+            timings.append(timeit.default_timer() - start)
+    return timings
+
+
+@contextmanager
+def _no_cassette():
+    yield
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, filename):
+    with open(filename) as fp:
+        baseline = json.load(fp)
+
+    print('\nCompared to {0} ({1})'.format(
+        baseline.get('commit'), filename))
+    for name, stats in results['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        before = baseline['scenarios'][name]['min']
+        print('{0:<20} {1:10.2f} ms -> {2:10.2f} ms  {3:+.0%}'.format(
+            name, before * 1000, stats['min'] * 1000,
+            stats['min'] / before - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='One of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', metavar='FILE',
+                        help='Write the results to the given file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare against the results from a previous run')
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error('Unknown scenario: {0}'.format(name))
+
+    vcr = initialize_vcr()
+    patches = patch_curses(FakeWindow(40, 80))
+    try:
+        results = OrderedDict([
+            ('commit', get_commit()),
+            ('tuir', __version__),
+            ('python', platform.python_version()),
+            ('platform', platform.platform()),
+            ('repeat', args.repeat),
+            ('scenarios', OrderedDict())])
+        for name in names:
+            cassette, bench = SCENARIOS[name]
+            timings = run_scenario(vcr, cassette, bench, args.repeat)
+            results['scenarios'][name] = OrderedDict([
+                ('min', min(timings)),
+                ('median', sorted(timings)[len(timings) // 2]),
+                ('max', max(timings)),
+                ('timings', timings)])
+            print('{0:<20} {1:10.2f} ms'.format(name, min(timings) * 1000),
+                  file=sys.stderr)
+    finally:
+        for patch in patches:
+            patch.stop()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long tuir takes to start, up to the point where it's ready to open
+the curses screen, and fail if importing tuir goes over budget.
+
+Each run starts a new python process that imports the entry point the same
+way that `python -m tuir` does, so nothing is shared between runs. The modules
+that are only supposed to be imported on first use are also checked, so that
+a new import at the top of a module can't quietly undo the savings.
+
+Usage:
+    python scripts/benchmark_startup.py [--repeat N] [--budget MS]
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import json
+import timeit
+import argparse
+import subprocess
+
+# For the fastest import out of --repeat runs, in milliseconds. This doesn't
+# include starting the interpreter, which depends more on the environment
+# that python is installed in than on tuir.
+DEFAULT_BUDGET = 300
+
+# Modules that tuir should only import once they're needed
+LAZY_MODULES = (
+    'bs4',
+    'tuir.mime_parsers',
+    'tuir.oauth_server',
+    'six.moves.BaseHTTPServer',
+    'multiprocessing',
+)
+
+# Runs in the child process. The entry point calls sys.exit() when the
+# arguments are parsed, which happens after all of the imports have finished
+# and before anything is drawn.
+CHILD = '''
+import sys, json, time, runpy
+start = time.time()
+sys.argv = ['tuir', '--version']
+try:
+    runpy.run_module('tuir', run_name='__main__', alter_sys=True)
+except SystemExit:
+    pass
+elapsed = time.time() - start
+sys.stderr.write(json.dumps({'imports': elapsed, 'modules': list(sys.modules)}))
+'''
+
+
+def run_once():
+    start = timeit.default_timer()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', CHILD],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = proc.communicate()
+    elapsed = timeit.default_timer() - start
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.decode('utf-8', 'replace'))
+    data = json.loads(stderr.decode('utf-8').splitlines()[-1])
+    return elapsed, data['imports'], data['modules']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        metavar='MS', help='Fail if the fastest import is '
+                                           'slower than this (default: '
+                                           '%(default)s)')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    totals = sorted(total for total, _, _ in runs)
+    imports = sorted(imports for _, imports, _ in runs)
+    modules = runs[-1][2]
+
+    print('{0:<20} {1:10.2f} ms (median {2:.2f} ms)'.format(
+        'process', totals[0] * 1000, totals[len(totals) // 2] * 1000))
+    print('{0:<20} {1:10.2f} ms (median {2:.2f} ms)'.format(
+        'imports', imports[0] * 1000, imports[len(imports) // 2] * 1000))
+    print('{0:<20} {1:10d}'.format('modules', len(modules)))
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print('Imported on startup: {0}'.format(', '.join(eager)))
+        failed = True
+    if imports[0] * 1000 > args.budget:
+        print('Over budget: {0:.2f} ms > {1:.2f} ms'.format(
+            imports[0] * 1000, args.budget))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
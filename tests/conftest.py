@@ -11,8 +11,9 @@ import pytest
 from vcr import VCR
 from six.moves.urllib.parse import urlparse, parse_qs
 
-from tuir.oauth import OAuthHelper, OAuthHandler, OAuthHTTPServer
-from tuir.content import RequestHeaderRateLimiter
+from tuir.oauth import OAuthHelper
+from tuir.oauth_server import OAuthHandler, OAuthHTTPServer
+from tuir.content import RequestHeaderRateLimiter, UNUSED_FIELDS
 from tuir.config import Config
 from tuir.packages import praw
 from tuir.terminal import Terminal
@@ -187,7 +188,8 @@ def reddit(vcr, request):
         with patch('tuir.packages.praw.Reddit.get_access_information'):
             handler = RequestHeaderRateLimiter()
             reddit = praw.Reddit(user_agent='tuir test suite',
-                                 decode_html_entities=False,
+                                 decode_in_worker=True,
+                                 discard_fields=UNUSED_FIELDS,
                                  disable_update_check=True,
                                  handler=handler)
             # praw uses a global cache for requests, so we need to clear it
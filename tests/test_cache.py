@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+import threading
+from collections import OrderedDict
+
+import pytest
+from requests.models import Response, PreparedRequest
+
+from tuir.cache import DiskCache, ResponseCache, SnapshotStore, MimeCache
+from tuir.content import RequestHeaderRateLimiter
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def build_response(content=b'{}', status_code=200, headers=None):
+    response = Response()
+    response.url = 'https://api.reddit.com/r/python/.json'
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.encoding = 'utf-8'
+    response._content = content
+    return response
+
+
+def build_key(url='https://api.reddit.com/r/python', oauth=None):
+    return url, ((('limit', 25),), None, None, oauth)
+
+
+@pytest.fixture()
+def disk_cache():
+    cache = DiskCache(':memory:', ttl=60, max_size=1024)
+    try:
+        yield cache
+    finally:
+        cache.close()
+
+
+def test_disk_cache_get_set(disk_cache):
+
+    key = build_key()
+    assert disk_cache.get(key) == (None, False)
+    assert key not in disk_cache
+
+    disk_cache.set(key, build_response(b'{"data": 1}', headers={'etag': 'x'}))
+    assert key in disk_cache
+    assert len(disk_cache) == 1
+
+    response, fresh = disk_cache.get(key)
+    assert fresh
+    assert response.status_code == 200
+    assert response.content == b'{"data": 1}'
+    assert response.json() == {'data': 1}
+    assert response.headers['ETag'] == 'x'
+
+
+def test_disk_cache_key(disk_cache):
+
+    # Authenticated responses can't be cached until the account is known
+    assert disk_cache.make_key(build_key(oauth='bearer 1234')) is None
+    disk_cache.set(build_key(oauth='bearer 1234'), build_response())
+    assert len(disk_cache) == 0
+
+    # The oauth token changes between sessions, but the logged in state
+    # should still be distinguished
+    disk_cache.set_identity('refresh_token_1')
+    key = disk_cache.make_key(build_key(oauth='bearer 1234'))
+    assert key == disk_cache.make_key(build_key(oauth='bearer 5678'))
+    assert key != disk_cache.make_key(build_key(oauth=None))
+    assert '1234' not in key
+    assert 'refresh_token_1' not in disk_cache.identity
+
+    # Responses should never be shared between accounts
+    disk_cache.set(build_key(oauth='bearer 1234'), build_response())
+    disk_cache.set_identity('refresh_token_2')
+    assert disk_cache.make_key(build_key(oauth='bearer 1234')) != key
+    assert disk_cache.get(build_key(oauth='bearer 1234')) == (None, False)
+
+    # Anonymous requests are shared
+    unauthenticated = disk_cache.make_key(build_key(oauth=None))
+    disk_cache.set_identity(None)
+    assert disk_cache.make_key(build_key(oauth=None)) == unauthenticated
+    assert build_key(oauth='bearer 1234') not in disk_cache
+
+
+def test_disk_cache_expire(disk_cache):
+
+    key = build_key()
+    disk_cache.set(key, build_response())
+    disk_cache.expire()
+
+    response, fresh = disk_cache.get(key)
+    assert response is not None
+    assert not fresh
+
+    disk_cache.touch(key)
+    _, fresh = disk_cache.get(key)
+    assert fresh
+
+
+def test_disk_cache_evict(disk_cache):
+
+    key_1 = build_key('https://api.reddit.com/r/python')
+    key_2 = build_key('https://api.reddit.com/r/linux')
+    disk_cache.set(key_1, build_response())
+    disk_cache.set(key_2, build_response())
+
+    assert disk_cache.evict(['https://api.reddit.com/r/python']) == 1
+    assert key_1 not in disk_cache
+    assert key_2 in disk_cache
+
+    disk_cache.clear()
+    assert len(disk_cache) == 0
+
+
+def test_disk_cache_lru(disk_cache):
+
+    keys = [build_key('https://api.reddit.com/r/%d' % i) for i in range(3)]
+    for key in keys:
+        disk_cache.set(key, build_response(b'x' * 400))
+        time.sleep(0.01)
+
+    # The first key was the least recently used, so it gets evicted first
+    assert keys[0] not in disk_cache
+    assert keys[1] in disk_cache
+    assert keys[2] in disk_cache
+
+    disk_cache.get(keys[1])
+    disk_cache.set(build_key('https://api.reddit.com/r/new'),
+                   build_response(b'x' * 400))
+    assert keys[1] in disk_cache
+    assert keys[2] not in disk_cache
+
+
+def test_disk_cache_handler(disk_cache):
+
+    handler = RequestHeaderRateLimiter(disk_cache)
+    key = ('https://api.reddit.com/r/python', (None, None, None, None, None))
+
+    def request(response):
+        prepared = PreparedRequest()
+        prepared.prepare(method='GET', url='https://api.reddit.com/r/python')
+        with mock.patch.object(handler, '_request') as func:
+            func.return_value = response
+            result = handler.request(
+                _cache_key=key, _cache_ignore=False, _cache_timeout=30,
+                request=prepared, proxies={}, timeout=10, verify=True)
+        return result, func, prepared
+
+    # The first request goes to the network and is saved to the disk
+    result, func, _ = request(build_response(b'1', headers={'etag': 'abc'}))
+    assert func.called
+    assert result.content == b'1'
+    assert len(disk_cache) == 1
+
+    # A new session will find the response on the disk
+    handler = RequestHeaderRateLimiter(disk_cache)
+    result, func, _ = request(build_response(b'2'))
+    assert not func.called
+    assert result.content == b'1'
+
+    # Clearing the cache marks the entry as stale, so it's revalidated
+    handler.clear_cache()
+    result, func, prepared = request(build_response(b'', status_code=304))
+    assert func.called
+    assert prepared.headers['If-None-Match'] == 'abc'
+    assert result.content == b'1'
+
+    # Now that it's been revalidated, the network isn't used
+    handler.cache.clear()
+    result, func, _ = request(build_response(b'2'))
+    assert not func.called
+    assert result.content == b'1'
+
+
+def test_response_cache_lru():
+
+    cache = ResponseCache(max_size=10)
+    key_a, key_b, key_c = build_key('a'), build_key('b'), build_key('c')
+
+    cache[key_a] = build_response(b'1234')
+    cache[key_b] = build_response(b'1234')
+    assert len(cache) == 2
+    assert cache.size == 8
+
+    # Touch the first entry so the second one is the least recently used
+    assert cache[key_a].content == b'1234'
+    cache[key_c] = build_response(b'1234')
+    assert key_a in cache
+    assert key_b not in cache
+    assert key_c in cache
+    assert cache.size == 8
+
+    # Replacing an entry shouldn't count its size twice
+    cache[key_c] = build_response(b'12')
+    assert cache.size == 6
+
+    # A single entry is always kept, even if it's over the limit
+    cache[key_a] = build_response(b'12345678901')
+    assert list(cache) == [key_a]
+    assert cache.size == 11
+
+    cache.clear()
+    assert not cache
+    assert cache.size == 0
+
+
+def test_response_cache_expire():
+
+    cache = ResponseCache()
+    key_a, key_b = build_key('a'), build_key('b')
+
+    with mock.patch('tuir.cache.timer') as timer:
+        timer.return_value = 100
+        cache[key_a] = build_response()
+        timer.return_value = 110
+        cache[key_b] = build_response()
+
+        # Accessing an entry doesn't extend its lifetime
+        assert cache.get(key_a)
+
+        timer.return_value = 125
+        cache.expire(20)
+        assert key_a not in cache
+        assert key_b in cache
+
+        timer.return_value = 200
+        cache.expire(20)
+        assert not cache
+        assert cache.size == 0
+
+
+def test_response_cache_evict():
+
+    cache = ResponseCache()
+    key_a = build_key('a')
+    key_a2 = build_key('a', oauth='Bearer token')
+    key_b = build_key('b')
+    for key in (key_a, key_a2, key_b):
+        cache[key] = build_response()
+
+    assert cache.evict(['a', 'missing']) == 2
+    assert list(cache) == [key_b]
+    assert cache.get(key_a) is None
+    assert cache.evict(['a']) == 0
+
+
+def test_response_cache_threaded():
+
+    # The prefetch thread reads from the cache while the main thread is
+    # evicting entries. Simulate the main thread evicting the entry right
+    # after the reader has checked that it exists.
+    cache = ResponseCache()
+    key = build_key('a')
+    cache[key] = build_response()
+    threads = []
+
+    class Entries(OrderedDict):
+        def __contains__(self, item):
+            found = OrderedDict.__contains__(self, item)
+            thread = threading.Thread(target=cache.evict, args=(['a'],))
+            thread.start()
+            threads.append(thread)
+            # Blocks until the timeout if the reader is holding the lock
+            thread.join(0.1)
+            return found
+
+    cache._entries = Entries(cache._entries)
+    assert cache.get(key) is not None
+    threads[0].join()
+    assert cache.get(key, 'default') == 'default'
+    assert not cache
+
+
+def build_snapshot(submission_id, body='comment'):
+    permalink = 'https://www.reddit.com/r/python/comments/{0}/title/'.format(
+        submission_id)
+    return {
+        'submission': {'type': 'Submission', 'permalink': permalink},
+        'comments': [{'type': 'Comment', 'body': body, 'level': 0}],
+        'order': None}
+
+
+def test_snapshot_store():
+
+    snapshots = SnapshotStore(':memory:', max_size=1000)
+    assert SnapshotStore.make_key('https://redd.it/2xmo63') == '2xmo63'
+    assert SnapshotStore.make_key('/r/python/comments/2xmo63/') == '2xmo63'
+    assert SnapshotStore.make_key('https://www.reddit.com/r/python') is None
+
+    snapshots.set(build_snapshot('aaaaa'))
+    time.sleep(0.01)
+    snapshots.set(build_snapshot('bbbbb'))
+    snapshot = snapshots.get('https://www.reddit.com/comments/aaaaa')
+    assert snapshot['comments'] == [
+        {'type': 'Comment', 'body': 'comment', 'level': 0}]
+    assert snapshot['saved'] <= time.time()
+    assert snapshots.get('https://redd.it/ccccc') is None
+
+    # Most recently saved first
+    assert [s['permalink'][-13:] for s in snapshots.list()] == [
+        '/bbbbb/title/', '/aaaaa/title/']
+
+    # Re-saving a thread replaces it, and the least recently opened thread
+    # gets evicted when the store is full
+    snapshots.set(build_snapshot('aaaaa', body='x' * 500))
+    assert len(snapshots) == 2
+    snapshots.set(build_snapshot('ccccc', body='x' * 500))
+    assert '/comments/aaaaa' not in snapshots
+    assert '/comments/bbbbb' not in snapshots
+    assert '/comments/ccccc' in snapshots
+
+    snapshots.clear()
+    assert len(snapshots) == 0
+
+
+def test_snapshot_store_submit():
+
+    snapshots = SnapshotStore(':memory:')
+    with mock.patch.object(snapshots, 'set', wraps=snapshots.set) as set_:
+        # Snapshots of the same thread that haven't been written yet are
+        # replaced by the latest one
+        with snapshots._condition:
+            snapshots.submit(build_snapshot('aaaaa', body='old'))
+            snapshots.submit(build_snapshot('bbbbb'))
+            snapshots.submit(build_snapshot('aaaaa', body='new'))
+        assert snapshots.flush(1)
+        assert set_.call_count == 2
+
+    snapshot = snapshots.get('https://redd.it/aaaaa')
+    assert snapshot['comments'][0]['body'] == 'new'
+    assert 'https://redd.it/bbbbb' in snapshots
+
+    # The snapshot can be finished off on the writer thread before it's saved
+    threads = []
+
+    def prepare(snapshot):
+        threads.append(threading.current_thread())
+        snapshot['comments'][0]['body'] = 'prepared'
+        return snapshot
+
+    snapshots.submit(build_snapshot('aaaaa'), prepare=prepare)
+    assert snapshots.flush(1)
+    assert threads == [snapshots._writer]
+    snapshot = snapshots.get('https://redd.it/aaaaa')
+    assert snapshot['comments'][0]['body'] == 'prepared'
+    snapshots.close()
+
+
+def test_mime_cache(tmpdir):
+
+    filename = tmpdir.join('mime-cache.db').strpath
+    cache = MimeCache(filename, ttl=60, negative_ttl=10)
+    url = 'https://v.redd.it/abcdef'
+    assert cache.get(url) is None
+
+    cache.set(url, 'https://v.redd.it/abcdef/DASHPlaylist.mpd', 'video/x-youtube')
+    cache.set('https://gfycat.com/unknown', 'https://gfycat.com/unknown', None)
+    cache.set('https://imgur.com/a/b', 'https://imgur.com/a/b', 'text/html')
+    assert cache.get(url) == (
+        'https://v.redd.it/abcdef/DASHPlaylist.mpd', 'video/x-youtube')
+    # Links that couldn't be resolved are remembered for a short time
+    assert cache.get('https://gfycat.com/unknown') == (
+        'https://gfycat.com/unknown', None)
+    assert len(cache) == 3
+
+    # But they aren't saved to the disk
+    cache.close()
+    cache = MimeCache(filename, ttl=60, negative_ttl=10)
+    assert 'https://gfycat.com/unknown' not in cache
+    assert 'https://imgur.com/a/b' not in cache
+    assert url in cache
+
+    cache.set('https://gfycat.com/unknown', 'https://gfycat.com/unknown', None)
+    with mock.patch('time.time', return_value=time.time() + 30):
+        assert 'https://gfycat.com/unknown' not in cache
+        assert url in cache
+
+    # A successful lookup replaces the failed one
+    cache.set(url, url, None)
+    assert cache.get(url) == (url, None)
+    cache.set(url, url, 'video/mp4')
+    assert cache.get(url) == (url, 'video/mp4')
+
+    # Expired entries aren't returned, and are deleted by the next set()
+    with mock.patch('time.time', return_value=time.time() + 120):
+        assert url not in cache
+        cache.set('https://i.imgur.com/a.gifv', 'https://i.imgur.com/a.mp4',
+                  'video/mp4')
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    cache.close()
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-import sys
-
 import pytest
 
 from tuir.clipboard import copy
@@ -35,9 +33,8 @@ def test_copy_nix():
 
 def test_copy_darwin():
     with mock.patch('subprocess.Popen') as Popen, \
-            mock.patch('subprocess.call', return_value=0) as call:
-
-        sys.platform = 'darwin'
+            mock.patch('subprocess.call', return_value=0) as call, \
+            mock.patch('sys.platform', 'darwin'):
 
         p = mock.Mock()
         p.communicate = mock.Mock()
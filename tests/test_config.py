@@ -106,6 +106,8 @@ def test_config_get_args():
             'https://reddit.com/permalink •',
             '-s', 'cfb',
             '--log', 'logfile.log',
+            '--profile', 'profile.jsonl',
+            '--startup-profile',
             '--config', 'configfile.cfg',
             '--ascii',
             '--monochrome',
@@ -116,6 +118,7 @@ def test_config_get_args():
             '--theme', 'molokai',
             '--list-themes',
             '--no-flash',
+            '--offline',
             '--no-autologin']
 
     with mock.patch('sys.argv', ['tuir']):
@@ -131,6 +134,8 @@ def test_config_get_args():
         assert config['monochrome'] is True
         assert config['subreddit'] == 'cfb'
         assert config['log'] == 'logfile.log'
+        assert config['profile'] == 'profile.jsonl'
+        assert config['startup_profile'] is True
         assert config['ascii'] is True
         assert config['persistent'] is False
         assert config['clear_auth'] is True
@@ -141,6 +146,7 @@ def test_config_get_args():
         assert config['theme'] == 'molokai'
         assert config['list_themes'] is True
         assert config['flash'] is False
+        assert config['offline'] is True
         assert config['autologin'] is False
 
 
@@ -281,3 +287,50 @@ def test_config_history():
         config.delete_history()
         assert len(config.history) == 0
         assert not os.path.exists(fp.name)
+
+
+def test_config_mime_cache(tmpdir):
+    """Ensure that the media link cache is only kept when media is enabled"""
+
+    filename = os.path.join(str(tmpdir), 'mime-cache.db')
+    config = Config(mime_cache_file=filename)
+    assert config.load_mime_cache() is None
+
+    config['enable_media'] = True
+    config['mime_cache'] = False
+    cache = config.load_mime_cache()
+    assert cache.filename == ':memory:'
+    cache.close()
+
+    config['mime_cache'] = True
+    cache = config.load_mime_cache()
+    assert cache.filename == filename
+    assert cache.ttl == config['mime_cache_ttl']
+    cache.close()
+    assert os.path.exists(filename)
+
+    config['offline'] = True
+    assert config.load_mime_cache() is None
+
+
+def test_config_session():
+    """Ensure that the session can be loaded and saved"""
+
+    # Should still be able to load if the file doesn't exist
+    config = Config(session_file='/fake_path/fake_file')
+    assert config.load_session() is None
+
+    with NamedTemporaryFile(delete=False) as fp:
+        config = Config(session_file=fp.name)
+
+        session = {'version': 1, 'pages': [{'page': 'subreddit'}]}
+        config.save_session(session)
+        assert config.load_session() == session
+
+        # A session that was only partly written is ignored
+        with open(fp.name, 'w') as fp2:
+            fp2.write('{"version": 1, "pa')
+        assert config.load_session() is None
+
+        config.delete_session()
+        assert not os.path.exists(fp.name)
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
 import time
+import threading
 from itertools import islice
 from collections import OrderedDict
 
 import six
 import pytest
+from requests.models import Response
+from six.moves.urllib.parse import parse_qs
 
 from tuir import config, exceptions
 from tuir.packages import praw
+from tuir.objects import NullLoader, WriteQueue, request_lane
 from tuir.content import (
     Content, SubmissionContent, SubredditContent, SubscriptionContent,
     RequestHeaderRateLimiter)
@@ -172,6 +177,30 @@ def test_content_wrap_text():
     assert Content.wrap_text('\n\n\n\n', 70) == ['', '', '', '']
 
 
+def test_content_wrap_field():
+
+    content = Content()
+    data = {'body': 'four score\nand seven\n\n'}
+
+    with mock.patch.object(Content, 'wrap_text', wraps=Content.wrap_text) as func:
+        lines = content.wrap_field(data, 'body', 6)
+        assert lines == ['four', 'score', 'and', 'seven', '']
+        assert content.wrap_field(data, 'body', 6) is lines
+        assert func.call_count == 1
+        assert content.wrap_hits == 1
+
+        # Resizing the terminal wraps the text again
+        lines = content.wrap_field(data, 'body', 15)
+        assert lines == ['four score', 'and seven', '']
+        assert func.call_count == 2
+
+        # So does changing the text
+        data['body'] = 'edited'
+        assert content.wrap_field(data, 'body', 15) == ['edited']
+        assert func.call_count == 3
+        assert content.wrap_misses == 3
+
+
 @pytest.mark.skip('Reddit API changed, need to update this test')
 def test_content_flatten_comments(reddit):
 
@@ -274,6 +303,41 @@ def test_content_flatten_comments_3(reddit):
             assert item.nested_level == 0
 
 
+def test_content_flatten_comments_large():
+
+    class MockComment(object):
+        def __init__(self, comment_id, parent_id='t3_xxxxx'):
+            self.id = comment_id
+            self.parent_id = parent_id
+            self.replies = []
+
+    # A flat list of 50k comments where every 5th comment starts a new thread
+    # and the rest reply to the comment above them, similar to what is
+    # returned when expanding a large MoreComments object.
+    comments = []
+    for i in range(50000):
+        if i % 5 == 0:
+            comments.append(MockComment('c%d' % i))
+        else:
+            comments.append(MockComment('c%d' % i, 't1_c%d' % (i - 1)))
+
+    flattened = Content.flatten_comments(comments, root_level=1)
+    assert flattened == comments
+    for i, item in enumerate(flattened):
+        assert item.nested_level == 1 + i % 5
+
+    # A single thread that is nested 50k levels deep through the replies
+    root = parent = MockComment('c0')
+    for i in range(1, 50000):
+        child = MockComment('c%d' % i, 't1_c%d' % (i - 1))
+        parent.replies.append(child)
+        parent = child
+
+    flattened = Content.flatten_comments([root])
+    assert len(flattened) == 50000
+    assert [item.nested_level for item in flattened] == list(range(50000))
+
+
 def test_content_submission_initialize(reddit, terminal):
 
     url = 'https://www.reddit.com/r/Python/comments/2xmo63/'
@@ -295,7 +359,12 @@ def test_content_submission(reddit, terminal):
     # Everything is loaded upon instantiation
     assert content.range == (-1, 44)
     assert content.get(-1)['type'] == 'Submission'
+
+    # But comments aren't parsed until they're accessed
+    assert not any(isinstance(d, dict) for d in content._comment_data)
     assert content.get(40)['type'] == 'Comment'
+    assert isinstance(content._comment_data[40], dict)
+    assert not isinstance(content._comment_data[39], dict)
 
     for data in content.iterate(-1, 1):
         assert all(k in data for k in ('object', 'n_rows', 'h_offset', 'type',
@@ -337,16 +406,118 @@ def test_content_submission_load_more_comments(reddit, terminal):
     content = SubmissionContent(submission, terminal.loader)
     last_index = len(content._comment_data) - 1
 
-    # More comments load when toggled
+    # More comments load in the background when toggled
     assert content.get(last_index)['type'] == 'MoreComments'
     content.toggle(last_index)
+    assert content.pending
+    assert content.get(last_index)['body'] == 'Loading comments'
+
+    # Toggling again while loading doesn't start another request
+    content.toggle(last_index)
+    assert content._n_loading == 1
+
+    changes = []
+    for _ in range(100):
+        changes.extend(content.update())
+        if not content.pending:
+            break
+        time.sleep(0.1)
+    assert not content.pending
 
     # Loading more comments should increase the range
+    n_added = content.range[1] - last_index
+    assert changes == [(last_index, n_added)]
     assert content.range[0] == -1
     assert content.range[1] > last_index
     assert content.get(last_index)['type'] == 'Comment'
 
 
+def test_content_submission_expand_comments(reddit, terminal):
+
+    url = 'https://www.reddit.com/r/AskReddit/comments/2np694/'
+    submission = reddit.get_submission(url)
+    handler = reddit.handler
+
+    def walk(comments):
+        for comment in comments:
+            if isinstance(comment, praw.objects.MoreComments):
+                yield comment
+            else:
+                for more in walk(comment.replies):
+                    yield more
+
+    parents = dict((child, more.parent_id) for more in walk(submission.comments)
+                   for child in more.children)
+    n_links = len(list(walk(submission.comments)))
+    n_rows = len(SubmissionContent.flatten_comments(submission.comments))
+
+    def send(request, **kwargs):
+        assert 'morechildren' in request.url
+        children = parse_qs(request.body)['children'][0].split(',')
+        things = [{'kind': 't1', 'data': {
+            'id': x, 'name': 't1_' + x, 'parent_id': parents[x],
+            'link_id': submission.fullname, 'body': 'comment', 'replies': ''}}
+            for x in children]
+        response = Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response._content = json.dumps(
+            {'json': {'errors': [], 'data': {'things': things}}}
+        ).encode('utf-8')
+        return response
+
+    acquired = []
+    acquire = handler._acquire
+
+    def _acquire(lane):
+        acquired.append((lane, threading.current_thread().name))
+        acquire(lane)
+
+    # The budget has run out, every request has to wait for the reset
+    handler.next_request_timestamp = time.time() + 0.5
+
+    with mock.patch.object(handler, '_acquire', _acquire), \
+            mock.patch.object(handler.http, 'send', side_effect=send):
+        start = time.time()
+        content = SubmissionContent(
+            submission, terminal.loader, expand_comments=30)
+        assert time.time() - start >= 0.4
+
+    # The requests were sent from the pool, and scheduled by the rate limiter
+    # as part of the page load
+    assert len(acquired) == 30
+    for lane, name in acquired:
+        assert lane == handler.INTERACTIVE
+        assert name != 'MainThread'
+
+    # The links that weren't expanded can still be loaded by the user
+    rows = content._comment_data
+    n_more = len([c for c in rows if isinstance(c, praw.objects.MoreComments)])
+    assert 0 < n_more < n_links
+    assert len(rows) > n_rows
+
+
+def test_content_submission_load_more_comments_hidden(reddit, terminal):
+
+    url = 'https://www.reddit.com/r/AskReddit/comments/2np694/'
+    submission = reddit.get_submission(url)
+    content = SubmissionContent(submission, terminal.loader)
+    last_index = len(content._comment_data) - 1
+    data = content.get(last_index)
+
+    # Simulate the parent comment being collapsed before the load finishes
+    with mock.patch('threading.Thread'):
+        content.toggle(last_index)
+    hidden = {'type': 'HiddenComment', 'cache': [data]}
+    content._comment_data[last_index] = hidden
+    content._loaded.append((data, [mock.sentinel.a, mock.sentinel.b], None))
+
+    assert content.update() == [(None, 1)]
+    assert not content.pending
+    assert hidden['cache'] == [mock.sentinel.a, mock.sentinel.b]
+
+
 def test_content_submission_from_url(reddit, oauth, refresh_token, terminal):
 
     url = 'https://www.reddit.com/r/AskReddit/comments/2np694/'
@@ -441,6 +612,79 @@ def test_content_subreddit_load_more(reddit, terminal, config):
         assert data['title'].startswith(six.text_type(i + 1))
 
 
+def test_content_subreddit_prefetch(terminal, config):
+
+    config['prefetch_distance'] = 3
+    submissions = [mock.Mock(title='post %d' % i) for i in range(10)]
+
+    with mock.patch.object(Content, 'strip_praw_submission') as strip:
+        strip.side_effect = lambda s: {'title': s.title}
+        content = SubredditContent(config, 'front', iter(submissions),
+                                   terminal.loader)
+
+        # Loading the first submission should trigger a prefetch
+        content._prefetch_thread.join()
+        assert content.range == (0, 0)
+        assert len(content._prefetched) == 3
+
+        # Prefetched submissions are consumed in order
+        assert content.get(5)['title'].endswith('post 5')
+        assert content.get(9)['title'].endswith('post 9')
+        with pytest.raises(IndexError):
+            content.get(10)
+
+    assert not content._prefetched
+
+
+def test_content_revalidate_loader(terminal):
+
+    content = Content()
+    content._loader = terminal.loader
+    loaders = []
+
+    def load(loader):
+        loaders.append((loader, threading.current_thread().name))
+        # Nothing is drawn and the error isn't caught on the worker thread
+        with loader('Loading more submissions'):
+            raise exceptions.SubredditError('Gone')
+
+    content.revalidate(load)
+    for _ in range(100):
+        if content._revalidated:
+            break
+        time.sleep(0.01)
+
+    (loader, thread), = loaders
+    assert isinstance(loader, NullLoader)
+    assert thread != 'MainThread'
+    assert terminal.loader.exception is None
+
+    # The error is displayed by the real loader on the main thread
+    assert content._pop_revalidated('Refreshing page') is None
+    assert isinstance(terminal.loader.exception, exceptions.SubredditError)
+
+
+def test_content_subreddit_prefetch_error(terminal, config):
+
+    config['prefetch_distance'] = 3
+
+    def generator():
+        yield mock.Mock(title='post 0')
+        raise praw.errors.InvalidSubreddit('Prefetch failed')
+
+    with mock.patch.object(Content, 'strip_praw_submission') as strip:
+        strip.side_effect = lambda s: {'title': s.title}
+        content = SubredditContent(config, 'front', generator(),
+                                   terminal.loader)
+        content._prefetch_thread.join()
+
+        # The error from the background thread is raised on the main thread
+        with pytest.raises(IndexError):
+            content.get(1)
+        assert isinstance(terminal.loader.exception,
+                          praw.errors.InvalidSubreddit)
+
+
 args, ids = SUBREDDIT_PROMPTS.values(), list(SUBREDDIT_PROMPTS)
 @pytest.mark.parametrize('prompt,name,order', args, ids=ids)
 def test_content_subreddit_from_name(prompt, name, order, reddit, terminal, config):
@@ -692,6 +936,155 @@ def test_content_rate_limit(reddit, oauth, refresh_token):
     assert reddit.handler.next_request_timestamp is None
 
 
+def test_content_rate_limit_lanes():
+
+    handler = RequestHeaderRateLimiter()
+
+    get = mock.Mock(method='GET', url='https://oauth.reddit.com/r/python')
+    post = mock.Mock(method='POST', url='https://oauth.reddit.com/api/vote')
+    assert handler._get_lane(get) == handler.INTERACTIVE
+    assert handler._get_lane(post) == handler.WRITE
+
+    lanes = []
+    thread = threading.Thread(target=lambda: lanes.append(
+        (handler._get_lane(get), handler._get_lane(post))))
+    thread.start()
+    thread.join()
+    assert lanes == [(handler.BACKGROUND, handler.WRITE)]
+
+    # Tagged requests go in the lane that they were tagged with
+    with request_lane('background'):
+        assert handler._get_lane(post) == handler.BACKGROUND
+        with request_lane('interactive'):
+            assert handler._get_lane(get) == handler.INTERACTIVE
+        assert handler._get_lane(get) == handler.BACKGROUND
+    assert handler._get_lane(get) == handler.INTERACTIVE
+
+
+def test_content_rate_limit_lane_tags(terminal):
+
+    handler = RequestHeaderRateLimiter()
+    more_children = mock.Mock(
+        method='POST', url='https://oauth.reddit.com/api/morechildren')
+    vote = mock.Mock(method='POST', url='https://oauth.reddit.com/api/vote')
+    token = mock.Mock(
+        method='POST', url='https://www.reddit.com/api/v1/access_token/')
+    lanes = []
+
+    def send(request):
+        lanes.append(handler._get_lane(request))
+
+    # Expanding "more comments" is a POST made by a worker thread, but it's
+    # a background fetch and not a write
+    snapshot = {'submission': {'type': 'Submission', 'permalink': '/abc'},
+                'comments': [], 'order': None}
+    content = SubmissionContent(None, terminal.loader, snapshot=snapshot)
+    more = mock.Mock(spec=praw.objects.MoreComments)
+    more.comments.side_effect = lambda update: send(more_children)
+    data = {'type': 'MoreComments', 'object': more, 'level': 0}
+    thread = threading.Thread(target=content._load_more_comments, args=(data,))
+    thread.start()
+    thread.join()
+
+    # Votes sent by the write queue are writes
+    writes = WriteQueue()
+    item = {'object': mock.Mock(), 'likes': None}
+    item['object'].upvote.side_effect = lambda: send(vote)
+    writes.submit(item, 'likes', True)
+    assert writes.join(1)
+
+    # Refreshing the access token isn't a write
+    send(token)
+
+    assert lanes == [handler.BACKGROUND, handler.WRITE, handler.INTERACTIVE]
+
+
+def test_content_rate_limit_schedule():
+
+    handler = RequestHeaderRateLimiter()
+    now = time.time()
+
+    # Nothing is known about the budget yet, so nothing waits
+    for lane in range(len(handler.LANES)):
+        assert handler._get_wait_time(lane, now) == 0
+
+    # Plenty of budget left, background requests are allowed to burst
+    handler._update({'x-ratelimit-used': '10',
+                     'x-ratelimit-remaining': '590',
+                     'x-ratelimit-reset': '590'})
+    assert handler._get_wait_time(handler.BACKGROUND, now) == 0
+
+    # Background requests wait while a higher priority lane is queued
+    handler._waiting[handler.INTERACTIVE] = 1
+    assert handler._get_wait_time(handler.BACKGROUND, now) is None
+    assert handler._get_wait_time(handler.WRITE, now) is None
+    assert handler._get_wait_time(handler.INTERACTIVE, now) == 0
+    handler._waiting[handler.INTERACTIVE] = 0
+
+    # Running low, background requests are spread out over the period
+    handler.reset_timestamp = now + 300
+    handler.remaining = 110
+    handler._last_background_timestamp = now
+    assert handler._get_wait_time(handler.BACKGROUND, now) == 3
+    assert handler._get_wait_time(handler.INTERACTIVE, now) == 0
+
+    # The reserve is left for the user
+    handler.remaining = handler.BACKGROUND_RESERVE
+    assert handler._get_wait_time(handler.BACKGROUND, now) == 300
+    assert handler._get_wait_time(handler.INTERACTIVE, now) == 0
+    assert handler._get_wait_time(handler.WRITE, now) == 0
+
+    # A new period has started
+    assert handler._get_wait_time(handler.BACKGROUND, now + 301) == 0
+
+    # Out of budget, everything waits for the reset
+    handler._update({'x-ratelimit-used': '600',
+                     'x-ratelimit-remaining': '0',
+                     'x-ratelimit-reset': '60'})
+    now = time.time()
+    for lane in range(len(handler.LANES)):
+        assert 0 < handler._get_wait_time(lane, now) <= 60
+
+
+def test_content_rate_limit_promote():
+
+    handler = RequestHeaderRateLimiter()
+    handler._update({'x-ratelimit-used': '590',
+                     'x-ratelimit-remaining': '10',
+                     'x-ratelimit-reset': '600'})
+
+    # The reserve is left for the user, so the background request would be
+    # held until the end of the period
+    thread = threading.Thread(target=handler._acquire,
+                              args=(handler.BACKGROUND,))
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()
+    assert handler.pending
+
+    # Until the main thread needs its result
+    with handler.promote(thread):
+        thread.join(1)
+    assert not thread.is_alive()
+    assert handler._waiting == [0, 0, 0]
+    assert not handler._promoted
+
+    handler._release()
+    assert not handler.pending
+
+
+def test_content_rate_limit_status():
+
+    handler = RequestHeaderRateLimiter()
+    assert handler.status() == ''
+
+    handler._waiting[handler.BACKGROUND] = 2
+    assert handler.status() == '2 requests queued'
+
+    handler.next_request_timestamp = time.time() + 29.5
+    assert handler.status() == '2 requests queued, rate limited for 30s'
+
+
 def test_content_extract_links():
 
     # Should handle relative & absolute links, should ignore empty links.
@@ -704,3 +1097,30 @@ def test_content_extract_links():
         {'href': 'https://www.reddit.com/', 'text': 'Home Page'},
         {'href': 'https://www.github.com', 'text': 'Github'}
     ]
+
+
+def test_content_get_links():
+
+    # Text inside of nested tags and entities should be included, and links
+    # that are never closed should still be returned
+    data = {'html': """
+    <p><a href="/r/python"><em>r/python</em> &amp; friends</a></p>
+    <a href="https://www.github.com">Github
+    """}
+    links = [
+        {'href': 'https://www.reddit.com/r/python',
+         'text': 'r/python & friends'},
+        {'href': 'https://www.github.com', 'text': 'Github\n    '}]
+
+    content = Content()
+    with mock.patch.object(Content, 'extract_links',
+                           wraps=Content.extract_links) as extract_links:
+        assert content.get_links(data) == links
+        assert content.get_links(data) == links
+        assert extract_links.call_count == 1
+
+        # Parsed again if the text was edited
+        data['html'] = '<a href="https://www.reddit.com">Reddit</a>'
+        assert content.get_links(data) == [
+            {'href': 'https://www.reddit.com', 'text': 'Reddit'}]
+        assert extract_links.call_count == 2
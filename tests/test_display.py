@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+
+import six
+import pytest
+from kitchen.text import display as kitchen_display
+
+from tuir.display import char_width, textual_width, textual_width_chop
+
+
+TEXT = [
+    'hello world',
+    'hello ❤',
+    'ｈｅｌｌｏ',
+    '一二三四五六七八九十',
+    'café ñunru!',
+    'café',
+    'tab\tseparated',
+    '한국어 텍스트',
+    'trailing newline\n',
+    'soft\xadhyphen',
+    'zero\u200bwidth\u200b\u200b',
+    'combining\u0301\u0301 and control\x1b\x94',
+    '',
+]
+
+
+def test_char_width():
+
+    assert char_width('a') == 1
+    assert char_width('\t') == 0
+    assert char_width('\x1b') == -1
+    assert char_width('́') == 0
+    assert char_width('一') == 2
+    assert char_width('ｈ') == 2
+    assert char_width('〿') == 1
+
+
+@pytest.mark.parametrize('text', TEXT)
+def test_textual_width(text):
+
+    assert textual_width(text) == kitchen_display.textual_width(text)
+    assert textual_width(text.encode('utf-8')) == textual_width(text)
+
+
+@pytest.mark.parametrize('text', TEXT)
+def test_textual_width_chop(text):
+
+    for chop in range(0, 25):
+        expected = kitchen_display.textual_width_chop(text, chop)
+        assert textual_width_chop(text, chop) == expected
+
+    assert textual_width_chop('éé', 1) == 'é'
+
+
+def test_display_kitchen_parity():
+
+    # Mix of ascii, control, combining, zero width and wide characters
+    chars = [six.unichr(ucs) for ucs in range(0x80)]
+    chars += ['\xad', '\x94', '\u0301', '\u200b', '\ufeff', '\u303f',
+              '\u3000', '\u4e00', '\uac00', '\uff21', 'é', '❤']
+
+    random.seed(0)
+    for _ in range(2000):
+        text = ''.join(random.choice(chars)
+                       for _ in range(random.randint(0, 30)))
+        assert textual_width(text) == kitchen_display.textual_width(text)
+        for chop in range(0, 35, 3):
+            expected = kitchen_display.textual_width_chop(text, chop)
+            assert textual_width_chop(text, chop) == expected
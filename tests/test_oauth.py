@@ -3,7 +3,9 @@ from __future__ import unicode_literals
 
 import requests
 
-from tuir.oauth import OAuthHelper, OAuthHandler
+from tuir.cache import DiskCache
+from tuir.oauth import OAuthHelper
+from tuir.oauth_server import OAuthHandler
 from tuir.exceptions import InvalidRefreshToken
 from tuir.packages.praw.errors import OAuthException
 
@@ -123,13 +125,30 @@ def test_oauth_clear_data(oauth):
     assert oauth.reddit.refresh_token is None
 
 
+def test_oauth_cache_identity(oauth, refresh_token):
+
+    disk_cache = DiskCache(':memory:')
+    oauth.reddit.handler.disk_cache = disk_cache
+    try:
+        oauth.config.refresh_token = refresh_token
+        oauth.authorize(autologin=True)
+        assert disk_cache.identity is not None
+
+        # Logging out should stop the cache from serving this account
+        oauth.clear_oauth_data()
+        assert disk_cache.identity is None
+    finally:
+        oauth.reddit.handler.disk_cache = None
+        disk_cache.close()
+
+
 def test_oauth_authorize(oauth, reddit, stdscr, refresh_token):
 
     # Because we use `from .helpers import open_browser` we have to patch the
     # function in the destination oauth module and not the helpers module
     with mock.patch('uuid.UUID.hex', new_callable=mock.PropertyMock) as uuid, \
             mock.patch('tuir.terminal.Terminal.open_browser') as open_browser, \
-            mock.patch('tuir.oauth.OAuthHTTPServer') as http_server,           \
+            mock.patch('tuir.oauth_server.OAuthHTTPServer') as http_server,    \
             mock.patch.object(oauth.reddit, 'user'),                          \
             mock.patch('time.sleep'):
 
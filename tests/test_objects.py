@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 import time
+import threading
 import curses
 from collections import OrderedDict
 
@@ -13,7 +14,7 @@ from six.moves import reload_module
 
 from tuir import exceptions
 from tuir.objects import Controller, Navigator, Command, KeyMap, \
-    curses_session, patch_webbrowser
+    WriteQueue, MimeQueue, curses_session, patch_webbrowser
 
 try:
     from unittest import mock
@@ -413,6 +414,104 @@ def test_objects_keymap():
             assert six.text_type(key) in six.text_type(e)
 
 
+def test_objects_write_queue(terminal):
+
+    writes = WriteQueue()
+    sending = threading.Event()
+    release = threading.Event()
+
+    def block():
+        sending.set()
+        release.wait()
+
+    first = {'object': mock.Mock(), 'likes': None, 'saved': False}
+    second = {'object': mock.Mock(), 'likes': None, 'saved': False}
+    first['object'].upvote.side_effect = block
+
+    # The local state changes right away, before the request is sent
+    writes.submit(first, 'likes', True)
+    assert first['likes'] is True
+    assert writes.pending
+    assert sending.wait(1)
+
+    # Toggling an item that hasn't been sent yet replaces its request, and
+    # toggling it back cancels the request
+    writes.submit(second, 'likes', True)
+    writes.submit(second, 'likes', False)
+    writes.submit(first, 'saved', True)
+    writes.submit(first, 'saved', False)
+    assert second['likes'] is False
+    assert first['saved'] is False
+
+    release.set()
+    assert writes.join(1)
+    assert not writes.pending
+    assert first['object'].upvote.call_count == 1
+    assert not second['object'].upvote.called
+    assert second['object'].downvote.call_count == 1
+    assert not first['object'].save.called
+    assert not first['object'].unsave.called
+    assert not writes.update(terminal.loader)
+
+    # A failed request rolls back the local state and shows the error
+    second['object'].save.side_effect = requests.exceptions.Timeout
+    writes.submit(second, 'saved', True)
+    assert writes.join(1)
+    assert second['saved'] is True
+    assert writes.pending
+    assert writes.update(terminal.loader)
+    assert second['saved'] is False
+    assert isinstance(terminal.loader.exception, requests.exceptions.Timeout)
+    assert not writes.pending
+
+
+def test_objects_mime_queue():
+
+    resolving = threading.Event()
+    release = threading.Event()
+    resolved = []
+
+    def resolve(url):
+        if url == 'a':
+            resolving.set()
+            release.wait()
+        elif url == 'c':
+            raise requests.exceptions.Timeout
+        resolved.append(url)
+
+    queue = MimeQueue(resolve)
+    queue.submit(['a', 'b'])
+    assert resolving.wait(1)
+
+    # The urls from the last submit replace the ones that are still queued,
+    # and a url that's opened in the foreground is taken off of the queue
+    queue.submit(['a', 'c', 'd', 'e'])
+    queue.wait('e')
+    thread = threading.Thread(target=queue.wait, args=('a',))
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()
+
+    release.set()
+    thread.join(1)
+    assert not thread.is_alive()
+    for _ in range(100):
+        if not queue.pending:
+            break
+        time.sleep(0.01)
+    assert not queue.pending
+    assert resolved == ['a', 'd']
+
+    # Urls that were already looked up, or failed, aren't queued again
+    queue.submit(['a', 'c', 'd', 'f'])
+    assert list(queue._queue) in (['f'], [])
+    for _ in range(100):
+        if not queue.pending:
+            break
+        time.sleep(0.01)
+    assert resolved == ['a', 'd', 'f']
+
+
 def test_objects_navigator_properties():
 
     def valid_page_cb(_):
@@ -1,4 +1,16 @@
+import json
+import threading
+
+import pytest
+
 from tuir import packages
+from tuir.packages.praw import internal
+from tuir.packages.praw.objects import Comment, MoreComments, Submission
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 
 def test_praw3_package():
@@ -6,3 +18,173 @@ def test_praw3_package():
     assert packages.praw
     assert len(packages.__praw_hash__) == 40
     assert packages.__praw_bundled__ is True
+
+
+class MockComment(object):
+
+    def __init__(self, comment_id, parent_id='t3_abc'):
+        self.name = 't1_' + comment_id
+        self.parent_id = parent_id
+        self.is_root = parent_id.startswith('t3_')
+        self.replies = []
+
+    def _update_submission(self, submission):
+        submission._comments_by_id[self.name] = self
+
+
+def build_submission(reddit):
+
+    submission = Submission(reddit, {
+        'id': 'abc', 'name': 't3_abc', 'subreddit': 'python',
+        'permalink': '/r/python/comments/abc/'})
+
+    def more_comments(children, parent_id='t3_abc'):
+        return MoreComments(reddit, {
+            'count': len(children), 'children': children,
+            'parent_id': parent_id, 'name': 't1_more', 'id': 'more'})
+
+    # 150 top level comments split between two MoreComments objects, and a
+    # deeper MoreComments that's only revealed after the first expansion
+    children_a = ['a%d' % i for i in range(100)]
+    children_b = ['b%d' % i for i in range(50)]
+    children_c = ['c%d' % i for i in range(10)]
+    submission._update_comments([
+        more_comments(children_a), more_comments(children_b)])
+
+    def request_json(url, data):
+        things = [MockComment(x, 't1_a0' if x[0] == 'c' else 't3_abc')
+                  for x in data['children'].split(',')]
+        if things[0].name == 't1_a0':
+            things.append(more_comments(children_c, 't1_a0'))
+        return {'data': {'things': things}}
+
+    return submission, request_json
+
+
+def test_praw3_replace_more_comments_concurrent(reddit):
+
+    submission, request_json = build_submission(reddit)
+    with mock.patch.object(reddit, 'request_json') as func:
+        func.side_effect = request_json
+        remaining = submission.replace_more_comments(
+            limit=None, max_workers=4)
+
+    assert remaining == []
+    # The 150 ids in the first pass fit into two requests, instead of one
+    # request per MoreComments object
+    assert func.call_count == 3
+    assert [len(c[1]['data']['children'].split(',')) for c in
+            func.call_args_list] == [100, 50, 10]
+
+    assert len(submission.comments) == 150
+    assert len(submission.comments[0].replies) == 10
+    assert len(submission._comments_by_id) == 160
+    assert 't1_c0' in submission._comments_by_id
+
+
+def test_praw3_replace_more_comments_concurrent_limit(reddit):
+
+    # The limit counts requests, like the serial path. The first MoreComments
+    # fills one request, and the second one doesn't fit into what's left.
+    submission, request_json = build_submission(reddit)
+    with mock.patch.object(reddit, 'request_json') as func:
+        func.side_effect = request_json
+        remaining = submission.replace_more_comments(limit=1, max_workers=4)
+
+    assert func.call_count == 1
+    assert len(submission.comments) == 100
+    assert sorted(more.count for more in remaining) == [10, 50]
+
+    # When only some of the children fit, the rest are left behind
+    submission, request_json = build_submission(reddit)
+    children = ['x%d' % i for i in range(150)]
+    submission._update_comments([MoreComments(reddit, {
+        'count': 150, 'children': children, 'parent_id': 't3_abc',
+        'name': 't1_more', 'id': 'more'})])
+    with mock.patch.object(reddit, 'request_json') as func:
+        func.side_effect = request_json
+        remaining = submission.replace_more_comments(limit=1, max_workers=4)
+
+    assert func.call_count == 1
+    assert len(submission.comments) == 100
+    assert [more.children for more in remaining] == [children[100:]]
+    assert remaining[0].count == 50
+
+
+def test_praw3_json_loads():
+
+    text = '{"a": [{"b": 1}, {"c": {"d": 2}}], "e": "f"}'
+
+    def hook(calls):
+        def object_hook(obj):
+            calls.append(sorted(obj))
+            return obj
+        return object_hook
+
+    # The object hook should be called in the same order as json.loads
+    expected, calls = [], []
+    data = json.loads(text, object_hook=hook(expected))
+    assert internal._json_loads(text, hook(calls)) == data
+    assert calls == expected
+
+    with mock.patch.object(internal, '_fast_json', None):
+        calls = []
+        assert internal._json_loads(text, hook(calls)) == data
+        assert calls == expected
+
+
+def test_praw3_decode_html_entities(reddit):
+
+    assert reddit.config.decode_html_entities is True
+    assert internal._decode_html_entities('a &amp;amp; b &lt;') == 'a &amp; b <'
+    assert internal._decode_html_entities('no entities') == 'no entities'
+
+    with mock.patch.object(reddit.config, 'decode_html_entities', False), \
+            mock.patch.object(reddit.handler, 'request') as request:
+        request.return_value.status_code = 200
+        request.return_value.text = '{"a": "&amp;"}'
+        assert reddit.request_json('https://www.reddit.com/x') == {'a': '&amp;'}
+
+
+def test_praw3_run_in_worker():
+
+    threads = []
+
+    def work(value):
+        threads.append(threading.current_thread())
+        if value is None:
+            raise ValueError('failed')
+        return value * 2
+
+    # From the main thread the function is sent to a worker
+    assert internal._run_in_worker(work, 2) == 4
+    assert threads[-1] is not threading.current_thread()
+    with pytest.raises(ValueError):
+        internal._run_in_worker(work, None)
+
+    # From any other thread it's called directly
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append((internal._run_in_worker(work, 3),
+                                      threads[-1] is threading.current_thread())))
+    thread.start()
+    thread.join()
+    assert result == [(6, True)]
+
+
+def test_praw3_discard_fields(reddit):
+
+    assert 'all_awardings' in reddit.config.discard_fields
+
+    json_dict = {'id': 'abc', 'body': 'text', 'all_awardings': [{}],
+                 'author': 'someone', 'subreddit': 'python', 'replies': ''}
+    first = Comment(reddit, json_dict)
+    second = Comment(reddit, dict(json_dict, id='def'))
+
+    assert first.body == 'text'
+    assert not hasattr(first, 'all_awardings')
+
+    # Comments by the same author in the same subreddit share placeholders
+    assert first.author is second.author
+    assert first.subreddit is second.subreddit
+    assert first.author.name == 'someone'
@@ -6,6 +6,8 @@ import curses
 import pytest
 
 from tuir.page import Page, PageController, PageStack, logged_in
+from tuir.content import Content, RequestHeaderRateLimiter
+from tuir.objects import Navigator
 
 try:
     from unittest import mock
@@ -13,10 +15,40 @@ except ImportError:
     import mock
 
 
+class ListContent(Content):
+    """
+    Content with the given number of single row items.
+    """
+    name = '/r/python'
+    order = None
+    query = None
+
+    def __init__(self, n_items):
+        self.n_items = n_items
+
+    @property
+    def range(self):
+        return 0, self.n_items - 1
+
+    def get(self, index, n_cols=70):
+        if not 0 <= index < self.n_items:
+            raise IndexError
+        return {'n_rows': 1, 'h_offset': 0, 'title': str(index)}
+
+
+class ListPage(Page):
+    BANNER = '[1]hot [2]new'
+    FOOTER = '[?]Help'
+
+    def _draw_item(self, win, data, inverted):
+        self.term.add_line(win, data['title'], 0, 0)
+
+
 def test_page_logged_in(terminal):
 
     page = mock.MagicMock()
     page.term = terminal
+    page.content.saved_at = None
 
     @logged_in
     def func(_):
@@ -36,6 +68,13 @@ def test_page_logged_in(terminal):
     message = 'Not logged in'.encode('utf-8')
     terminal.stdscr.subwin.addstr.assert_called_with(1, 1, message)
 
+    # So does a thread that's displayed from a snapshot
+    page.reddit.is_oauth_session.return_value = True
+    page.content.saved_at = 1500000000.0
+    func(page)
+    message = 'Not available for a saved copy'.encode('utf-8')
+    terminal.stdscr.subwin.addstr.assert_called_with(1, 1, message)
+
 
 def test_page_unauthenticated(reddit, terminal, config, oauth):
 
@@ -191,3 +230,118 @@ def test_page_back_button(reddit, terminal, config, oauth):
     PageStack.current_page().controller.trigger('h')
     assert PageStack.size() == 1
     assert PageStack.current_page() is page1
+
+
+def test_page_draw_cursor_only(terminal, config):
+
+    page = ListPage(None, terminal, config, None)
+    page.content = ListContent(100)
+    page.nav = Navigator(lambda i: 0 <= i < 100)
+    page.term.set_theme()
+
+    with mock.patch.object(page, '_draw_header'), \
+            mock.patch.object(page, '_draw_item'), \
+            mock.patch.object(terminal, 'clear_screen'):
+
+        page.draw()
+        assert page._draw_header.call_count == 1
+        n_items = len(page._subwindows)
+        assert page._draw_item.call_count == n_items
+
+        # Moving the cursor only repaints the old and new selected items
+        page._draw_item.reset_mock()
+        with mock.patch.object(page, 'clear_input_queue'):
+            page.move_cursor_down()
+        page.draw()
+        assert page._draw_header.call_count == 1
+        assert page._draw_item.call_count == 2
+        assert terminal.clear_screen.call_count == 1
+        assert curses.doupdate.called
+
+        # Other commands, or resizing the terminal, lay out the whole page
+        page._draw_item.reset_mock()
+        page.draw()
+        assert page._draw_header.call_count == 2
+        assert page._draw_item.call_count == n_items
+
+        page._draw_item.reset_mock()
+        with mock.patch.object(page, 'clear_input_queue'):
+            page.move_cursor_down()
+        terminal.stdscr.nlines = 20
+        page.draw()
+        assert page._draw_header.call_count == 3
+
+
+def test_page_draw_cancel_inverted(terminal, config):
+
+    page = ListPage(None, terminal, config, None)
+    page.content = ListContent(3)
+    page.term.set_theme()
+
+    # Scrolled to the bottom of a page that doesn't fill up the screen
+    page.nav = Navigator(page.content.get, page_index=2, inverted=True)
+
+    with mock.patch.object(page.content, 'get', wraps=page.content.get):
+        page.draw()
+
+        # The page is flipped without measuring each item a second time
+        assert page.nav.position == (0, 2, False)
+        assert [d['title'] for _, d, _ in page._subwindows] == ['0', '1', '2']
+        assert page.content.get.call_count == 4  # Includes the IndexError
+
+
+def test_page_wait_background_content(terminal, config):
+
+    page = ListPage(None, terminal, config, None)
+    page.content = ListContent(100)
+    page.controller = PageController(page, keymap=config.keymap)
+    page.nav = Navigator(page.content.get, page_index=10, cursor_index=2)
+
+    pending = mock.PropertyMock()
+    with mock.patch.object(ListContent, 'pending', pending), \
+            mock.patch.object(page.content, 'update') as update, \
+            mock.patch.object(page, 'draw'):
+
+        # Nothing has finished yet, then three items replace one above the
+        # cursor and one item is added below it
+        pending.return_value = True
+        update.side_effect = [[], [(5, 2), (50, 1)]]
+        terminal.stdscr.getch.return_value = -1
+
+        page.wait()
+        assert update.call_count == 2
+        assert terminal.stdscr.timeout.call_args_list[-1] == mock.call(-1)
+
+        # The cursor stays on the same item
+        assert page.nav.absolute_index == 14
+        assert page.nav.position == (12, 2, False)
+
+
+def test_page_wait_rate_limit_status(terminal, config):
+
+    reddit = mock.Mock(handler=RequestHeaderRateLimiter(), user=None)
+    page = ListPage(reddit, terminal, config, None)
+    page.content = ListContent(100)
+    page.nav = Navigator(page.content.get)
+    page.draw()
+
+    handler = reddit.handler
+    keys = [-1, -1, ord('j')]
+
+    def getch():
+        if len(keys) == 2:
+            # A prefetch request is held back by the rate limiter, and then
+            # sent on the next poll
+            handler._waiting[handler.BACKGROUND] = 0
+        return keys.pop(0)
+
+    with mock.patch.object(page, '_draw_footer',
+                           wraps=page._draw_footer) as draw_footer, \
+            mock.patch.object(terminal.stdscr, 'getch', side_effect=getch):
+        handler._waiting[handler.BACKGROUND] = 1
+        assert page._getch() == ord('j')
+
+    # Only the footer was drawn again, when the status appeared and when it
+    # went away
+    assert draw_footer.call_count == 2
+    assert page._drawn_status == ''
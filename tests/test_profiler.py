@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import sys
+import json
+from collections import OrderedDict
+
+import six
+
+from tuir import profiler
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def test_profiler_disabled():
+
+    assert not profiler.is_enabled()
+    with profiler.span('draw'):
+        pass
+    profiler.count('http.cache_hit')
+
+    stream = six.StringIO()
+    profiler.report(stream)
+    assert stream.getvalue() == ''
+
+
+def test_profiler_nested_spans(tmpdir):
+
+    filename = os.path.join(str(tmpdir), 'profile.jsonl')
+    profiler.enable(filename)
+    try:
+        @profiler.timed('content.get')
+        def get():
+            with profiler.span('http.request', url='https://reddit.com'):
+                pass
+
+        with profiler.span('draw', page='SubredditPage'):
+            get()
+        profiler.count('http.cache_hit', 3)
+        profiler.count('http.cache_miss')
+
+        text = profiler.summary()
+        assert 'HTTP cache hit rate: 75% of 4 requests' in text
+    finally:
+        stream = six.StringIO()
+        profiler.report(stream)
+
+    assert not profiler.is_enabled()
+    assert 'Profile written to {0}'.format(filename) in stream.getvalue()
+
+    with open(filename) as fp:
+        records = [json.loads(line) for line in fp]
+
+    assert [r.get('name') for r in records] == [
+        'http.request', 'content.get', 'draw', None]
+    assert records[0]['url'] == 'https://reddit.com'
+    assert 'http.request' in records[1]['nested']
+    assert 'content.get' in records[2]['nested']
+    assert records[2]['page'] == 'SubredditPage'
+
+    summary = records[-1]['summary']
+    assert summary['spans']['draw']['count'] == 1
+    assert summary['counters'] == {'http.cache_hit': 3, 'http.cache_miss': 1}
+
+
+def test_profiler_time_imports():
+
+    with mock.patch.object(profiler, '_import_start', None), \
+            mock.patch.object(profiler, '_imports', []), \
+            mock.patch.object(profiler, '_marks', OrderedDict()), \
+            mock.patch('six.moves.builtins.__import__', __import__):
+        profiler.time_imports()
+        for name in ('xml.dom.minidom', 'xml.dom'):
+            sys.modules.pop(name, None)
+        # Loaded through a relative import by xml.dom.minidom
+        sys.modules.pop('xml.dom.minicompat', None)
+        import xml.dom.minidom  # noqa
+        profiler.mark('first page drawn')
+        profiler.mark('first page drawn')
+
+        stream = six.StringIO()
+        profiler.startup_report(stream, threshold=0)
+
+        modules = [(module, depth) for module, depth, _ in profiler._imports]
+        assert modules.index(('xml.dom.minidom', 0)) < modules.index(
+            ('xml.dom.minicompat', 1))
+        assert list(profiler._marks) == ['first page drawn']
+
+    text = stream.getvalue()
+    assert '\nxml.dom.minidom ' in text
+    assert '\n  xml.dom.minicompat ' in text
+    assert 'first page drawn' in text
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import time
+
+from tuir import session
+from tuir.page import PageStack
+from tuir.subreddit_page import SubredditPage
+from tuir.submission_page import SubmissionPage
+from tuir.subscription_page import SubscriptionPage
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def test_session_restore(reddit, terminal, config, oauth, subreddit_page):
+    PageStack.init(subreddit_page)
+
+    # Open the first submission, and then move the cursor on both pages
+    with mock.patch.object(config.history, 'add'):
+        subreddit_page.controller.trigger('l')
+    assert not terminal.loader.exception
+    submission_page = PageStack.current_page()
+    subreddit_page._move_cursor(1)
+    subreddit_page._move_cursor(1)
+    submission_page.draw()
+    submission_page._move_cursor(1)
+
+    # Pages that can't be restored are left out
+    other_page = mock.Mock(spec=SubscriptionPage)
+    other_page.to_session.return_value = None
+
+    data = session.dump([subreddit_page, submission_page, other_page])
+    data = json.loads(json.dumps(data))
+    assert [state['page'] for state in data['pages']] == [
+        'subreddit', 'submission']
+
+    # Restoring the pages shouldn't send any requests
+    reddit.handler.offline = True
+    pages = session.restore(reddit, terminal, config, oauth, data)
+    assert [type(page) for page in pages] == [SubredditPage, SubmissionPage]
+    for page, original in zip(pages, [subreddit_page, submission_page]):
+        assert page.content.saved_at
+        assert page.content.name == original.content.name
+        assert page.content.order == original.content.order
+        assert page.nav.absolute_index == original.nav.absolute_index
+        page.draw()
+
+    # The whole thread is saved, including the comments that weren't displayed
+    assert pages[0].content.range == subreddit_page.content.range
+    assert pages[1].content.range == submission_page.content.range
+
+    # Sessions that were saved in a different format are ignored
+    data['version'] = 0
+    assert session.restore(reddit, terminal, config, oauth, data) == []
+    reddit.handler.offline = False
+
+    # The latest version is downloaded the first time the page is shown
+    page = pages[0]
+    with mock.patch.object(page, '_getch', return_value=-1):
+        page.wait()
+    assert page._resume is None
+    assert page.content.pending
+
+    for _ in range(100):
+        if page._update_content():
+            break
+        time.sleep(0.1)
+    assert not page.content.saved_at
+    assert page.content.get(0)['object'] is not None
+    page.draw()
+
+
+def test_session_restore_invalid(reddit, terminal, config, oauth):
+    data = {'version': session.VERSION, 'saved': time.time(), 'pages': [
+        {'page': 'inbox'},
+        {'page': 'subreddit', 'content': {
+            'name': '/r/python', 'order': None, 'query': None, 'rows': []},
+         'nav': {}}]}
+
+    # A subreddit page without any rows can't be displayed
+    assert session.restore(reddit, terminal, config, oauth, data) == []
+    assert session.restore(reddit, terminal, config, oauth, None) == []
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import time
 import curses
 from collections import OrderedDict
 
 import pytest
+import requests
 
-from tuir.page import PageStack
+from tuir.page import Page, PageStack
+from tuir.cache import SnapshotStore
 from tuir.submission_page import SubmissionPage
+from tuir.subreddit_page import SubredditPage
 from tuir.docs import FOOTER_SUBMISSION
 
 try:
@@ -94,6 +98,65 @@ def test_submission_page_construct(reddit, terminal, config, oauth):
     page.draw()
 
 
+def test_submission_page_snapshot(reddit, terminal, config, oauth):
+    url = ('https://www.reddit.com/r/Python/comments/2xmo63/'
+           'a_python_terminal_viewer_for_browsing_reddit')
+    snapshots = SnapshotStore(':memory:')
+
+    with mock.patch.object(Page, 'snapshots', snapshots):
+        # Leaving a thread saves a copy of all of the comments, including the
+        # ones that haven't been displayed yet, in the background
+        with terminal.loader():
+            page = SubmissionPage(reddit, terminal, config, oauth, url=url)
+        assert terminal.loader.exception is None
+        assert url not in snapshots
+        page.draw()
+        n_rows = len(page.content._comment_data)
+        n_drawn = len(page._subwindows) - 1
+        assert n_drawn < n_rows
+        assert not isinstance(page.content._comment_data[n_drawn], dict)
+
+        page.close()
+        # The rows that weren't displayed are stripped by the writer thread
+        assert not isinstance(page.content._comment_data[n_drawn], dict)
+        assert snapshots.flush(1)
+        comments = snapshots.get(url)['comments']
+        assert len(comments) == n_rows
+        assert comments[-1]['body']
+
+        # Re-opening it displays the copy while the thread is downloaded again
+        with terminal.loader():
+            page = SubmissionPage(reddit, terminal, config, oauth, url=url)
+        assert terminal.loader.exception is None
+        assert page.content.saved_at
+        assert page.content.pending
+        assert page.content.get(0)['object'] is None
+        assert page.content.range == (-1, n_rows - 1)
+        page.draw()
+
+        for _ in range(100):
+            if page._update_content():
+                break
+            time.sleep(0.1)
+        assert not page.content.saved_at
+        assert page.content.get(0)['object'] is not None
+        assert len(page.content._comment_data) == n_rows
+        page.draw()
+
+        # In offline mode only the saved threads can be browsed
+        config['offline'] = True
+        page = SubredditPage(reddit, terminal, config, oauth, 'front')
+        assert page.content.name == 'snapshots'
+        assert url in page.content.get(0)['permalink']
+        with pytest.raises(IndexError):
+            page.content.get(1)
+
+        page = SubmissionPage(reddit, terminal, config, oauth, url=url)
+        assert page.content.saved_at
+        assert not page.content.pending
+        page.draw()
+
+
 def test_submission_refresh(submission_page):
 
     # Should be able to refresh content
@@ -256,37 +319,49 @@ def test_submission_vote(submission_page, refresh_token):
 
         # Upvote
         submission_page.controller.trigger('a')
+        submission_page.writes.join()
         assert upvote.called
         assert data['likes'] is True
 
         # Clear vote
         submission_page.controller.trigger('a')
+        submission_page.writes.join()
         assert clear_vote.called
         assert data['likes'] is None
 
         # Upvote
         submission_page.controller.trigger('a')
+        submission_page.writes.join()
         assert upvote.called
         assert data['likes'] is True
 
         # Downvote
         submission_page.controller.trigger('z')
+        submission_page.writes.join()
         assert downvote.called
         assert data['likes'] is False
 
         # Clear vote
         submission_page.controller.trigger('z')
+        submission_page.writes.join()
         assert clear_vote.called
         assert data['likes'] is None
 
-        # Upvote - exception
-        upvote.side_effect = KeyboardInterrupt
+        # Upvote - exception, the vote is shown until the request fails
+        upvote.side_effect = requests.exceptions.ConnectionError
         submission_page.controller.trigger('a')
+        assert data['likes'] is True
+        submission_page.writes.join()
+        assert submission_page._update_content()
         assert data['likes'] is None
+        assert isinstance(submission_page.term.loader.exception,
+                          requests.exceptions.ConnectionError)
 
         # Downvote - exception
-        downvote.side_effect = KeyboardInterrupt
-        submission_page.controller.trigger('a')
+        downvote.side_effect = requests.exceptions.ConnectionError
+        submission_page.controller.trigger('z')
+        submission_page.writes.join()
+        submission_page._update_content()
         assert data['likes'] is None
 
 
@@ -330,17 +405,21 @@ def test_submission_save(submission_page, refresh_token):
 
         # Save
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
         assert save.called
         assert data['saved'] is True
 
         # Unsave
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
         assert unsave.called
         assert data['saved'] is False
 
         # Save - exception
-        save.side_effect = KeyboardInterrupt
+        save.side_effect = requests.exceptions.ConnectionError
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
+        submission_page._update_content()
         assert data['saved'] is False
 
 
@@ -362,17 +441,21 @@ def test_submission_comment_save(submission_page, terminal, refresh_token):
 
         # Save
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
         assert save.called
         assert data['saved'] is True
 
         # Unsave
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
         assert unsave.called
         assert data['saved'] is False
 
         # Save - exception
-        save.side_effect = KeyboardInterrupt
+        save.side_effect = requests.exceptions.ConnectionError
         submission_page.controller.trigger('w')
+        submission_page.writes.join()
+        submission_page._update_content()
         assert data['saved'] is False
 
 
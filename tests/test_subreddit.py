@@ -64,6 +64,40 @@ def test_subreddit_page_construct_default(reddit, terminal, config, oauth):
     page.draw()
 
 
+def test_subreddit_page_construct_nondefault(reddit, terminal, config, oauth):
+    config['subreddit_format'] = config.COMPACT_FORMAT
+
+    window = terminal.stdscr.subwin
+
+    with terminal.loader():
+        page = SubredditPage(reddit, terminal, config, oauth, '/r/python')
+    assert terminal.loader.exception is None
+    page.draw()
+
+    # Submission, the first one is selected by the cursor
+    data = page.content.get(0)
+    attr = terminal.theme.get('SubmissionTitle', selected=True)
+    window.subwin.addstr.assert_any_call(
+        0, 1, data['title'].encode('utf-8'), attr)
+    text = '/r/{0}'.format(data['subreddit']).encode('utf-8')
+    attr = terminal.theme.get('SubmissionSubreddit', selected=True)
+    window.subwin.addstr.assert_any_call(1, mock.ANY, text, attr)
+    text = str(data['comments']).encode('utf-8')
+    attr = terminal.theme.get('CommentCount', selected=True)
+    window.subwin.addstr.assert_any_call(1, mock.ANY, text, attr)
+
+    # The compiled format is reused until the theme changes
+    renderers = page._renderers
+    assert len(renderers) == 2
+    page.draw()
+    assert page._renderers is renderers
+
+    with mock.patch.object(terminal, 'show_notification'):
+        page.controller.trigger(curses.KEY_F3)
+    assert page._renderers is not renderers
+    assert page._renderer_theme is terminal.theme
+
+
 def test_subreddit_refresh(subreddit_page, terminal):
 
     # Refresh the page with default values
@@ -328,6 +362,20 @@ def test_subreddit_open(subreddit_page, terminal, config):
         assert subreddit_page.open_submission.called
 
 
+def test_subreddit_prefetch_mimetypes(subreddit_page, terminal):
+
+    # The external links that are drawn on the screen are looked up in the
+    # background, selfposts are skipped
+    with mock.patch.object(terminal, 'prefetch_mimetypes') as prefetch:
+        subreddit_page.draw()
+
+    drawn = [data for _, data, _ in subreddit_page._subwindows]
+    urls = prefetch.call_args[0][0]
+    assert urls == [data['url_full'] for data in drawn
+                    if data['url_type'] == 'external']
+    assert 0 < len(urls) < len(drawn)
+
+
 def test_subreddit_open_xpost(subreddit_page, config):
 
     data = subreddit_page.content.get(subreddit_page.nav.absolute_index)
@@ -572,7 +620,8 @@ def test_subreddit_hide_submission(subreddit_page, refresh_token):
 
     # Hide the first submission by pressing the space key
     subreddit_page.controller.trigger(0x20)
-    assert subreddit_page.term.loader.exception is None
+    subreddit_page.writes.join()
+    assert not subreddit_page._update_content()
     data = subreddit_page.get_selected_item()
     assert data['hidden'] is True
 
@@ -582,7 +631,8 @@ def test_subreddit_hide_submission(subreddit_page, refresh_token):
 
     # Now undo the hide by pressing space again
     subreddit_page.controller.trigger(0x20)
-    assert subreddit_page.term.loader.exception is None
+    subreddit_page.writes.join()
+    assert not subreddit_page._update_content()
     data = subreddit_page.get_selected_item()
     assert data['hidden'] is False
 
@@ -12,6 +12,8 @@ import pytest
 
 from tuir.theme import Theme
 from tuir.terminal import Terminal
+from tuir.cache import MimeCache
+from tuir.mime_parsers import BaseMIMEParser
 from tuir.docs import (HELP, REPLY_FILE, COMMENT_EDIT_FILE, TOKEN,
                       SUBMISSION_FILE, SUBMISSION_EDIT_FILE, MESSAGE_FILE)
 from tuir.exceptions import TemporaryFileError, BrowserError
@@ -158,6 +160,27 @@ def test_terminal_clean_ncols(terminal):
     assert text.decode('utf-8') == 'ｈｅｌｌ'
 
 
+def test_terminal_clean_cache(terminal):
+
+    terminal.config['ascii'] = False
+    terminal.CLEAN_CACHE_SIZE = 2
+
+    with mock.patch.object(terminal, '_clean', wraps=terminal._clean) as func:
+        assert terminal.clean('hello', n_cols=4) == b'hell'
+        assert terminal.clean('hello', n_cols=4) == b'hell'
+        assert func.call_count == 1
+
+        # The width and the ascii setting are part of the key
+        assert terminal.clean('hello', n_cols=3) == b'hel'
+        terminal.config['ascii'] = True
+        assert terminal.clean('hello', n_cols=3) == b'hel'
+        assert func.call_count == 3
+
+    # The least recently used strings are discarded
+    assert len(terminal._clean_cache) == 2
+    assert ('hello', 4, False) not in terminal._clean_cache
+
+
 @pytest.mark.parametrize('use_ascii', [True, False])
 def test_terminal_clean_unescape_html(terminal, use_ascii):
 
@@ -368,8 +391,7 @@ def test_terminal_open_link_mailcap(terminal):
     mock_mime_parser = MockMimeParser()
 
     with mock.patch.object(terminal, 'open_browser'), \
-            mock.patch('tuir.terminal.mime_parsers') as mime_parsers:
-        mime_parsers.parsers = [mock_mime_parser]
+            mock.patch('tuir.mime_parsers.parsers', [mock_mime_parser]):
 
         # Pass through to open_browser if media is disabled
         terminal.config['enable_media'] = False
@@ -391,6 +413,50 @@ def test_terminal_open_link_mailcap(terminal):
         terminal.open_browser.reset_mock()
 
 
+def test_terminal_resolve_mimetype(terminal):
+
+    url = 'https://gfycat.com/abcdef'
+
+    class MockMimeParser(object):
+        pattern = re.compile('https://gfycat')
+        get_mimetype = mock.Mock(
+            return_value=('https://giant.gfycat.com/abcdef.webm', 'video/webm'))
+
+    terminal.mime_cache = MimeCache(':memory:')
+    terminal.config['enable_media'] = True
+    with mock.patch('tuir.mime_parsers.parsers',
+                    [MockMimeParser, BaseMIMEParser]):
+
+        # The result is looked up once, and then read from the cache
+        for _ in range(2):
+            assert terminal.resolve_mimetype(url) == (
+                'https://giant.gfycat.com/abcdef.webm', 'video/webm')
+        assert MockMimeParser.get_mimetype.call_count == 1
+        with mock.patch('tuir.terminal.mailcap.findmatch',
+                        return_value=('mpv', 'mpv %s')):
+            assert terminal.get_mailcap_entry(url) == ('mpv', 'mpv %s')
+        assert MockMimeParser.get_mimetype.call_count == 1
+
+        # Guessing from the file extension doesn't need to be cached
+        assert terminal.resolve_mimetype('https://example.com/a.png') == (
+            'https://example.com/a.png', 'image/png')
+        assert len(terminal.mime_cache) == 1
+
+        # Only looked up in the background with the mime_prefetch option, and
+        # the cache isn't checked until the links reach the background thread
+        urls = [url, 'https://gfycat.com/other']
+        with mock.patch.object(terminal.mime_queue, 'submit') as submit, \
+                mock.patch.object(terminal.mime_cache, 'get') as get:
+            terminal.config['mime_prefetch'] = False
+            terminal.prefetch_mimetypes(urls)
+            assert not submit.called
+
+            terminal.config['mime_prefetch'] = True
+            terminal.prefetch_mimetypes(urls)
+            submit.assert_called_with(urls)
+            assert not get.called
+
+
 def test_terminal_open_link_subprocess(terminal):
 
     url = 'http://www.test.com'
@@ -502,7 +568,7 @@ def test_terminal_open_browser_display(terminal):
 def test_terminal_open_browser_display_no_response(terminal):
 
     terminal._display = True
-    with mock.patch('tuir.terminal.Process', autospec=True) as Process:
+    with mock.patch('multiprocessing.Process', autospec=True) as Process:
         Process.return_value.is_alive.return_value = 1
         terminal.open_browser('http://www.test.com')
     assert isinstance(terminal.loader.exception, BrowserError)
@@ -604,6 +670,11 @@ def test_terminal_attr(terminal):
         assert terminal.attr('CursorBlock') == curses.A_REVERSE
         assert terminal.attr('NeutralVote') == curses.A_BOLD
 
+    # The attributes are read from the table built by bind_curses()
+    with mock.patch.object(terminal.theme, 'get') as get:
+        assert terminal.attr('NeutralVote') == curses.A_BOLD
+        assert not get.called
+
 
 def test_terminal_check_theme(terminal):
 
@@ -214,6 +214,23 @@ def test_theme_initialize_attributes(stdscr):
     theme.bind_curses()
 
 
+def test_theme_selected_attributes(stdscr):
+
+    theme = Theme()
+    theme.bind_curses()
+
+    for element in Theme.DEFAULT_ELEMENTS:
+        if element.startswith('@'):
+            continue
+        selected = theme._attribute_map.get('@' + element)
+        if selected is None:
+            continue
+        assert theme.get(element, selected=True) == selected
+        with theme.turn_on_selected():
+            assert theme.get(element) == selected
+        assert theme.get(element) == theme._attribute_map[element]
+
+
 def test_theme_initialize_attributes_monochrome(stdscr):
 
     theme = Theme(use_color=False)
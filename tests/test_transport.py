@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from tuir import transport
+from tuir.content import RequestHeaderRateLimiter
+
+
+def test_transport_build_session():
+
+    session = transport.build_session(pool_size=3)
+    adapter = session.get_adapter('https://www.reddit.com')
+    assert adapter is session.get_adapter('http://i.imgur.com')
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 3
+
+
+def test_transport_shared_session():
+
+    session = transport.configure(pool_size=5)
+    assert transport.get_session() is session
+    assert RequestHeaderRateLimiter().http is session
+
+    # Reconfiguring replaces the session for new handlers
+    assert transport.configure() is not session
+    assert transport.get_session() is not session
+
+
+def test_transport_connection_stats():
+
+    session = transport.build_session()
+    assert transport.connection_stats(session) == {}
+
+    adapter = session.get_adapter('https://i.imgur.com')
+    pool = adapter.poolmanager.connection_from_host(
+        'i.imgur.com', 443, scheme='https')
+    pool.num_requests = 5
+    pool.num_connections = 1
+
+    stats = transport.connection_stats(session)
+    assert stats == {'https://i.imgur.com:443': (5, 1)}
@@ -11,7 +11,6 @@ import logging
 import warnings
 
 import six
-import requests
 
 # Need to check for curses compatibility before performing the tuir imports
 try:
@@ -32,16 +31,24 @@ TUIR_BROWSER, BROWSER = os.environ.get('TUIR_BROWSER'), os.environ.get('BROWSER'
 if TUIR_BROWSER:
     os.environ['BROWSER'] = TUIR_BROWSER
 
+# The imports below are timed by --startup-profile, so the option is checked
+# before they run instead of waiting for the arguments to be parsed
+from . import profiler
+if '--startup-profile' in sys.argv:
+    profiler.time_imports()
+
 from . import docs
 from . import packages
+from . import session
+from . import transport
 from .packages import praw
 from .config import Config, copy_default_config, copy_default_mailcap
 from .theme import Theme
 from .oauth import OAuthHelper
 from .terminal import Terminal
-from .content import RequestHeaderRateLimiter
+from .content import RequestHeaderRateLimiter, UNUSED_FIELDS
 from .objects import curses_session, patch_webbrowser
-from .page import PageStack
+from .page import Page, PageStack
 from .subreddit_page import SubredditPage
 from .submission_page import SubmissionPage
 from .exceptions import ConfigError, SubredditError, SubmissionError
@@ -61,6 +68,8 @@ _logger = logging.getLogger(__name__)
 def main():
     """Main entry point"""
 
+    profiler.mark('imports finished')
+
     # Squelch SSL warnings
     logging.captureWarnings(True)
     if six.PY3:
@@ -82,7 +91,11 @@ def main():
         user = args.get('user')
         token_file = os.path.join(Config.TUIR_DATA_HOME, user + '.refresh-token')
         history_file = os.path.join(Config.TUIR_DATA_HOME, user + '.history.log')
-        config = Config(history_file, token_file)
+        http_cache_file = os.path.join(Config.TUIR_DATA_HOME, user + '.http-cache.db')
+        snapshot_file = os.path.join(Config.TUIR_DATA_HOME, user + '.snapshots.db')
+        session_file = os.path.join(Config.TUIR_DATA_HOME, user + '.session.json')
+        config = Config(history_file, token_file, http_cache_file,
+                        snapshot_file=snapshot_file, session_file=session_file)
     else:
         #single-account
         config = Config()
@@ -125,6 +138,9 @@ def main():
         # Add an empty handler so the logger doesn't complain
         logging.root.addHandler(logging.NullHandler())
 
+    if config['profile']:
+        profiler.enable(config['profile'])
+
     if config['subreddit_format']:
         # If the user has explicitly set a subreddit format, we don't want to
         # try to do something else with the format so we fall out of the if now
@@ -201,8 +217,20 @@ def main():
         print(debug_text)
         return
 
+    # Reopen the pages from the last session, unless something else was
+    # asked for on the command line
+    save_session = config['resume_session'] and not config['offline']
+    resume = save_session and not args.get('link') and not args.get('subreddit')
+
+    Page.snapshots = config.load_snapshots()
+    if config['offline'] and not len(Page.snapshots):
+        print('There are no saved threads to browse in offline mode, enable '
+              'the `snapshots` option to start saving them')
+        return
+
     try:
         with curses_session() as stdscr:
+            profiler.mark('curses started')
 
             term = Terminal(stdscr, config)
 
@@ -217,34 +245,58 @@ def main():
                 # to use depending on if colors are supported or not
                 theme = None
             term.set_theme(theme)
+            term.mime_cache = config.load_mime_cache()
 
             with term.loader('Initializing', catch_exception=False):
+                transport.configure(pool_size=config['http_pool_size'])
+                handler = RequestHeaderRateLimiter(
+                    config.load_http_cache(), offline=config['offline'])
                 reddit = praw.Reddit(user_agent=user_agent,
-                                     decode_html_entities=False,
+                                     decode_in_worker=True,
+                                     discard_fields=UNUSED_FIELDS,
                                      disable_update_check=True,
                                      timeout=10,  # 10 second request timeout
-                                     handler=RequestHeaderRateLimiter())
+                                     handler=handler)
 
             # Dial the request cache up from 30 seconds to 5 minutes
             # I'm trying this out to make navigation back and forth
             # between pages quicker, it may still need to be fine tuned.
             reddit.config.api_request_delay = 300
 
-            # Authorize on launch if the refresh token is present
             oauth = OAuthHelper(reddit, term, config)
-            if config['autologin'] and config.refresh_token:
+
+            # The restored pages are drawn from their saved rows before
+            # anything is sent to reddit, including the login
+            pages = []
+            if resume:
+                pages = session.restore(
+                    reddit, term, config, oauth, config.load_session())
+            for page in pages:
+                PageStack.add(page)
+            if pages:
+                PageStack.current_page().draw()
+
+            # Authorize on launch if the refresh token is present
+            if config['autologin'] and config.refresh_token and \
+                    not config['offline']:
                 oauth.authorize(autologin=True)
 
+            if pages:
+                ps = PageStack()
+                ps.run()
+
             # Open the supplied submission link before opening the subreddit
             if config['link']:
                 # Expand shortened urls like https://redd.it/
                 # Praw won't accept the shortened versions, add the reddit
                 # headers to avoid a 429 response from reddit.com
-                url = requests.head(
-                    config['link'],
-                    headers=reddit.http.headers,
-                    allow_redirects=True
-                ).url
+                url = config['link']
+                if not config['offline']:
+                    url = transport.get_session().head(
+                        url,
+                        headers=reddit.http.headers,
+                        allow_redirects=True
+                    ).url
 
                 page = None
                 with term.loader('Loading submission'):
@@ -281,6 +333,10 @@ def main():
         print(e)
     except Exception as e:
         _logger.exception(e)
+        # Don't reopen the pages that tuir crashed on
+        if save_session:
+            save_session = False
+            config.delete_session()
         import traceback
         exit_message = '\n'.join([
             debug_text,
@@ -294,9 +350,33 @@ def main():
     finally:
         # Try to save the browsing history
         config.save_history()
+        if save_session and PageStack.stack:
+            try:
+                config.save_session(session.dump(PageStack.stack))
+            except Exception as e:
+                _logger.exception(e)
+        # Save the threads that are still open
+        for page in PageStack.stack:
+            try:
+                page.close()
+            except Exception as e:
+                _logger.exception(e)
+        # Give any votes that are still being sent a chance to finish
+        if not Page.writes.join(timeout=5):
+            _logger.warning('Exited before all votes were sent')
         # Ensure sockets are closed to prevent a ResourceWarning
         if 'reddit' in locals():
+            transport.log_connection_stats(reddit.handler.http)
             reddit.handler.http.close()
+            if reddit.handler.disk_cache is not None:
+                reddit.handler.disk_cache.close()
+        if Page.snapshots is not None:
+            Page.snapshots.close()
+        if 'term' in locals() and term.mime_cache is not None:
+            term.mime_cache.close()
+        # Print the timing summary now that the terminal has been restored
+        profiler.report(sys.stdout)
+        profiler.startup_report(sys.stdout)
 
 
 sys.exit(main())
@@ -0,0 +1,722 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+_logger = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+    """
+    In-memory HTTP response cache used by the RequestHeaderRateLimiter.
+
+    This behaves like a dictionary of cache_key -> requests.Response, but
+    keeps a few extra structures around so that none of the operations need
+    to scan the whole cache:
+
+        - Entries are kept in the order that they were stored, so timed out
+          entries can always be popped off of the front.
+        - Entries are also kept in the order that they were last accessed, so
+          the least recently used entry can be evicted when the cache grows
+          past `max_size` bytes.
+        - The keys for each normalized url are indexed so that ``evict()``
+          only touches the matching entries.
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        """
+        Params:
+            max_size (int): Maximum number of bytes of response content that
+                will be held in memory.
+        """
+        self.max_size = max_size
+        self.size = 0
+
+        self._lock = threading.RLock()
+        self._timestamps = OrderedDict()  # key -> time stored
+        self._entries = OrderedDict()     # key -> (response, size)
+        self._urls = {}                   # url -> set of keys
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __getitem__(self, key):
+        with self._lock:
+            response, size = self._entries.pop(key)
+            # Mark as the most recently used
+            self._entries[key] = response, size
+        return response
+
+    def __setitem__(self, key, response):
+        size = len(response.content or b'')
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._timestamps[key] = timer()
+            self._entries[key] = response, size
+            self._urls.setdefault(key[0], set()).add(key)
+            self.size += size
+
+            while self.size > self.max_size and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                _logger.debug('Memory cache evicted %s', oldest[0])
+                self._remove(oldest)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def get(self, key, default=None):
+        # The lookup needs to happen under the lock, otherwise the entry could
+        # be expired or evicted by another thread before it's accessed.
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self[key]
+
+    def values(self):
+        with self._lock:
+            return [response for response, _ in self._entries.values()]
+
+    def clear(self):
+        with self._lock:
+            self._timestamps.clear()
+            self._entries.clear()
+            self._urls.clear()
+            self.size = 0
+
+    def expire(self, cache_timeout):
+        """
+        Remove all of the entries that were stored more than `cache_timeout`
+        seconds ago.
+        """
+        now = timer()
+        with self._lock:
+            while self._timestamps:
+                key, timestamp = next(iter(self._timestamps.items()))
+                if now - timestamp <= cache_timeout:
+                    break
+                self._remove(key)
+
+    def evict(self, urls):
+        """
+        Remove all of the entries for the given normalized urls.
+
+        Return the number of items removed.
+        """
+        retval = 0
+        with self._lock:
+            for url in urls:
+                for key in list(self._urls.get(url, ())):
+                    self._remove(key)
+                    retval += 1
+        return retval
+
+    def _remove(self, key):
+        del self._timestamps[key]
+        _, size = self._entries.pop(key)
+        self.size -= size
+
+        keys = self._urls[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._urls[key[0]]
+
+
+class DiskCache(object):
+    """
+    Persistent HTTP response cache, backed by an SQLite database.
+
+    This is used by the RequestHeaderRateLimiter to remember API responses
+    between sessions so that content like the front page and subscriptions
+    can be displayed without waiting on the network. Entries are stored with
+    their own expiration time. Expired entries are not deleted right away;
+    if the server sent an ETag or Last-Modified header they can still be used
+    to make a conditional request and avoid downloading the body again.
+
+    When the total size of the stored responses grows past `max_size` bytes,
+    the least recently used entries are evicted first.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status_code INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            encoding TEXT,
+            content BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_url ON responses (url);
+        CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+    """
+
+    def __init__(self, filename, ttl=300, max_size=50 * 1024 * 1024):
+        """
+        Params:
+            filename (str): Path to the database file, ':memory:' can be used
+                for a temporary database.
+            ttl (float): Default number of seconds that a response will be
+                considered fresh.
+            max_size (int): Maximum number of bytes of response content that
+                will be stored.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.max_size = max_size
+        self.identity = None
+
+        self._lock = threading.Lock()
+        # The prefetch thread can make requests, so the connection needs to be
+        # shared between threads. Access is serialized with the lock.
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+
+    def set_identity(self, refresh_token):
+        """
+        Scope authenticated responses to the account that requested them.
+
+        Only a hash of the refresh token is kept, so credentials are not
+        written to the disk. Passing None (e.g. after logging out) disables
+        caching for authenticated requests until the next login.
+        """
+        if refresh_token:
+            token = refresh_token.encode('utf-8')
+            self.identity = hashlib.sha1(token).hexdigest()
+        else:
+            self.identity = None
+
+    def make_key(self, cache_key):
+        """
+        Convert the handler's cache key into a stable string.
+
+        The OAuth header is replaced with the account identity, since the
+        access token is refreshed every hour and would otherwise invalidate
+        the whole cache between sessions. Returns None for authenticated
+        requests when the account is not known, these should not be cached.
+        """
+        url, (params, data, auth, oauth) = cache_key
+        if oauth and self.identity is None:
+            return None
+        key = repr((url, params, data, auth, self.identity if oauth else None))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key):
+        """
+        Lookup a response in the cache.
+
+        Returns:
+            response (requests.Response): The cached response, or None.
+            fresh (bool): False if the response has expired and needs to be
+                revalidated before it can be used.
+        """
+        key = self.make_key(cache_key)
+        if key is None:
+            return None, False
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, status_code, headers, encoding, content, expires '
+                'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None, False
+            self._db.execute(
+                'UPDATE responses SET accessed = ? WHERE key = ?',
+                (time.time(), key))
+            self._db.commit()
+
+        url, status_code, headers, encoding, content, expires = row
+        response = Response()
+        response.url = url
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = bytes(content)
+        return response, time.time() < expires
+
+    def set(self, cache_key, response):
+        """
+        Store a response in the cache, evicting old entries if the cache has
+        grown past its size limit.
+        """
+        key = self.make_key(cache_key)
+        if key is None:
+            return
+        url = cache_key[0]
+        content = response.content or b''
+        headers = json.dumps(dict(response.headers))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?,?,?)',
+                (key, url, response.status_code, headers, response.encoding,
+                 sqlite3.Binary(content), len(content), now + self.ttl, now))
+            self._evict_lru()
+            self._db.commit()
+
+    def touch(self, cache_key):
+        """
+        Mark an entry as fresh again after a successful revalidation.
+        """
+        key = self.make_key(cache_key)
+        if key is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'UPDATE responses SET expires = ?, accessed = ? WHERE key = ?',
+                (now + self.ttl, now, key))
+            self._db.commit()
+
+    def expire(self):
+        """
+        Mark all of the entries as stale. They will be revalidated the next
+        time that they are requested.
+        """
+        with self._lock:
+            self._db.execute('UPDATE responses SET expires = 0')
+            self._db.commit()
+
+    def evict(self, urls):
+        """
+        Remove all entries for the given normalized urls.
+
+        Return the number of items removed.
+        """
+        retval = 0
+        with self._lock:
+            for url in urls:
+                cursor = self._db.execute(
+                    'DELETE FROM responses WHERE url = ?', (url,))
+                retval += cursor.rowcount
+            self._db.commit()
+        return retval
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _evict_lru(self):
+        """
+        Delete the least recently used entries until the cache fits inside
+        of the size limit. Must be called while holding the lock.
+        """
+        total, = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if total <= self.max_size:
+            return
+
+        rows = self._db.execute(
+            'SELECT key, size FROM responses ORDER BY accessed ASC').fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', stale)
+        _logger.debug('Disk cache evicted %s entries', len(stale))
+
+    @staticmethod
+    def validators(response):
+        """
+        Return the conditional request headers that can be used to revalidate
+        a cached response.
+        """
+        headers = {}
+        etag = response.headers.get('etag')
+        if etag:
+            headers['If-None-Match'] = etag
+        last_modified = response.headers.get('last-modified')
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def __len__(self):
+        with self._lock:
+            count, = self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()
+        return count
+
+    def __contains__(self, cache_key):
+        key = self.make_key(cache_key)
+        if key is None:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+
+class SnapshotStore(object):
+    """
+    Saved copies of the comment threads that have been opened, backed by an
+    SQLite database.
+
+    Unlike the DiskCache, which stores the raw API responses, a snapshot
+    holds the rows that were displayed by the SubmissionContent, including
+    any "more comments" that were expanded. A thread can be drawn straight
+    from its snapshot without waiting on the network or rebuilding the
+    comment tree, and snapshots can be browsed when there's no connection.
+
+    When the total size of the snapshots grows past `max_size` bytes, the
+    least recently opened threads are evicted first.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            key TEXT PRIMARY KEY,
+            submission TEXT NOT NULL,
+            comments TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            saved REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS snapshots_accessed ON snapshots (accessed);
+    """
+
+    # Matches the submission id in permalinks and shortened links
+    RE_SUBMISSION_ID = re.compile(r'(?:/comments/|redd\.it/)([a-z0-9]+)')
+
+    def __init__(self, filename, max_size=50 * 1024 * 1024):
+        """
+        Params:
+            filename (str): Path to the database file, ':memory:' can be used
+                for a temporary database.
+            max_size (int): Maximum number of bytes of snapshot data that will
+                be stored.
+        """
+        self.filename = filename
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+
+        # Snapshots waiting to be written by the background thread, by key
+        self._condition = threading.Condition()
+        self._queue = OrderedDict()
+        self._writing = False
+        self._writer = None
+
+    @classmethod
+    def make_key(cls, url):
+        """
+        Return the id of the submission that the url points to, or None if
+        it can't be determined from the url alone.
+        """
+        match = cls.RE_SUBMISSION_ID.search(url or '')
+        return match.group(1) if match else None
+
+    def get(self, url):
+        """
+        Lookup the snapshot of the submission at the given url.
+
+        Returns:
+            snapshot (dict): The state saved by SubmissionContent.to_snapshot()
+                with an added `saved` timestamp, or None.
+        """
+        key = self.make_key(url)
+        if key is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT submission, comments, saved FROM snapshots '
+                'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                'UPDATE snapshots SET accessed = ? WHERE key = ?',
+                (time.time(), key))
+            self._db.commit()
+
+        submission, comments, saved = row
+        snapshot = json.loads(submission)
+        snapshot['comments'] = json.loads(comments)
+        snapshot['saved'] = saved
+        return snapshot
+
+    def set(self, snapshot):
+        """
+        Store a snapshot, replacing any earlier snapshot of the same thread.
+        """
+        key = self.make_key(snapshot['submission']['permalink'])
+        if key is None:
+            return
+
+        comments = json.dumps(snapshot['comments'])
+        submission = json.dumps(dict(
+            (k, v) for k, v in snapshot.items() if k != 'comments'))
+        size = len(comments) + len(submission)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO snapshots VALUES (?,?,?,?,?,?)',
+                (key, submission, comments, size, now, now))
+            self._evict_lru()
+            self._db.commit()
+
+    def submit(self, snapshot, prepare=None):
+        """
+        Store a snapshot on a background thread, so that encoding and writing
+        a large thread doesn't hold up the UI. A snapshot of the same thread
+        that's still waiting to be written is replaced.
+
+        Params:
+            snapshot (dict): The state returned by
+                SubmissionContent.to_snapshot()
+            prepare (function): If given, it's called with the snapshot on the
+                background thread and its return value is written instead.
+        """
+        key = self.make_key(snapshot['submission']['permalink'])
+        if key is None:
+            return
+
+        with self._condition:
+            self._queue.pop(key, None)
+            self._queue[key] = (snapshot, prepare)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run)
+                self._writer.daemon = True
+                self._writer.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait for the submitted snapshots to be written. Returns False if they
+        didn't finish before the timeout.
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._queue or self._writing:
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _run(self):
+        """
+        Runs on the background thread, writes the submitted snapshots.
+        """
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _, (snapshot, prepare) = self._queue.popitem(last=False)
+                self._writing = True
+
+            try:
+                if prepare is not None:
+                    snapshot = prepare(snapshot)
+                self.set(snapshot)
+            except Exception as e:
+                _logger.info('Snapshot writer caught: %s - %s',
+                             type(e).__name__, e)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def list(self):
+        """
+        Return the submission data for every saved thread, starting with the
+        most recently saved.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT submission FROM snapshots ORDER BY saved DESC'
+            ).fetchall()
+        return [json.loads(submission)['submission'] for submission, in rows]
+
+    def clear(self):
+        """
+        Remove all of the snapshots.
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM snapshots')
+            self._db.commit()
+
+    def close(self):
+        if not self.flush(timeout=5):
+            _logger.warning('Exited before all snapshots were saved')
+        with self._lock:
+            self._db.close()
+
+    def _evict_lru(self):
+        """
+        Delete the least recently opened snapshots until the store fits inside
+        of the size limit. Must be called while holding the lock.
+        """
+        total, = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM snapshots').fetchone()
+        if total <= self.max_size:
+            return
+
+        rows = self._db.execute(
+            'SELECT key, size FROM snapshots ORDER BY accessed ASC').fetchall()
+        stale = []
+        for key, size in rows[:-1]:
+            if total <= self.max_size:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM snapshots WHERE key = ?', stale)
+        _logger.debug('Snapshot store evicted %s entries', len(stale))
+
+    def __len__(self):
+        with self._lock:
+            count, = self._db.execute(
+                'SELECT COUNT(*) FROM snapshots').fetchone()
+        return count
+
+    def __contains__(self, url):
+        key = self.make_key(url)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM snapshots WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+
+class MimeCache(object):
+    """
+    The content type that each media link resolved to, backed by an SQLite
+    database.
+
+    Most of the MIME parsers have to download and scrape the linked page to
+    find the media inside of it. Remembering the result lets the player be
+    launched right away when the same link is opened again, or when it was
+    already looked up in the background while the user was browsing.
+
+    Entries expire after `ttl` seconds, since some sites link to media
+    through urls that stop working after a while. Expired entries are deleted
+    whenever a new entry is stored.
+
+    Links that didn't resolve to media (no content type, or an html page) are
+    often caused by a temporary error or rate limit on the other site. These
+    are only kept in memory for `negative_ttl` seconds so that they will be
+    tried again soon, and are never written to the disk.
+    """
+
+    NEGATIVE_TYPES = (None, 'text/html')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mimetypes (
+            url TEXT PRIMARY KEY,
+            modified_url TEXT,
+            content_type TEXT,
+            expires REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS mimetypes_expires ON mimetypes (expires);
+    """
+
+    def __init__(self, filename, ttl=86400, negative_ttl=300):
+        """
+        Params:
+            filename (str): Path to the database file, ':memory:' can be used
+                for a temporary database.
+            ttl (float): Number of seconds that each entry will be kept.
+            negative_ttl (float): Number of seconds that links which didn't
+                resolve to media will be kept.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._lock = threading.Lock()
+        self._negative = {}  # url -> (modified_url, content_type, expires)
+        # Links are looked up by a background thread, see objects.MimeQueue
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+
+    def get(self, url):
+        """
+        Lookup the result of the MIME parser for the given url.
+
+        Returns:
+            result (tuple): The (modified_url, content_type) returned by the
+                parser, or None if the url hasn't been resolved or the entry
+                has expired.
+        """
+        now = time.time()
+        with self._lock:
+            if url in self._negative:
+                modified_url, content_type, expires = self._negative[url]
+                if expires > now:
+                    return modified_url, content_type
+                del self._negative[url]
+            row = self._db.execute(
+                'SELECT modified_url, content_type FROM mimetypes '
+                'WHERE url = ? AND expires > ?', (url, now)).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, url, modified_url, content_type):
+        """
+        Store the result of the MIME parser for the given url.
+        """
+        now = time.time()
+        with self._lock:
+            if content_type in self.NEGATIVE_TYPES:
+                self._negative[url] = (
+                    modified_url, content_type, now + self.negative_ttl)
+                return
+            self._negative.pop(url, None)
+            self._db.execute('DELETE FROM mimetypes WHERE expires <= ?', (now,))
+            self._db.execute(
+                'INSERT OR REPLACE INTO mimetypes VALUES (?,?,?,?)',
+                (url, modified_url, content_type, now + self.ttl))
+            self._db.commit()
+
+    def clear(self):
+        """
+        Remove all of the entries.
+        """
+        with self._lock:
+            self._negative.clear()
+            self._db.execute('DELETE FROM mimetypes')
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            count, = self._db.execute(
+                'SELECT COUNT(*) FROM mimetypes').fetchone()
+            return count + len(self._negative)
+
+    def __contains__(self, url):
+        return self.get(url) is not None
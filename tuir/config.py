@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 import os
+import json
 import codecs
 import shutil
 import argparse
@@ -33,15 +34,25 @@ class Config(object):
     MAILCAP = os.path.join(TUIR_CONFIG_HOME, 'mailcap')
     TOKEN = os.path.join(TUIR_DATA_HOME, 'refresh-token')
     HISTORY = os.path.join(TUIR_DATA_HOME, 'history.log')
+    HTTP_CACHE = os.path.join(TUIR_DATA_HOME, 'http-cache.db')
+    SNAPSHOTS = os.path.join(TUIR_DATA_HOME, 'snapshots.db')
+    SESSION = os.path.join(TUIR_DATA_HOME, 'session.json')
+    MIME_CACHE = os.path.join(TUIR_DATA_HOME, 'mime-cache.db')
     THEMES = os.path.join(TUIR_CONFIG_HOME, 'themes')
 
     COMPACT_FORMAT = "%t\n" \
             "<%i|%s%v|%cC> %r%e %a %S %F"
 
-    def __init__(self, history_file=HISTORY, token_file=TOKEN, **kwargs):
+    def __init__(self, history_file=HISTORY, token_file=TOKEN,
+                 http_cache_file=HTTP_CACHE, snapshot_file=SNAPSHOTS,
+                 session_file=SESSION, mime_cache_file=MIME_CACHE, **kwargs):
 
         self.history_file = history_file
         self.token_file = token_file
+        self.http_cache_file = http_cache_file
+        self.snapshot_file = snapshot_file
+        self.session_file = session_file
+        self.mime_cache_file = mime_cache_file
         self.config = kwargs
 
         default, bindings = self.get_file(self.DEFAULT_CONFIG)
@@ -102,6 +113,75 @@ class Config(object):
             os.remove(self.history_file)
         self.history = OrderedSet()
 
+    def load_session(self):
+        """
+        Return the pages that were open when tuir last exited, see session.py
+        """
+        if not os.path.exists(self.session_file):
+            return None
+        try:
+            with codecs.open(self.session_file, encoding='utf-8') as fp:
+                return json.load(fp)
+        except ValueError:
+            # The file is truncated if tuir was killed while writing it
+            return None
+
+    def save_session(self, session):
+        self._ensure_filepath(self.session_file)
+        with codecs.open(self.session_file, 'w+', encoding='utf-8') as fp:
+            fp.write(json.dumps(session, ensure_ascii=False))
+
+    def delete_session(self):
+        if os.path.exists(self.session_file):
+            os.remove(self.session_file)
+
+    def load_http_cache(self):
+        """
+        Open the persistent HTTP response cache, if it has been enabled.
+        """
+        if not self['http_cache']:
+            return None
+
+        from .cache import DiskCache
+
+        self._ensure_filepath(self.http_cache_file)
+        return DiskCache(
+            self.http_cache_file,
+            ttl=self['http_cache_ttl'],
+            max_size=self['http_cache_size'] * 1024 * 1024)
+
+    def load_snapshots(self):
+        """
+        Open the store of saved comment threads, if it has been enabled or if
+        tuir is running in offline mode.
+        """
+        if not self['snapshots'] and not self['offline']:
+            return None
+
+        from .cache import SnapshotStore
+
+        self._ensure_filepath(self.snapshot_file)
+        return SnapshotStore(
+            self.snapshot_file,
+            max_size=self['snapshot_size'] * 1024 * 1024)
+
+    def load_mime_cache(self):
+        """
+        Open the cache of media link lookups if media links are opened with
+        mailcap. Without the mime_cache option, the lookups are only kept in
+        memory until tuir exits.
+        """
+        if not self['enable_media'] or self['offline']:
+            return None
+
+        from .cache import MimeCache
+
+        if not self['mime_cache']:
+            return MimeCache(':memory:', ttl=self['mime_cache_ttl'])
+
+        self._ensure_filepath(self.mime_cache_file)
+        return MimeCache(self.mime_cache_file, ttl=self['mime_cache_ttl'])
+
     @staticmethod
     def get_args():
         """
@@ -161,6 +241,18 @@ class Config(object):
             'oauth_scope': lambda x: tuir[x].split(','),
             'max_comment_cols': partial(config.getint, section),
             'max_pager_cols': partial(config.getint, section),
+            'expand_comments': partial(config.getint, section),
+            'prefetch_distance': partial(config.getint, section),
+            'http_cache': partial(config.getboolean, section),
+            'http_cache_ttl': partial(config.getint, section),
+            'http_cache_size': partial(config.getint, section),
+            'http_pool_size': partial(config.getint, section),
+            'snapshots': partial(config.getboolean, section),
+            'snapshot_size': partial(config.getint, section),
+            'resume_session': partial(config.getboolean, section),
+            'mime_cache': partial(config.getboolean, section),
+            'mime_cache_ttl': partial(config.getint, section),
+            'mime_prefetch': partial(config.getboolean, section),
             'hide_username': partial(config.getboolean, section),
             'flash': partial(config.getboolean, section),
             'force_new_browser_window': partial(config.getboolean, section)
@@ -212,6 +304,15 @@ def build_parser():
     parser.add_argument(
         '--log', metavar='FILE', action='store',
         help='Log HTTP requests to the given file')
+    parser.add_argument(
+        '--profile', metavar='FILE', action='store',
+        help='Record timings of screen draws and HTTP requests to the given '
+             'file, and print a summary on exit')
+    parser.add_argument(
+        '--startup-profile', dest='startup_profile', action='store_const',
+        const=True,
+        help='Print how long each module took to import, and how long it '
+             'took to draw the first page, on exit')
     parser.add_argument(
         '--config', metavar='FILE', action='store',
         help='Load configuration settings from the given file')
@@ -253,6 +354,10 @@ def build_parser():
     parser.add_argument(
         '--no-flash', dest='flash', action='store_const', const=False,
         help='Disable screen flashing')
+    parser.add_argument(
+        '--offline', dest='offline', action='store_const', const=True,
+        help='Browse the saved copies of previously opened threads without '
+             'connecting to reddit')
     parser.add_argument(
         '--debug-info', dest='debug_info', action='store_const', const=True,
         help='Show system and environment information and exit')
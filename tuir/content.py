@@ -4,14 +4,22 @@ from __future__ import unicode_literals
 import re
 import time
 import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from timeit import default_timer as timer
+from functools import partial
 
 import six
-from bs4 import BeautifulSoup
+from six.moves import html_parser, html_entities
 from kitchen.text.display import wrap
 
 from . import exceptions
+from . import profiler
+from .objects import (
+    NullLoader, get_request_lane, request_lane, set_request_lane)
+from .cache import ResponseCache
+from .transport import get_session
 from .config import Config
 from .packages import praw
 from .packages.praw.errors import InvalidSubreddit
@@ -20,9 +28,29 @@ from .packages.praw.handlers import DefaultHandler
 
 _logger = logging.getLogger(__name__)
 
+# Fields in reddit's API responses that tuir never reads. These are the
+# largest ones, mostly nested lists of awards and media previews, and are
+# dropped when the response is decoded instead of being stored on every
+# praw object.
+UNUSED_FIELDS = (
+    'all_awardings', 'author_flair_richtext', 'awarders',
+    'crosspost_parent_list', 'gildings', 'link_flair_richtext', 'media',
+    'media_embed', 'mod_reports', 'preview', 'secure_media',
+    'secure_media_embed', 'treatment_tags', 'user_reports')
+
 
 class Content(object):
 
+    # Counters for the wrapped text cache, see wrap_field()
+    wrap_hits = 0
+    wrap_misses = 0
+
+    # When the content was restored from a saved copy, until the latest
+    # version has been downloaded by revalidate()
+    saved_at = None
+    _revalidating = False
+    _revalidated = ()
+
     def get(self, index, n_cols):
         """
         Grab the item at the given index, and format the text to fit a width of
@@ -30,6 +58,67 @@ class Content(object):
         """
         raise NotImplementedError
 
+    @property
+    def pending(self):
+        """
+        True if there is work running in the background that will change the
+        content when it finishes, see update().
+        """
+        return False
+
+    def update(self):
+        """
+        Apply the results of any background work that has finished.
+
+        Returns a list of (index, n_rows) tuples describing where items were
+        added (or removed, if negative) so the page can keep the cursor on
+        the same item. The index is None if the change isn't visible.
+        """
+        return []
+
+    def revalidate(self, load):
+        """
+        Download the latest version of content that was restored from a saved
+        copy. The new content replaces this one's rows when it's applied by
+        update().
+
+        Params:
+            load (function): Called on a background thread with a loader that
+                doesn't display anything, see objects.NullLoader. Should
+                return a new instance of the same content.
+        """
+        def target():
+            try:
+                with request_lane('background'):
+                    content = load(NullLoader())
+            except Exception as e:
+                _logger.info('Revalidate caught: %s - %s',
+                             type(e).__name__, e)
+                self._revalidated.append((None, e))
+            else:
+                self._revalidated.append((content, None))
+
+        self._revalidating = True
+        self._revalidated = deque()
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+
+    def _pop_revalidated(self, message):
+        """
+        Return the content that was downloaded by revalidate(), or None if
+        the download failed, in which case the error is displayed by the
+        loader.
+        """
+        content, error = self._revalidated.popleft()
+        self._revalidating = False
+        if error is not None:
+            with self._loader(message):
+                raise error
+            return None
+        self.saved_at = None
+        return content
+
     def iterate(self, index, step, n_cols=70):
         """
         Return an iterator that starts and the current index and increments
@@ -84,13 +173,15 @@ class Content(object):
 
         """
 
-        stack = comments[:]
+        # The stack is kept in reverse order so that items can be popped off
+        # of the end, which avoids shifting the whole list for every comment
+        stack = comments[::-1]
         for item in stack:
             item.nested_level = root_level
 
         retval, parent_candidates = [], {}
         while stack:
-            item = stack.pop(0)
+            item = stack.pop()
 
             # The MoreComments item count should never be zero, discard it if
             # it is. Need to look into this further.
@@ -106,12 +197,12 @@ class Content(object):
                 if parent:
                     item.nested_level = parent.nested_level + 1
 
-            # Add all of the attached replies to the front of the stack to be
+            # Add all of the attached replies to the top of the stack to be
             # parsed separately
             if hasattr(item, 'replies'):
                 for n in item.replies:
                     n.nested_level = item.nested_level + 1
-                stack[0:0] = item.replies
+                stack.extend(reversed(item.replies))
 
             # The comment is now a potential parent for the items that are
             # remaining on the stack.
@@ -429,34 +520,161 @@ class Content(object):
             out.extend(lines)
         return out
 
+    def wrap_field(self, data, key, width):
+        """
+        Wrap the text stored in data[key] to the given width.
+
+        The result is saved alongside the data so that it can be reused the
+        next time the item is drawn. It will only be wrapped again if the
+        width (i.e. the terminal was resized) or the text has changed.
+        """
+        text = data[key]
+        cache = data.setdefault('wrap_cache', {})
+        cached = cache.get(key)
+        if cached and cached[0] == width and cached[1] == text:
+            self.wrap_hits += 1
+            return cached[2]
+
+        self.wrap_misses += 1
+        _logger.debug('Wrap cache miss: %s (%s hits, %s misses)',
+                      key, self.wrap_hits, self.wrap_misses)
+        lines = self.wrap_text(text, width)
+        cache[key] = (width, text, lines)
+        return lines
+
     @staticmethod
     def extract_links(html):
         """
         Extract a list of hyperlinks from an HTML document.
         """
-        links = []
-        soup = BeautifulSoup(html, 'html.parser')
-        for link in soup.findAll('a'):
-            href = link.get('href')
-            if not href:
-                continue
-            if href.startswith('/'):
-                href = 'https://www.reddit.com' + href
-            links.append({'text': link.text, 'href': href})
+        parser = _LinkParser()
+        parser.feed(html)
+        parser.close()
+        return parser.links
+
+    def get_links(self, data):
+        """
+        Return the hyperlinks in the item's HTML.
+
+        Like wrap_field(), the result is saved alongside the data so that
+        opening the list of links on the same item again doesn't have to
+        parse the HTML a second time.
+        """
+        html = data['html']
+        cached = data.get('link_cache')
+        if cached and cached[0] == html:
+            return cached[1]
+
+        links = self.extract_links(html)
+        data['link_cache'] = (html, links)
         return links
 
 
+class _LinkParser(html_parser.HTMLParser):
+    """
+    Collect the href and text of every <a> tag in a document, while ignoring
+    the rest of the markup. This is a lot cheaper than building a full tree,
+    which is all that's needed to populate the list of links.
+    """
+
+    def __init__(self):
+        html_parser.HTMLParser.__init__(self)
+        self.links = []
+        # The links that the parser is currently inside of, and the text
+        # that's been collected for each of them
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        href = dict(attrs).get('href')
+        if not href:
+            # Still collects the text, so that the closing tag is matched
+            self._open.append((None, []))
+            return
+        if href.startswith('/'):
+            href = 'https://www.reddit.com' + href
+        link = {'text': '', 'href': href}
+        self.links.append(link)
+        self._open.append((link, []))
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._open:
+            self._close_link()
+
+    def handle_data(self, data):
+        for _, text in self._open:
+            text.append(data)
+
+    def handle_entityref(self, name):
+        # Only called on python 2, python 3 decodes these before handle_data
+        codepoint = html_entities.name2codepoint.get(name)
+        if codepoint is None:
+            self.handle_data('&' + name)
+        else:
+            self.handle_data(six.unichr(codepoint))
+
+    def handle_charref(self, name):
+        # Only called on python 2, python 3 decodes these before handle_data
+        try:
+            if name[0] in 'xX':
+                self.handle_data(six.unichr(int(name[1:], 16)))
+            else:
+                self.handle_data(six.unichr(int(name)))
+        except (ValueError, OverflowError):
+            self.handle_data('&#' + name)
+
+    def close(self):
+        html_parser.HTMLParser.close(self)
+        while self._open:
+            self._close_link()
+
+    def _close_link(self):
+        link, text = self._open.pop()
+        if link is not None:
+            link['text'] = ''.join(text)
+
+
 class SubmissionContent(Content):
     """
     Grab a submission from PRAW and lazily store comments to an internal
     list for repeat access.
     """
 
+    # Row fields that depend on the window size or can't be saved, these are
+    # left out of snapshots and filled in again by get()
+    SNAPSHOT_SKIP_FIELDS = ('object', 'split_title', 'split_text',
+                            'split_body', 'n_rows', 'h_offset', 'wrap_cache',
+                            'link_cache', 'loading')
+
+    # Number of threads used to send the requests for expand_comments
+    EXPAND_WORKERS = 4
+
     def __init__(self, submission, loader, indent_size=2, max_indent_level=8,
-                 order=None, max_comment_cols=120):
+                 order=None, max_comment_cols=120, snapshot=None,
+                 expand_comments=0):
+        """
+        Params:
+            snapshot (dict): If given, the content is restored from a saved
+                copy of the thread (see to_snapshot()) instead of from the
+                submission, which should be None.
+            expand_comments (int): Maximum number of requests to spend
+                loading the "more comments" links before the thread is
+                displayed, see expand_more_comments().
+        """
 
-        submission_data = self.strip_praw_submission(submission)
-        comments = self.flatten_comments(submission.comments)
+        if snapshot is None:
+            if expand_comments:
+                self.expand_more_comments(submission, expand_comments)
+            submission_data = self.strip_praw_submission(submission)
+            comments = self.flatten_comments(submission.comments)
+            self.saved_at = None
+        else:
+            submission_data = self._restore_row(snapshot['submission'])
+            comments = [self._restore_row(row)
+                        for row in snapshot['comments']]
+            order = order or snapshot.get('order')
+            self.saved_at = snapshot.get('saved')
 
         self.indent_size = indent_size
         self.max_indent_level = max_indent_level
@@ -466,12 +684,18 @@ class SubmissionContent(Content):
         self._loader = loader
         self._submission = submission
         self._submission_data = submission_data
-        self._comment_data = [self.strip_praw_comment(c) for c in comments]
+        # Comments are stored as raw PRAW objects and are only stripped the
+        # first time that they are accessed, see get()
+        self._comment_data = comments
         self._max_comment_cols = max_comment_cols
 
+        # Results from "more comments" that are being loaded in the background
+        self._n_loading = 0
+        self._loaded = deque()
+
     @classmethod
     def from_url(cls, reddit, url, loader, indent_size=2, max_indent_level=8,
-                 order=None, max_comment_cols=120):
+                 order=None, max_comment_cols=120, expand_comments=0):
 
         # Reddit forces SSL
         url = url.replace('http:', 'https:')
@@ -487,12 +711,90 @@ class SubmissionContent(Content):
 
         submission = reddit.get_submission(url, comment_sort=order)
         return cls(submission, loader, indent_size, max_indent_level, order,
-                   max_comment_cols)
+                   max_comment_cols, expand_comments=expand_comments)
+
+    @classmethod
+    def expand_more_comments(cls, submission, limit):
+        """
+        Replace the "more comments" links in the submission's comment tree
+        with the comments that they point to, using up to `limit` requests.
+
+        The ids from several links are batched into each request, and the
+        requests are sent from a pool of threads. The pool's requests are
+        tagged with the same lane as the calling thread, so they're scheduled
+        by the rate limiter like the rest of the page load. Links that
+        weren't expanded are put back into the tree so the user can still
+        load them one at a time.
+        """
+        lane = get_request_lane() or 'interactive'
+        unreplaced = submission.replace_more_comments(
+            limit=limit, max_workers=cls.EXPAND_WORKERS,
+            initializer=partial(set_request_lane, lane))
+
+        comments_by_id = submission._comments_by_id
+        for more in unreplaced:
+            if more.parent_id == submission.fullname:
+                submission.comments.append(more)
+            elif more.parent_id in comments_by_id:
+                comments_by_id[more.parent_id].replies.append(more)
+
+    def to_snapshot(self, strip=True):
+        """
+        Return the state of the thread, in a form that can be serialized to
+        JSON and restored with SubmissionContent(None, loader,
+        snapshot=snapshot).
+
+        Params:
+            strip (bool): If False, the comments that the user hasn't scrolled
+                to yet are left as PRAW objects, and finish_snapshot() must be
+                called before the snapshot is serialized. This lets the work
+                of stripping the rest of the thread be done on a background
+                thread.
+        """
+        comments = [self._snapshot_row(row) if isinstance(row, dict) else row
+                    for row in self._comment_data]
+        snapshot = {
+            'submission': self._snapshot_row(self._submission_data),
+            'comments': comments,
+            'order': self.order}
+        if strip:
+            self.finish_snapshot(snapshot)
+        return snapshot
+
+    @classmethod
+    def finish_snapshot(cls, snapshot):
+        """
+        Strip the comments that were left as PRAW objects by
+        to_snapshot(strip=False).
+        """
+        snapshot['comments'] = [
+            row if isinstance(row, dict)
+            else cls._snapshot_row(cls.strip_praw_comment(row))
+            for row in snapshot['comments']]
+        return snapshot
+
+    @classmethod
+    def _snapshot_row(cls, row):
+        data = dict((k, v) for k, v in row.items()
+                    if k not in cls.SNAPSHOT_SKIP_FIELDS)
+        if data['type'] == 'MoreComments':
+            data['body'] = 'More comments'
+        elif data['type'] == 'HiddenComment':
+            data['cache'] = [cls._snapshot_row(r) for r in data['cache']]
+        return data
+
+    @classmethod
+    def _restore_row(cls, data):
+        data['object'] = None
+        if data['type'] == 'HiddenComment':
+            data['cache'] = [cls._restore_row(r) for r in data['cache']]
+        return data
 
     @property
     def range(self):
         return -1, len(self._comment_data) - 1
 
+    @profiler.timed('content.get')
     def get(self, index, n_cols=70):
         """
         Grab the `i`th submission, with the title field formatted to fit inside
@@ -504,19 +806,23 @@ class SubmissionContent(Content):
 
         elif index == -1:
             data = self._submission_data
-            data['split_title'] = self.wrap_text(data['title'], width=n_cols-2)
-            data['split_text'] = self.wrap_text(data['text'], width=n_cols-2)
+            data['split_title'] = self.wrap_field(data, 'title', n_cols-2)
+            data['split_text'] = self.wrap_field(data, 'text', n_cols-2)
             data['n_rows'] = len(data['split_title'] + data['split_text']) + 5
             data['h_offset'] = 0
 
         else:
             data = self._comment_data[index]
+            if not isinstance(data, dict):
+                data = self.strip_praw_comment(data)
+                self._comment_data[index] = data
+
             indent_level = min(data['level'], self.max_indent_level)
             data['h_offset'] = indent_level * self.indent_size
 
             if data['type'] == 'Comment':
                 width = min(n_cols - data['h_offset'], self._max_comment_cols)
-                data['split_body'] = self.wrap_text(data['body'], width=width)
+                data['split_body'] = self.wrap_field(data, 'body', width)
                 data['n_rows'] = len(data['split_body']) + 1
             else:
                 data['n_rows'] = 1
@@ -561,18 +867,91 @@ class SubmissionContent(Content):
             self._comment_data[index:index + 1] = data['cache']
 
         elif data['type'] == 'MoreComments':
-            with self._loader('Loading comments'):
-                # Undefined behavior if using a nested loader here
-                assert self._loader.depth == 1
-                comments = data['object'].comments(update=True)
-            if not self._loader.exception:
-                comments = self.flatten_comments(comments, data['level'])
-                comment_data = [self.strip_praw_comment(c) for c in comments]
-                self._comment_data[index:index + 1] = comment_data
+            # The row is left in place while the comments are downloaded in
+            # the background, they will be spliced in by update(). Rows that
+            # were restored from a snapshot can't be expanded.
+            if not data.get('loading') and data['object'] is not None:
+                data['loading'] = True
+                data['body'] = 'Loading comments'
+                self._n_loading += 1
+                thread = threading.Thread(
+                    target=self._load_more_comments, args=(data,))
+                thread.daemon = True
+                thread.start()
 
         else:
             raise ValueError('%s type not recognized' % data['type'])
 
+    @property
+    def pending(self):
+        return self._n_loading > 0 or self._revalidating
+
+    def update(self):
+        """
+        Replace the "more comments" rows that have finished loading with the
+        new comments, and a snapshot with the latest version of the thread.
+        Errors from the background threads are re-raised here so they can be
+        displayed by the loader.
+        """
+        changes = []
+        if self._revalidated:
+            changes.append((None, 0))
+            content = self._pop_revalidated('Refreshing thread')
+            if content is not None:
+                self.name = content.name
+                self._submission = content._submission
+                self._submission_data = content._submission_data
+                self._comment_data = content._comment_data
+
+        while self._loaded:
+            data, comments, error = self._loaded.popleft()
+            self._n_loading -= 1
+            data['loading'] = False
+            data['body'] = 'More comments'
+
+            rows, index = self._find_row(data)
+            # Changes inside of a collapsed comment tree aren't visible
+            visible_index = index if rows is self._comment_data else None
+
+            if error is not None:
+                changes.append((visible_index, 0))
+                with self._loader('Loading comments'):
+                    raise error
+            elif rows is not None:
+                rows[index:index + 1] = comments
+                changes.append((visible_index, len(comments) - 1))
+        return changes
+
+    def _load_more_comments(self, data):
+        """
+        Runs on a background thread, one for each MoreComments being loaded.
+        """
+        try:
+            with request_lane('background'):
+                comments = data['object'].comments(update=True) or []
+            comments = self.flatten_comments(comments, data['level'])
+        except Exception as e:
+            _logger.info('Load more comments caught: %s - %s',
+                         type(e).__name__, e)
+            self._loaded.append((data, None, e))
+        else:
+            self._loaded.append((data, comments, None))
+
+    def _find_row(self, data, rows=None):
+        """
+        Return the list that contains the given row and its index, searching
+        through the comments that have been collapsed into a HiddenComment.
+        """
+        rows = self._comment_data if rows is None else rows
+        for index, row in enumerate(rows):
+            if row is data:
+                return rows, index
+            if isinstance(row, dict) and row['type'] == 'HiddenComment':
+                found = self._find_row(data, row['cache'])
+                if found[0] is not None:
+                    return found
+        return None, None
+
 
 class SubredditContent(Content):
     """
@@ -581,7 +960,16 @@ class SubredditContent(Content):
     """
 
     def __init__(self, config, name, submissions, loader, order=None,
-                 query=None, filter_nsfw=False):
+                 query=None, filter_nsfw=False, snapshot=None, handler=None):
+        """
+        Params:
+            snapshot (dict): If given, the submissions that had already been
+                loaded are restored from a saved copy of the page (see
+                to_snapshot()), and the generator should be empty.
+            handler (RequestHeaderRateLimiter): The reddit request handler,
+                used to move the prefetch thread's requests ahead of other
+                background requests when the UI has to wait on them.
+        """
 
         self.config = config
         self.name = name
@@ -589,9 +977,22 @@ class SubredditContent(Content):
         self.query = query
         self.filter_nsfw = filter_nsfw
         self._loader = loader
+        self._handler = handler
         self._submissions = submissions
         self._submission_data = []
 
+        if snapshot is not None:
+            self._submission_data = [SubmissionContent._restore_row(row)
+                                     for row in snapshot['rows']]
+            self.saved_at = snapshot.get('saved')
+
+        # Submissions that have been pulled off of the generator by the
+        # background prefetch thread, but haven't been processed yet
+        self.prefetch_distance = self.config['prefetch_distance'] or 0
+        self._prefetched = deque()
+        self._prefetch_thread = None
+        self._prefetch_error = None
+
         if self.config['look_and_feel'] == 'default':
             self.max_title_rows = 4
         else:
@@ -819,7 +1220,69 @@ class SubredditContent(Content):
 
         # We made it!
         return cls(config, display_name, submissions, loader, order=display_order,
-                   query=query, filter_nsfw=filter_nsfw)
+                   query=query, filter_nsfw=filter_nsfw, handler=reddit.handler)
+
+    @classmethod
+    def from_snapshots(cls, config, snapshots, loader):
+        """
+        List the threads that have been saved in the snapshot store, this is
+        the only content that can be browsed in offline mode.
+
+        Params:
+            snapshots (cache.SnapshotStore): The store of saved threads.
+        """
+        return cls(config, 'snapshots', iter(snapshots.list()), loader)
+
+    def to_snapshot(self):
+        """
+        Return the submissions that have been loaded so far, in a form that
+        can be serialized to JSON and restored with the `snapshot` param.
+        """
+        return {
+            'name': self.name,
+            'order': self.order,
+            'query': self.query,
+            'rows': [SubmissionContent._snapshot_row(row)
+                     for row in self._submission_data]}
+
+    def revalidate(self, load):
+        def load_all(loader):
+            # The user is looking at the saved copy until this finishes, so
+            # it shouldn't be held back behind other background requests
+            with self._promote(threading.current_thread()):
+                content = load(loader)
+                # Let the first prefetch finish so that anything it
+                # downloaded, or the error that it raised, is adopted with the
+                # rest of the content instead of by a thread that's still
+                # running
+                if content._prefetch_thread is not None:
+                    with content._promote(content._prefetch_thread):
+                        content._prefetch_thread.join()
+            return content
+
+        super(SubredditContent, self).revalidate(load_all)
+
+    @property
+    def pending(self):
+        return self._revalidating
+
+    def update(self):
+        """
+        Replace a page that was restored from a saved copy with the latest
+        version of the subreddit.
+        """
+        if not self._revalidated:
+            return []
+
+        content = self._pop_revalidated('Refreshing page')
+        if content is not None:
+            self.name = content.name
+            self.filter_nsfw = content.filter_nsfw
+            self._submissions = content._submissions
+            self._submission_data = content._submission_data
+            self._prefetched = content._prefetched
+            self._prefetch_error = content._prefetch_error
+        return [(None, 0)]
 
     @property
     def range(self):
@@ -828,6 +1291,7 @@ class SubredditContent(Content):
         # that we have loaded so far.
         return 0, len(self._submission_data) - 1
 
+    @profiler.timed('content.get')
     def get(self, index, n_cols=70):
         """
         Grab the `i`th submission, with the title field formatted to fit inside
@@ -841,7 +1305,7 @@ class SubredditContent(Content):
         while index >= len(self._submission_data):
             try:
                 with self._loader('Loading more submissions'):
-                    submission = next(self._submissions)
+                    submission = self._next_submission()
                 if self._loader.exception:
                     raise IndexError
             except StopIteration:
@@ -862,7 +1326,10 @@ class SubredditContent(Content):
                 else:
                     nsfw_count = 0
 
-                if hasattr(submission, 'title'):
+                if isinstance(submission, dict):
+                    # Submissions from the snapshot store are already stripped
+                    data = SubmissionContent._restore_row(submission)
+                elif hasattr(submission, 'title'):
                     data = self.strip_praw_submission(submission)
                 else:
                     # when submission is a saved comment
@@ -884,13 +1351,95 @@ class SubredditContent(Content):
         elif self.config['subreddit_format']:
             data['n_rows'] = self.config['subreddit_format'].count('\n') + 1
         else:
-            data['split_title'] = self.wrap_text(data['title'], width=n_cols)
+            data['split_title'] = self.wrap_field(data, 'title', n_cols)
             data['n_rows'] = len(data['split_title']) + 3
 
         data['h_offset'] = 0
 
+        self._start_prefetch(index)
+
         return data
 
+    def _next_submission(self):
+        """
+        Return the next submission from the generator, preferring anything
+        that has already been downloaded by the prefetch thread.
+
+        If the prefetch thread is still running, this will block until it
+        finishes, and its requests are sent ahead of any other background
+        requests in the meantime. Errors that were raised in the background are re-raised here
+        so they can be handled by the loader on the main thread.
+        """
+        if self._prefetched:
+            return self._prefetched.popleft()
+
+        if self._prefetch_thread is not None:
+            with self._promote(self._prefetch_thread):
+                self._prefetch_thread.join()
+            self._prefetch_thread = None
+            if self._prefetched:
+                return self._prefetched.popleft()
+
+        if self._prefetch_error is not None:
+            e, self._prefetch_error = self._prefetch_error, None
+            raise e
+
+        return next(self._submissions)
+
+    @contextmanager
+    def _promote(self, thread):
+        """
+        Treat the thread's requests as interactive for the duration of the
+        block, see RequestHeaderRateLimiter.promote().
+        """
+        if self._handler is None:
+            yield
+        else:
+            with self._handler.promote(thread):
+                yield
+
+    def _start_prefetch(self, index):
+        """
+        Spin off a thread to pull submissions from the generator when the
+        cursor gets within `prefetch_distance` items of the end of the loaded
+        data. PRAW downloads submissions a page at a time, so most of the time
+        this is a no-op that only drains the current page. When the page is
+        exhausted, the request for the next page will happen in the background
+        instead of blocking the UI.
+        """
+        if self.prefetch_distance <= 0:
+            return
+        if self._prefetch_thread is not None:
+            if self._prefetch_thread.is_alive():
+                return
+            self._prefetch_thread = None
+        if self._prefetch_error is not None:
+            return
+
+        n_ahead = len(self._submission_data) + len(self._prefetched) - index
+        if n_ahead > self.prefetch_distance:
+            return
+
+        self._prefetch_thread = threading.Thread(
+            target=self._prefetch, args=(self.prefetch_distance,))
+        self._prefetch_thread.daemon = True
+        self._prefetch_thread.start()
+
+    def _prefetch(self, count):
+        """
+        Runs on the prefetch thread. Note that PRAW isn't thread-safe, so the
+        generator must only be advanced by one thread at a time.
+        """
+        try:
+            with request_lane('background'):
+                for _ in range(count):
+                    self._prefetched.append(next(self._submissions))
+        except StopIteration:
+            pass
+        except Exception as e:
+            _logger.info('Prefetch caught: %s - %s', type(e).__name__, e)
+            self._prefetch_error = e
+
 
 class SubscriptionContent(Content):
 
@@ -938,6 +1487,7 @@ class SubscriptionContent(Content):
     def range(self):
         return 0, len(self._subscription_data) - 1
 
+    @profiler.timed('content.get')
     def get(self, index, n_cols=70):
         """
         Grab the `i`th object, with the title field formatted to fit
@@ -960,7 +1510,7 @@ class SubscriptionContent(Content):
                 self._subscription_data.append(data)
 
         data = self._subscription_data[index]
-        data['split_title'] = self.wrap_text(data['title'], width=n_cols)
+        data['split_title'] = self.wrap_field(data, 'title', n_cols)
         data['n_rows'] = len(data['split_title']) + 1
         data['h_offset'] = 0
 
@@ -1014,6 +1564,7 @@ class InboxContent(Content):
     def range(self):
         return 0, len(self._content_data) - 1
 
+    @profiler.timed('content.get')
     def get(self, index, n_cols=70):
         """
         Grab the `i`th object, with the title field formatted to fit
@@ -1047,7 +1598,7 @@ class InboxContent(Content):
         indent_level = min(data['level'], self.max_indent_level)
         data['h_offset'] = indent_level * self.indent_size
         width = n_cols - data['h_offset']
-        data['split_body'] = self.wrap_text(data['body'], width=width)
+        data['split_body'] = self.wrap_field(data, 'body', width)
         data['n_rows'] = len(data['split_body']) + 2
 
         return data
@@ -1066,35 +1617,208 @@ class RequestHeaderRateLimiter(DefaultHandler):
         https://github.com/praw-dev/prawcore/blob/master/prawcore/rate_limit.py
     """
 
-    def __init__(self):
+    # Scheduling lanes, in order of priority. Interactive requests are made
+    # on the main thread in response to a key press, writes are anything that
+    # modifies reddit (votes, saves, replies), and background requests are
+    # made by worker threads (prefetching, loading more comments).
+    INTERACTIVE, WRITE, BACKGROUND = 0, 1, 2
+    LANES = ('interactive', 'write', 'background')
+
+    # Number of requests in the rate limit budget that background requests
+    # will leave untouched, so the user can keep browsing
+    BACKGROUND_RESERVE = 10
+
+    # Background requests are spread out over the rest of the period once the
+    # remaining budget works out to less than one request per this many
+    # seconds. Reddit's limit of 600 requests every 10 minutes is 1 per second.
+    BACKGROUND_INTERVAL = 1.0
+
+    def __init__(self, disk_cache=None, cache_size=64 * 1024 * 1024,
+                 http=None, offline=False):
+        """
+        Params:
+            disk_cache (cache.DiskCache): Optional persistent cache that will
+                be checked when a response isn't found in the memory cache.
+            cache_size (int): Maximum number of bytes of response content
+                that will be held in the memory cache.
+            http (requests.Session): The session used to send requests,
+                defaults to the connection pool shared with the rest of tuir.
+            offline (bool): Refuse to send any requests, responses that are
+                already cached can still be used.
+        """
+        self.offline = offline
 
         # In PRAW's convention, these variables were bound to the
         # class so the cache could be shared among all of the ``reddit``
         # instances. In TUIR's use-case there is only ever a single reddit
         # instance so it made sense to clean up the globals and transfer them
         # to method variables
-        self.cache = {}
-        self.timeouts = {}
+        self.cache = ResponseCache(max_size=cache_size)
+        self.disk_cache = disk_cache
 
         # These are used for the header rate-limiting
         self.used = None
         self.remaining = None
         self.seconds_to_reset = None
+        self.reset_timestamp = None
         self.next_request_timestamp = None
 
+        # Requests from all threads are scheduled through this condition,
+        # see _acquire() and _release()
+        self._condition = threading.Condition()
+        self._waiting = [0] * len(self.LANES)
+        self._in_flight = 0
+        self._last_background_timestamp = 0
+        # Idents of the worker threads that the main thread is waiting on
+        self._promoted = set()
+
         super(RequestHeaderRateLimiter, self).__init__()
 
-    def _delay(self):
+        # Replace the session created by PRAW with the shared connection pool
+        self.http.close()
+        self.http = http or get_session()
+
+    def _get_lane(self, request):
         """
-        Pause before making the next HTTP request.
+        Pick the scheduling lane for a request.
+
+        Code that makes requests for a specific reason tags them with
+        objects.request_lane(), e.g. the write queue, the prefetch thread, and
+        the "more comments" loader. Untagged requests are classified by their
+        method and the thread that is making them.
         """
-        if self.next_request_timestamp is None:
-            return
+        name = get_request_lane()
+        if name is not None:
+            lane = self.LANES.index(name)
+        elif (request.method not in ('GET', 'HEAD') and
+                '/api/v1/access_token' not in request.url):
+            # Refreshing the OAuth token doesn't modify anything, it's sent
+            # on behalf of whichever request found that the token expired
+            lane = self.WRITE
+        elif threading.current_thread().name == 'MainThread':
+            lane = self.INTERACTIVE
+        else:
+            lane = self.BACKGROUND
 
-        sleep_seconds = self.next_request_timestamp - time.time()
-        if sleep_seconds <= 0:
-            return
-        time.sleep(sleep_seconds)
+        if (lane == self.BACKGROUND and
+                threading.current_thread().ident in self._promoted):
+            return self.INTERACTIVE
+        return lane
+
+    @contextmanager
+    def promote(self, thread):
+        """
+        Send the requests made by a worker thread in the interactive lane
+        while the main thread is blocked waiting on it, e.g. when the user
+        scrolls to the end of the submissions that the prefetch thread is
+        still downloading. Requests that are already waiting are moved over
+        right away.
+        """
+        with self._condition:
+            self._promoted.add(thread.ident)
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._promoted.discard(thread.ident)
+
+    @property
+    def pending(self):
+        """
+        True while there are requests being sent or waiting to be sent.
+        """
+        with self._condition:
+            return bool(self._in_flight or any(self._waiting))
+
+    def _get_wait_time(self, lane, now):
+        """
+        Return the number of seconds that a request in the given lane needs to
+        wait before it can be sent, 0 if it can be sent immediately, or None
+        if it needs to wait until another request has finished.
+        """
+        if self.next_request_timestamp is not None:
+            # The budget is exhausted, every lane waits until the reset
+            if self.next_request_timestamp > now:
+                return self.next_request_timestamp - now
+
+        if any(self._waiting[:lane]):
+            return None
+
+        if lane != self.BACKGROUND or self.remaining is None:
+            return 0
+
+        seconds_left = self.reset_timestamp - now
+        if seconds_left <= 0:
+            # A new period has started, the next response will tell us how
+            # much of the budget is left
+            return 0
+
+        available = self.remaining - self._in_flight - self.BACKGROUND_RESERVE
+        if available <= 0:
+            return seconds_left
+
+        interval = seconds_left / available
+        if interval <= self.BACKGROUND_INTERVAL:
+            return 0
+        return max(self._last_background_timestamp + interval - now, 0)
+
+    def _acquire(self, lane):
+        """
+        Block the calling thread until the scheduler allows a request in the
+        given lane to be sent.
+        """
+        with self._condition:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    if (lane == self.BACKGROUND and
+                            threading.current_thread().ident in self._promoted):
+                        self._waiting[lane] -= 1
+                        lane = self.INTERACTIVE
+                        self._waiting[lane] += 1
+                    wait_time = self._get_wait_time(lane, time.time())
+                    if wait_time == 0:
+                        break
+                    _logger.debug('Delaying %s request for %s seconds',
+                                  self.LANES[lane], wait_time)
+                    self._condition.wait(wait_time)
+            finally:
+                self._waiting[lane] -= 1
+                # Lower priority lanes may have been waiting on this one
+                self._condition.notify_all()
+
+            self._in_flight += 1
+            if lane == self.BACKGROUND:
+                self._last_background_timestamp = time.time()
+
+    def _release(self, response_headers=None):
+        """
+        Record the result of a request and wake up any waiting requests.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if response_headers is not None:
+                self._update(response_headers)
+            self._condition.notify_all()
+
+    def status(self):
+        """
+        Return a short description of the scheduler's queue, or an empty
+        string if no requests are being held back.
+        """
+        with self._condition:
+            n_waiting = sum(self._waiting)
+            if not n_waiting:
+                return ''
+
+            text = '{0} request{1} queued'.format(
+                n_waiting, 's' if n_waiting > 1 else '')
+            if self.next_request_timestamp is not None:
+                seconds = self.next_request_timestamp - time.time()
+                if seconds > 0:
+                    text += ', rate limited for {0}s'.format(int(seconds) + 1)
+            return text
 
     def _update(self, response_headers):
         """
@@ -1124,11 +1848,12 @@ class RequestHeaderRateLimiter(DefaultHandler):
         self.used = float(response_headers['x-ratelimit-used'])
         self.remaining = float(response_headers['x-ratelimit-remaining'])
         self.seconds_to_reset = int(response_headers['x-ratelimit-reset'])
+        self.reset_timestamp = time.time() + self.seconds_to_reset
         _logger.debug('Rate limit: %s used, %s remaining, %s reset',
                       self.used, self.remaining, self.seconds_to_reset)
 
         if self.remaining <= 0:
-            self.next_request_timestamp = time.time() + self.seconds_to_reset
+            self.next_request_timestamp = self.reset_timestamp
         else:
             self.next_request_timestamp = None
 
@@ -1136,16 +1861,15 @@ class RequestHeaderRateLimiter(DefaultHandler):
         """
         Clear the cache of timed out results.
         """
-
-        for key in list(self.timeouts):
-            if timer() - self.timeouts[key] > cache_timeout:
-                del self.timeouts[key]
-                del self.cache[key]
+        self.cache.expire(cache_timeout)
 
     def clear_cache(self):
         """Remove all items from the cache."""
-        self.cache = {}
-        self.timeouts = {}
+        self.cache.clear()
+        if self.disk_cache is not None:
+            # Keep the entries on disk so they can still be revalidated with
+            # a conditional request instead of downloading everything again
+            self.disk_cache.expire()
 
     def evict(self, urls):
         """Remove items from cache matching URLs.
@@ -1155,12 +1879,9 @@ class RequestHeaderRateLimiter(DefaultHandler):
         if isinstance(urls, six.text_type):
             urls = [urls]
         urls = set(normalize_url(url) for url in urls)
-        retval = 0
-        for key in list(self.cache):
-            if key[0] in urls:
-                retval += 1
-                del self.cache[key]
-                del self.timeouts[key]
+        retval = self.cache.evict(urls)
+        if self.disk_cache is not None:
+            self.disk_cache.evict(urls)
         return retval
 
     def request(self, _cache_key, _cache_ignore, _cache_timeout, **kwargs):
@@ -1187,10 +1908,16 @@ class RequestHeaderRateLimiter(DefaultHandler):
             return self._request(**kwargs)
 
         self._clear_timeouts(_cache_timeout)
-        if _cache_key in self.cache:
-            return self.cache[_cache_key]
+        result = self.cache.get(_cache_key)
+        if result is not None:
+            profiler.count('http.cache_hit')
+            return result
 
-        result = self._request(**kwargs)
+        if self.disk_cache is not None:
+            result = self._disk_request(_cache_key, **kwargs)
+        else:
+            profiler.count('http.cache_miss')
+            result = self._request(**kwargs)
 
         # The handlers don't call `raise_for_status` so we need to ignore
         # status codes that will result in an exception that should not be
@@ -1198,21 +1925,61 @@ class RequestHeaderRateLimiter(DefaultHandler):
         if result.status_code not in (200, 302):
             return result
 
-        self.timeouts[_cache_key] = timer()
         self.cache[_cache_key] = result
         return result
 
+    def _disk_request(self, _cache_key, **kwargs):
+        """
+        Check the persistent cache before making the HTTP request.
+
+        Fresh responses are returned without touching the network. Stale
+        responses are revalidated with a conditional request, and if the
+        server responds with 304 NOT MODIFIED the cached response is used.
+        """
+        cached, fresh = self.disk_cache.get(_cache_key)
+        if cached is not None and fresh:
+            _logger.debug('Disk cache hit: %s', _cache_key[0])
+            profiler.count('http.cache_hit')
+            profiler.count('http.disk_cache_hit')
+            return cached
+
+        if cached is not None:
+            kwargs['request'].headers.update(self.disk_cache.validators(cached))
+
+        profiler.count('http.cache_miss')
+        result = self._request(**kwargs)
+        if cached is not None and result.status_code == 304:
+            _logger.debug('Disk cache revalidated: %s', _cache_key[0])
+            profiler.count('http.disk_cache_revalidated')
+            self.disk_cache.touch(_cache_key)
+            return cached
+
+        if result.status_code == 200:
+            self.disk_cache.set(_cache_key, result)
+        return result
+
     def _request(self, request, proxies, timeout, verify, **_):
         """
         This is where we apply rate limiting and make the HTTP request.
         """
 
+        if self.offline:
+            raise exceptions.OfflineError('Not available in offline mode')
+
         settings = self.http.merge_environment_settings(
             request.url, proxies, False, verify, None)
 
-        self._delay()
-        response = self.http.send(
-            request, timeout=timeout, allow_redirects=False, **settings)
-        self._update(response.headers)
+        lane = self._get_lane(request)
+        with profiler.span('http.wait', lane=self.LANES[lane]):
+            self._acquire(lane)
+        response = None
+        try:
+            with profiler.span('http.request', method=request.method,
+                               url=request.url):
+                response = self.http.send(
+                    request, timeout=timeout, allow_redirects=False,
+                    **settings)
+        finally:
+            self._release(response.headers if response is not None else None)
 
         return response
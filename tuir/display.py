@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for measuring the number of terminal cells that a string will occupy.
+
+These are drop-in replacements for kitchen's ``textual_width`` and
+``textual_width_chop``, which are called for every string that gets drawn to
+the screen. Kitchen measures each character with a chain of comparisons,
+while here the width of each code point is computed once (by kitchen, so the
+results are identical) and then looked up from a table. Pure ASCII strings,
+which make up most of what's displayed, skip the per-character lookup
+entirely.
+"""
+from __future__ import unicode_literals
+
+import re
+
+import six
+from kitchen.text.display import textual_width as _kitchen_width
+
+# Printable ASCII is always one cell wide per character. Note that ``$`` would
+# also match before a trailing newline.
+_ASCII_PRINTABLE = re.compile(r'[\x20-\x7e]*\Z')
+
+# Lookup table of code point -> width, the Latin blocks are filled in ahead of
+# time and everything else is added the first time that it's encountered
+_WIDTHS = dict((ucs, _kitchen_width(six.unichr(ucs))) for ucs in range(0x300))
+
+
+def char_width(char):
+    """
+    Return the number of cells taken up by the given unicode character.
+    """
+    ucs = ord(char)
+    try:
+        return _WIDTHS[ucs]
+    except KeyError:
+        width = _WIDTHS[ucs] = _kitchen_width(char)
+        return width
+
+
+def textual_width(text):
+    """
+    Return the number of cells that the text will take up on the screen.
+    """
+    if isinstance(text, six.binary_type):
+        text = text.decode('utf-8', 'replace')
+
+    if _ASCII_PRINTABLE.match(text):
+        return len(text)
+    return sum(char_width(char) for char in text)
+
+
+def textual_width_chop(text, chop):
+    """
+    Truncate the text so that it fits inside of the given number of cells.
+
+    This gives the same result as kitchen, which only truncates when the text
+    is too wide and then searches for the cut-off point starting from
+    ``text[:chop]``. Zero width characters after the cut-off point are kept
+    when they're found on the way up, but not on the way down.
+    """
+    if isinstance(text, six.binary_type):
+        text = text.decode('utf-8', 'replace')
+
+    if _ASCII_PRINTABLE.match(text):
+        return text[:chop]
+
+    if textual_width(text) <= chop:
+        return text
+
+    # A character takes up at most two cells
+    maximum = min(len(text), chop * 2)
+    minimum = 0
+    eos = min(maximum, chop)
+    width = textual_width(text[:eos])
+
+    while True:
+        if width > chop:
+            mid = minimum + (eos - minimum) // 2
+            if mid == eos:
+                break
+            if eos - chop < eos - mid:
+                while width > chop:
+                    width -= char_width(text[eos - 1])
+                    eos -= 1
+                break
+            width -= textual_width(text[mid:eos])
+            maximum, eos = eos, mid
+        elif width < chop:
+            mid = eos + (maximum - eos) // 2
+            if mid == eos:
+                break
+            if chop - eos < mid - eos:
+                while width < chop:
+                    width += char_width(text[eos])
+                    eos += 1
+                break
+            width += textual_width(text[eos:mid])
+            minimum, eos = eos, mid
+            if eos > maximum:
+                eos = maximum
+                break
+        else:
+            break
+    return text[:eos]
@@ -35,6 +35,10 @@ class NoSubmissionsError(TUIRError):
         super(NoSubmissionsError, self).__init__(message)
 
 
+class OfflineError(TUIRError):
+    "A request to reddit was attempted while in offline mode"
+
+
 class SubscriptionError(TUIRError):
     "Content could not be fetched"
 
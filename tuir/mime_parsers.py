@@ -2,9 +2,10 @@ import re
 import logging
 import mimetypes
 
-import requests
 from bs4 import BeautifulSoup
 
+from .transport import get_session
+
 _logger = logging.getLogger(__name__)
 
 
@@ -53,7 +54,7 @@ class OpenGraphMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
         for og_type in ['video', 'image']:
             prop = 'og:' + og_type + ':secure_url'
@@ -79,7 +80,7 @@ class VideoTagMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
 
         # TODO: Handle pages with multiple videos
@@ -112,7 +113,7 @@ class GfycatMIMEParser(BaseMIMEParser):
     def get_mimetype(url):
         identifier = url.split('/')[-1]
         api_url = 'https://api.gfycat.com/v1/gfycats/{}'.format(identifier)
-        resp = requests.get(api_url)
+        resp = get_session().get(api_url)
         image_url = resp.json()['gfyItem']['mp4Url']
         return image_url, 'video/mp4'
 
@@ -167,7 +168,7 @@ class RedditUploadsMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.head(url)
+        page = get_session().head(url)
         content_type = page.headers.get('Content-Type', '')
         content_type = content_type.split(';')[0]  # Strip out the encoding
         return url, content_type
@@ -183,7 +184,7 @@ class RedditVideoMIMEParser(BaseMIMEParser):
     @staticmethod
     def get_mimetype(url):
         request_url = url + '/DASHPlaylist.mpd'
-        page = requests.get(request_url)
+        page = get_session().get(request_url)
         soup = BeautifulSoup(page.content, 'html.parser')
         if not soup.find('representation', attrs={'mimetype': 'audio/mp4'}):
             reps = soup.find_all('representation', attrs={'mimetype': 'video/mp4'})
@@ -236,12 +237,12 @@ class ImgurApiMIMEParser(BaseMIMEParser):
             return cls.fallback(url, domain)
 
         api_url = endpoint.format(domain=domain, page_hash=page_hash)
-        r = requests.get(api_url, headers=headers)
+        r = get_session().get(api_url, headers=headers)
 
         if domain == 'gallery' and r.status_code != 200:
             # Not a gallery, try to download using the image endpoint
             api_url = endpoint.format(domain='image', page_hash=page_hash)
-            r = requests.get(api_url, headers=headers)
+            r = get_session().get(api_url, headers=headers)
 
         if r.status_code != 200:
             _logger.warning('Imgur API failure, status %s', r.status_code)
@@ -297,7 +298,7 @@ class ImgurScrapeMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
         tag = soup.find('meta', attrs={'name': 'twitter:image'})
         if tag:
@@ -346,7 +347,7 @@ class LiveleakMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
 
         urls = []
@@ -379,7 +380,7 @@ class ClippitUserMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
         tag = soup.find(id='player-container')
         if tag:
@@ -453,7 +454,7 @@ class WorldStarHipHopMIMEParser(BaseMIMEParser):
 
     @staticmethod
     def get_mimetype(url):
-        page = requests.get(url)
+        page = get_session().get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
 
         def filter_source(t):
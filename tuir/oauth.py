@@ -1,121 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-import os
 import time
 import uuid
-import string
-import codecs
 import logging
 import threading
 
-# pylint: disable=import-error
-from six.moves.urllib.parse import urlparse, parse_qs
-from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
-
-from . import docs
-from .config import Config
 from .exceptions import InvalidRefreshToken
 from .packages.praw.errors import HTTPException, OAuthException
 
 _logger = logging.getLogger(__name__)
 
-INDEX = os.path.join(Config.TEMPLATES, 'index.html')
-
-
-class OAuthHTTPServer(HTTPServer):
-
-    def handle_error(self, request, client_address):
-        """
-        The default HTTPServer's error handler prints the request traceback
-        to stdout, which breaks the curses display.
-
-        Override it to log to a file instead.
-        """
-        _logger.exception('Error processing request in OAuth HTTP Server')
-
-
-class OAuthHandler(BaseHTTPRequestHandler):
-
-    # params are stored as a global because we don't have control over what
-    # gets passed into the handler __init__. These will be accessed by the
-    # OAuthHelper class.
-    params = {'state': None, 'code': None, 'error': None}
-    shutdown_on_request = True
-
-    def do_GET(self):
-        """
-        Accepts GET requests to http://localhost:6500/, and stores the query
-        params in the global dict. If shutdown_on_request is true, stop the
-        server after the first successful request.
-
-        The http request may contain the following query params:
-            - state : unique identifier, should match what we passed to reddit
-            - code  : code that can be exchanged for a refresh token
-            - error : if provided, the OAuth error that occurred
-        """
-
-        parsed_path = urlparse(self.path)
-        if parsed_path.path != '/':
-            self.send_error(404)
-
-        qs = parse_qs(parsed_path.query)
-        self.params['state'] = qs['state'][0] if 'state' in qs else None
-        self.params['code'] = qs['code'][0] if 'code' in qs else None
-        self.params['error'] = qs['error'][0] if 'error' in qs else None
-
-        body = self.build_body()
-
-        # send_response also sets the Server and Date headers
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html; charset=UTF-8')
-        self.send_header('Content-Length', len(body))
-        self.end_headers()
-
-        self.wfile.write(body)
-
-        if self.shutdown_on_request:
-            # Shutdown the server after serving the request
-            # http://stackoverflow.com/a/22533929
-            thread = threading.Thread(target=self.server.shutdown)
-            thread.daemon = True
-            thread.start()
-
-    def log_message(self, fmt, *args):
-        """
-        Redirect logging to our own handler instead of stdout
-        """
-        _logger.debug(fmt, *args)
-
-    def build_body(self, template_file=INDEX):
-        """
-        Params:
-            template_file (text): Path to an index.html template
-
-        Returns:
-            body (bytes): THe utf-8 encoded document body
-        """
-
-        if self.params['error'] == 'access_denied':
-            message = docs.OAUTH_ACCESS_DENIED
-        elif self.params['error'] is not None:
-            message = docs.OAUTH_ERROR.format(error=self.params['error'])
-        elif self.params['state'] is None or self.params['code'] is None:
-            message = docs.OAUTH_INVALID
-        else:
-            message = docs.OAUTH_SUCCESS
-
-        with codecs.open(template_file, 'r', 'utf-8') as fp:
-            index_text = fp.read()
-
-        body = string.Template(index_text).substitute(message=message)
-        body = codecs.encode(body, 'utf-8')
-        return body
-
 
 class OAuthHelper(object):
 
-    params = OAuthHandler.params
+    # Filled in by the OAuthHandler when reddit redirects back to tuir
+    params = {'state': None, 'code': None, 'error': None}
 
     def __init__(self, reddit, term, config):
 
@@ -143,6 +43,7 @@ class OAuthHelper(object):
 
         # If we already have a token, request new access credentials
         if self.config.refresh_token:
+            self._set_cache_identity(self.config.refresh_token)
             with self.term.loader('Logging in'):
                 try:
                     self.reddit.refresh_access_information(
@@ -173,6 +74,9 @@ class OAuthHelper(object):
 
             return
 
+        # The server is only needed the first time that the user logs in
+        from .oauth_server import OAuthHTTPServer, OAuthHandler
+
         state = uuid.uuid4().hex
         authorize_url = self.reddit.get_authorize_url(
             state, scope=self.config['oauth_scope'], refreshable=True)
@@ -240,9 +144,20 @@ class OAuthHelper(object):
         self.term.show_notification(message)
 
         self.config.refresh_token = info['refresh_token']
+        self._set_cache_identity(self.config.refresh_token)
         if self.config['persistent']:
             self.config.save_refresh_token()
 
     def clear_oauth_data(self):
         self.reddit.clear_authentication()
         self.config.delete_refresh_token()
+        self._set_cache_identity(None)
+
+    def _set_cache_identity(self, refresh_token):
+        """
+        Keep the persistent HTTP cache from serving one account's responses
+        to another account.
+        """
+        disk_cache = getattr(self.reddit.handler, 'disk_cache', None)
+        if disk_cache is not None:
+            disk_cache.set_identity(refresh_token)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+The local HTTP server that reddit redirects to after the user authorizes tuir.
+This is kept separate from the OAuthHelper so that the http server modules
+aren't imported on startup when there's already a refresh token.
+"""
+from __future__ import unicode_literals
+
+import os
+import string
+import codecs
+import logging
+import threading
+
+# pylint: disable=import-error
+from six.moves.urllib.parse import urlparse, parse_qs
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from . import docs
+from .config import Config
+from .oauth import OAuthHelper
+
+_logger = logging.getLogger(__name__)
+
+INDEX = os.path.join(Config.TEMPLATES, 'index.html')
+
+
+class OAuthHTTPServer(HTTPServer):
+
+    def handle_error(self, request, client_address):
+        """
+        The default HTTPServer's error handler prints the request traceback
+        to stdout, which breaks the curses display.
+
+        Override it to log to a file instead.
+        """
+        _logger.exception('Error processing request in OAuth HTTP Server')
+
+
+class OAuthHandler(BaseHTTPRequestHandler):
+
+    # params are stored as a global because we don't have control over what
+    # gets passed into the handler __init__. These will be accessed by the
+    # OAuthHelper class.
+    params = OAuthHelper.params
+    shutdown_on_request = True
+
+    def do_GET(self):
+        """
+        Accepts GET requests to http://localhost:6500/, and stores the query
+        params in the global dict. If shutdown_on_request is true, stop the
+        server after the first successful request.
+
+        The http request may contain the following query params:
+            - state : unique identifier, should match what we passed to reddit
+            - code  : code that can be exchanged for a refresh token
+            - error : if provided, the OAuth error that occurred
+        """
+
+        parsed_path = urlparse(self.path)
+        if parsed_path.path != '/':
+            self.send_error(404)
+
+        qs = parse_qs(parsed_path.query)
+        self.params['state'] = qs['state'][0] if 'state' in qs else None
+        self.params['code'] = qs['code'][0] if 'code' in qs else None
+        self.params['error'] = qs['error'][0] if 'error' in qs else None
+
+        body = self.build_body()
+
+        # send_response also sets the Server and Date headers
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+        if self.shutdown_on_request:
+            # Shutdown the server after serving the request
+            # http://stackoverflow.com/a/22533929
+            thread = threading.Thread(target=self.server.shutdown)
+            thread.daemon = True
+            thread.start()
+
+    def log_message(self, fmt, *args):
+        """
+        Redirect logging to our own handler instead of stdout
+        """
+        _logger.debug(fmt, *args)
+
+    def build_body(self, template_file=INDEX):
+        """
+        Params:
+            template_file (text): Path to an index.html template
+
+        Returns:
+            body (bytes): THe utf-8 encoded document body
+        """
+
+        if self.params['error'] == 'access_denied':
+            message = docs.OAUTH_ACCESS_DENIED
+        elif self.params['error'] is not None:
+            message = docs.OAUTH_ERROR.format(error=self.params['error'])
+        elif self.params['state'] is None or self.params['code'] is None:
+            message = docs.OAUTH_INVALID
+        else:
+            message = docs.OAUTH_SUCCESS
+
+        with codecs.open(template_file, 'r', 'utf-8') as fp:
+            index_text = fp.read()
+
+        body = string.Template(index_text).substitute(message=message)
+        body = codecs.encode(body, 'utf-8')
+        return body
@@ -14,11 +14,13 @@ import webbrowser
 import curses
 import curses.ascii
 from contextlib import contextmanager
+from collections import OrderedDict, deque
 
 import six
 import requests
 
 from . import exceptions
+from . import profiler
 from .packages import praw
 
 
@@ -186,6 +188,7 @@ class LoadScreen(object):
         self._args = None
         self._animator = None
         self._is_running = None
+        self._span = None
 
     def __call__(
             self,
@@ -226,6 +229,9 @@ class LoadScreen(object):
         self._animator.daemon = True
         self._is_running = True
         self._animator.start()
+
+        self._span = profiler.span('loader', message=self._args[2])
+        self._span.__enter__()
         return self
 
     def __exit__(self, exc_type, e, exc_tb):
@@ -234,6 +240,7 @@ class LoadScreen(object):
         if self.depth > 0:
             return
 
+        self._span.__exit__(exc_type, e, exc_tb)
         self._is_running = False
         self._animator.join()
 
@@ -312,6 +319,272 @@ class LoadScreen(object):
                         time.sleep(0.01)
 
 
+class NullLoader(object):
+    """
+    Stands in for the LoadScreen when content is loaded on a background
+    thread. The LoadScreen can only be used from the main thread, since it
+    draws on the screen and reads key presses. Nothing is displayed, and
+    exceptions are raised instead of caught so that they can be passed back
+    to the main thread and displayed by the real loader.
+    """
+
+    exception = None
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, e, exc_tb):
+        return False
+
+
+_request_lane = threading.local()
+
+
+def get_request_lane():
+    """
+    Return the lane that the current thread's requests have been tagged
+    with by request_lane(), or None.
+    """
+    return getattr(_request_lane, 'name', None)
+
+
+def set_request_lane(name):
+    """
+    Tag all of the requests made by the current thread from now on, e.g. as
+    the initializer for a pool of worker threads.
+    """
+    _request_lane.name = name
+
+
+@contextmanager
+def request_lane(name):
+    """
+    Tag the HTTP requests made by the current thread with the reason that
+    they're being made, one of 'interactive', 'write', or 'background'. The
+    rate limiter uses this to schedule them, see RequestHeaderRateLimiter.
+    """
+    previous = get_request_lane()
+    set_request_lane(name)
+    try:
+        yield
+    finally:
+        set_request_lane(previous)
+
+
+class WriteQueue(object):
+    """
+    Send votes, saves, and hides to reddit on a background thread so that the
+    user doesn't need to wait for each request to finish.
+
+    The item's local state is changed as soon as the request is submitted.
+    If the same item is toggled again before its request has been sent, the
+    queued request is replaced, or dropped if the item was toggled back to
+    where it started. When a request fails the local state is rolled back by
+    update(), and the error is re-raised so it can be displayed by the loader.
+    """
+
+    # The praw method to call to set each field to the given value
+    METHODS = {
+        'likes': {True: 'upvote', False: 'downvote', None: 'clear_vote'},
+        'saved': {True: 'save', False: 'unsave'},
+        'hidden': {True: 'hide', False: 'unhide'},
+    }
+
+    MESSAGES = {
+        'likes': 'Voting',
+        'saved': 'Saving',
+        'hidden': 'Hiding',
+    }
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # (id(data), field) -> [data, field, original value, new value]
+        self._queue = OrderedDict()
+        self._failed = deque()
+        self._in_flight = 0
+        self._worker = None
+
+    @property
+    def pending(self):
+        """
+        True while there are requests that haven't finished, or failures that
+        haven't been applied by update().
+        """
+        return bool(self._queue or self._in_flight or self._failed)
+
+    def submit(self, data, field, value):
+        """
+        Set data[field] to the given value and queue the request to make the
+        same change on reddit.
+        """
+        with self._condition:
+            key = (id(data), field)
+            entry = self._queue.get(key)
+            if entry is None:
+                self._queue[key] = [data, field, data[field], value]
+            elif entry[2] == value:
+                del self._queue[key]
+            else:
+                entry[3] = value
+            data[field] = value
+
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def update(self, loader):
+        """
+        Roll back the items whose requests have failed. Returns True if any of
+        the items were changed.
+        """
+        changed = False
+        while self._failed:
+            data, field, original, value, error = self._failed.popleft()
+            if data[field] == value:
+                data[field] = original
+                changed = True
+            with loader(self.MESSAGES[field]):
+                raise error
+        return changed
+
+    def join(self, timeout=None):
+        """
+        Wait for all of the queued requests to finish.
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._queue or self._in_flight:
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _run(self):
+        """
+        Runs on the background thread, sends the queued requests in order.
+        """
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                key, entry = self._queue.popitem(last=False)
+                self._in_flight += 1
+
+            data, field, original, value = entry
+            try:
+                with request_lane('write'):
+                    getattr(data['object'], self.METHODS[field][value])()
+            except Exception as e:
+                _logger.info('Write queue caught: %s - %s',
+                             type(e).__name__, e)
+                with self._condition:
+                    # If the item was toggled again while this request was
+                    # being sent, the queued request starts from the
+                    # original value instead
+                    queued = self._queue.get(key)
+                    if queued is None:
+                        self._failed.append((data, field, original, value, e))
+                    elif queued[3] == original:
+                        del self._queue[key]
+                    else:
+                        queued[2] = original
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+
+class MimeQueue(object):
+    """
+    Look up the content type of media links on a background thread before
+    they are opened, so that the player can be launched without waiting on
+    the MIME parser when the user selects the link.
+
+    Only the latest batch of urls is kept, e.g. the submissions that are
+    currently on the screen. Urls that scrolled out of view before they were
+    reached are dropped. The links are looked up one at a time, so browsing
+    quickly doesn't flood the sites with requests.
+
+    Urls that have already been looked up by the worker are remembered and
+    skipped when they're submitted again, so the pages can re-submit the
+    links on every draw without touching the mime_cache on the UI thread.
+    """
+
+    def __init__(self, resolve):
+        """
+        Params:
+            resolve (func): Looks up a url and saves the result, usually
+                `Terminal.resolve_mimetype`.
+        """
+        self.resolve = resolve
+        self._condition = threading.Condition()
+        self._queue = OrderedDict()
+        self._in_flight = None
+        self._checked = set()
+        self._worker = None
+
+    @property
+    def pending(self):
+        return bool(self._queue or self._in_flight)
+
+    def submit(self, urls):
+        """
+        Replace the queued urls with the given ones, in order. Urls that have
+        already been looked up are left out.
+        """
+        with self._condition:
+            self._queue = OrderedDict(
+                (url, None) for url in urls
+                if url != self._in_flight and url not in self._checked)
+            if not self._queue:
+                return
+
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def wait(self, url):
+        """
+        Called before a url is looked up in the foreground. Takes the url off
+        of the queue, or waits for it to finish if it's already being looked
+        up so that the same page isn't downloaded twice.
+        """
+        with self._condition:
+            self._queue.pop(url, None)
+            while self._in_flight == url:
+                self._condition.wait()
+
+    def _run(self):
+        """
+        Runs on the background thread, looks up the queued urls in order.
+        """
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                url, _ = self._queue.popitem(last=False)
+                self._in_flight = url
+
+            try:
+                self.resolve(url)
+            except Exception as e:
+                _logger.info('MIME queue caught: %s - %s',
+                             type(e).__name__, e)
+            finally:
+                with self._condition:
+                    self._checked.add(url)
+                    self._in_flight = None
+                    self._condition.notify_all()
+
+
 class Navigator(object):
     """
     Handles the math behind cursor movement and screen paging.
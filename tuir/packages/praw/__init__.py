@@ -32,12 +32,13 @@ import platform
 import re
 import six
 import sys
+import threading
 from . import decorators, errors
 from .handlers import DefaultHandler
 from .helpers import chunk_sequence, normalize_url
-from .internal import (_image_type, _prepare_request,
-                       _raise_redirect_exceptions,
-                       _raise_response_exceptions,
+from .internal import (_decode_html_entities, _image_type, _json_loads,
+                       _prepare_request, _raise_redirect_exceptions,
+                       _raise_response_exceptions, _run_in_worker,
                        _to_reddit_list, _warn_pyopenssl)
 from .settings import CONFIG
 from requests import Session
@@ -45,7 +46,7 @@ from requests.compat import urljoin
 from requests.utils import to_native_string
 from requests import Request
 # pylint: disable=F0401
-from six.moves import html_entities, http_cookiejar
+from six.moves import http_cookiejar
 from six.moves.urllib.parse import parse_qs, urlparse, urlunparse
 # pylint: enable=F0401
 from warnings import warn_explicit
@@ -243,6 +244,14 @@ class Config(object):  # pylint: disable=R0903
         self.by_object[objects.LoggedInRedditor] = obj['redditor_kind']
         self.cache_timeout = float(obj['cache_timeout'])
         self.check_for_updates = config_boolean(obj['check_for_updates'])
+        self.decode_html_entities = config_boolean(
+            str(obj.get('decode_html_entities', True)))
+        self.decode_in_worker = config_boolean(
+            str(obj.get('decode_in_worker', False)))
+        discard_fields = obj.get('discard_fields') or ()
+        if isinstance(discard_fields, six.string_types):
+            discard_fields = [x.strip() for x in discard_fields.split(',')]
+        self.discard_fields = frozenset(x for x in discard_fields if x)
         self.domain = obj['permalink_domain']
         self.output_chars_limit = int(obj['output_chars_limit'])
         self.log_requests = int(obj['log_requests'])
@@ -360,6 +369,8 @@ class BaseReddit(object):
             if self.config.https_proxy:
                 self.http.proxies['https'] = self.config.https_proxy
         self.modhash = None
+        # Guards _request_url while responses are decoded, see request_json()
+        self._objecter_lock = threading.Lock()
 
         # Check for updates if permitted and this is the first Reddit instance
         # if not disable_update_check and not BaseReddit.update_checked \
@@ -415,9 +426,6 @@ class BaseReddit(object):
 
             return (request, key_items, kwargs)
 
-        def decode(match):
-            return six.unichr(html_entities.name2codepoint[match.group(1)])
-
         def handle_redirect():
             response = None
             url = request.url
@@ -453,8 +461,10 @@ class BaseReddit(object):
                 self.http.cookies.update(response.cookies)
                 if raw_response:
                     return response
+                elif self.config.decode_html_entities:
+                    return _decode_html_entities(response.text)
                 else:
-                    return re.sub('&([^;]+);', decode, response.text)
+                    return response.text
             except errors.OAuthInvalidToken as error:
                 if not attempt_oauth_refresh:
                     raise
@@ -619,16 +629,24 @@ class BaseReddit(object):
         response = self._request(url, params, data, method=method,
                                  retry_on_error=retry_on_error)
         hook = self._json_reddit_objecter if as_objects else None
-        # Request url just needs to be available for the objecter to use
-        self._request_url = url  # pylint: disable=W0201
 
         if response == '':
             # Some of the v1 urls don't return anything, even when they're
             # successful.
             return response
 
-        data = json.loads(response, object_hook=hook)
-        delattr(self, '_request_url')
+        # Request url just needs to be available for the objecter to use.
+        # The session can be shared by several threads, so only one response
+        # is decoded at a time.
+        with self._objecter_lock:
+            self._request_url = url  # pylint: disable=W0201
+            try:
+                if self.config.decode_in_worker:
+                    data = _run_in_worker(_json_loads, response, hook)
+                else:
+                    data = _json_loads(response, hook)
+            finally:
+                delattr(self, '_request_url')
         # Update the modhash
         if isinstance(data, dict) and 'data' in data \
                 and 'modhash' in data['data']:
@@ -19,12 +19,15 @@ The functions in this module are not to be relied upon by third-parties.
 """
 
 from __future__ import print_function, unicode_literals
+import json
 import os
 import re
 import six
 import sys
+import threading
 from requests import Request, codes, exceptions
 from requests.compat import urljoin
+from six.moves import html_entities
 from .decorators import restrict_access
 from .errors import (ClientException, HTTPException, Forbidden, NotFound,
                      InvalidSubreddit, OAuthException,
@@ -37,6 +40,13 @@ try:
                            for minor in _opensslversion.split('.')]
 except ImportError:
     _opensslversionlist = [0, 15]
+try:
+    import orjson as _fast_json
+except ImportError:
+    try:
+        import ujson as _fast_json
+    except ImportError:
+        _fast_json = None
 
 MIN_PNG_SIZE = 67
 MIN_JPEG_SIZE = 128
@@ -44,6 +54,7 @@ MAX_IMAGE_SIZE = 512000
 JPEG_HEADER = b'\xff\xd8\xff'
 PNG_HEADER = b'\x89\x50\x4e\x47\x0d\x0a\x1a\x0a'
 RE_REDIRECT = re.compile('(rand(om|nsfw))|about/sticky')
+RE_HTML_ENTITY = re.compile('&([^;]+);')
 
 
 def _get_redditor_listing(subpath=''):
@@ -88,6 +99,33 @@ def _get_sorter(subpath='', **defaults):
     return _sorted
 
 
+def _apply_object_hook(obj, object_hook):
+    """Call object_hook on every dict in obj, innermost first.
+
+    This matches the order that json.loads calls its object_hook in.
+
+    """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, (dict, list)):
+                obj[key] = _apply_object_hook(value, object_hook)
+        return object_hook(obj)
+    for index, value in enumerate(obj):
+        if isinstance(value, (dict, list)):
+            obj[index] = _apply_object_hook(value, object_hook)
+    return obj
+
+
+def _decode_html_entities(text):
+    """Return text with named HTML entities replaced by their characters."""
+    def decode(match):
+        return six.unichr(html_entities.name2codepoint[match.group(1)])
+
+    if '&' not in text:
+        return text
+    return RE_HTML_ENTITY.sub(decode, text)
+
+
 def _image_type(image):
     size = os.path.getsize(image.name)
     if size < MIN_PNG_SIZE:
@@ -106,6 +144,21 @@ def _image_type(image):
     raise ClientException('`image` must be either jpg or png.')
 
 
+def _json_loads(text, object_hook=None):
+    """Decode a JSON document, using a faster parser when one is installed.
+
+    The faster parsers don't accept an object_hook, so it is applied to the
+    decoded document afterwards instead.
+
+    """
+    if _fast_json is None:
+        return json.loads(text, object_hook=object_hook)
+    data = _fast_json.loads(text)
+    if object_hook is not None and isinstance(data, (dict, list)):
+        data = _apply_object_hook(data, object_hook)
+    return data
+
+
 def _modify_relationship(relationship, unlink=False, is_sub=False):
     """Return a function for relationship modification.
 
@@ -246,6 +299,39 @@ def _raise_response_exceptions(response):
             raise HTTPException(_raw=exc.response)
 
 
+def _run_in_worker(function, *args):
+    """Call function on a worker thread and wait for its result.
+
+    Python only handles signals on the main thread in between bytecode
+    instructions, so a KeyboardInterrupt can't interrupt a long running call
+    into a C extension such as the JSON decoder. Waiting for a worker in short
+    intervals keeps the main thread able to respond. When called from any
+    other thread the function is run directly.
+
+    """
+    if threading.current_thread().name != 'MainThread':
+        return function(*args)
+
+    result = []
+
+    def target():
+        try:
+            result.append((True, function(*args)))
+        except Exception:  # pylint: disable=W0703
+            result.append((False, sys.exc_info()))
+
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+    while thread.is_alive():
+        thread.join(0.05)
+
+    success, value = result[0]
+    if not success:
+        six.reraise(*value)
+    return value
+
+
 def _to_reddit_list(arg):
     """Return an argument converted to a reddit-formatted list.
 
@@ -30,6 +30,7 @@ from heapq import heappop, heappush
 from json import dumps
 from requests.compat import urljoin
 from warnings import warn, warn_explicit
+from weakref import WeakValueDictionary
 from . import (AuthenticatedReddit as AR, ModConfigMixin as MCMix,
                ModFlairMixin as MFMix, ModLogMixin as MLMix,
                ModOnlyMixin as MOMix, ModSelfMixin as MSMix,
@@ -46,6 +47,35 @@ REDDITOR_KEYS = ('approved_by', 'author', 'banned_by', 'redditor',
                  'revision_by')
 
 
+# Unfetched Subreddit and Redditor objects, shared by every object that
+# refers to the same subreddit or user. See _get_placeholder().
+_placeholders = WeakValueDictionary()
+
+
+def _get_placeholder(reddit_session, cls, name):
+    """Return an unfetched instance of cls for the given name.
+
+    Every comment in a listing refers to the same subreddit, and most threads
+    only have a few hundred authors, so the same instance is reused instead of
+    creating a new one for every comment.
+
+    """
+    # The placeholder keeps a reference to the session, so the session's id
+    # can't be reused while the placeholder is still alive
+    key = (id(reddit_session), cls, name)
+    obj = _placeholders.get(key)
+    if obj is None:
+        obj = cls(reddit_session, name, fetch=False)
+        _placeholders[key] = obj
+    return obj
+
+
+def _call(task):
+    """Call a (function, argument) pair, for use with ThreadPool.map()."""
+    function, argument = task
+    return function(argument)
+
+
 class RedditContentObject(object):
     """Base class that represents actual reddit objects."""
 
@@ -114,7 +144,7 @@ class RedditContentObject(object):
     def __setattr__(self, name, value):
         """Set the `name` attribute to `value."""
         if value and name == 'subreddit' and isinstance(value, six.string_types):
-            value = Subreddit(self.reddit_session, value, fetch=False)
+            value = _get_placeholder(self.reddit_session, Subreddit, value)
         elif name == 'permalink' and isinstance(self, Comment):
             # The Reddit API now returns the permalink field for comments. This
             # will unfortunately break PRAW because permalink is a @property on the
@@ -130,7 +160,7 @@ class RedditContentObject(object):
             elif not value or value == '[deleted]':
                 value = None
             else:
-                value = Redditor(self.reddit_session, value, fetch=False)
+                value = _get_placeholder(self.reddit_session, Redditor, value)
         object.__setattr__(self, name, value)
 
     def __str__(self):
@@ -180,7 +210,10 @@ class RedditContentObject(object):
         if isinstance(json_dict, list):
             json_dict = {'_tmp': json_dict}
 
+        discard_fields = self.reddit_session.config.discard_fields
         for name, value in six.iteritems(json_dict):
+            if name in discard_fields:
+                continue
             if self._underscore_names and name in self._underscore_names:
                 name = '_' + name
             setattr(self, name, value)
@@ -1095,6 +1128,9 @@ class Submission(Editable, Gildable, Hideable, Moderatable, Refreshable,
 
     _methods = (('select_flair', AR),)
 
+    # The maximum number of comment ids that /api/morechildren accepts
+    MORE_CHILDREN_LIMIT = 100
+
     @staticmethod
     def _extract_more_comments(tree):
         """Return a list of MoreComments objects removed from tree."""
@@ -1317,7 +1353,8 @@ class Submission(Editable, Gildable, Hideable, Moderatable, Refreshable,
         else:
             return restrict_access('modposts')(mark_as_nsfw_helper)(self)
 
-    def replace_more_comments(self, limit=32, threshold=1):
+    def replace_more_comments(self, limit=32, threshold=1, max_workers=None,
+                              initializer=None):
         """Update the comment tree by replacing instances of MoreComments.
 
         :param limit: The maximum number of MoreComments objects to
@@ -1325,6 +1362,14 @@ class Submission(Editable, Gildable, Hideable, Moderatable, Refreshable,
             have no limit, or to 0 to make no extra requests. Default: 32
         :param threshold: The minimum number of children comments a
             MoreComments object must have in order to be replaced. Default: 1
+        :param max_workers: When set, the children of several MoreComments
+            objects are combined into each API request, and up to this many
+            requests are sent at the same time. The limit still counts API
+            requests. See :meth:`_replace_more_comments_concurrent`.
+            Default: None
+        :param initializer: Called at the start of each of the max_workers
+            threads, e.g. to tag their requests for the session's handler.
+            Default: None
         :returns: A list of MoreComments objects that were not replaced.
 
         Note that after making this call, the `comments` attribute of the
@@ -1336,6 +1381,10 @@ class Submission(Editable, Gildable, Hideable, Moderatable, Refreshable,
         if self._replaced_more:
             return []
 
+        if max_workers:
+            return self._replace_more_comments_concurrent(
+                limit, threshold, max_workers, initializer)
+
         remaining = limit
         more_comments = self._extract_more_comments(self.comments)
         skipped = []
@@ -1368,6 +1417,113 @@ class Submission(Editable, Gildable, Hideable, Moderatable, Refreshable,
         self._replaced_more = True
         return more_comments + skipped
 
+    def _replace_more_comments_concurrent(self, limit, threshold, max_workers,
+                                          initializer):
+        """Replace MoreComments objects using batched, concurrent requests.
+
+        The tree is expanded one level at a time. On each pass, the children
+        of the MoreComments objects that will be replaced are pooled together
+        and split into requests of up to MORE_CHILDREN_LIMIT ids, which are
+        sent from a pool of `max_workers` threads. Requests still go through
+        the session's handler, so they are subject to its rate limiting. The
+        results are merged back into the tree on the calling thread.
+
+        "Continue this thread" links can't be batched and are fetched with one
+        request each, on the worker threads.
+
+        Like the serial path, `limit` is the maximum number of requests, and
+        the largest MoreComments objects are replaced first. When the children
+        of one don't all fit in the requests that are left, as many as fit are
+        loaded and the rest are left in the MoreComments object, which is
+        returned with the others that weren't replaced.
+
+        """
+        remaining = limit
+        more_comments = self._extract_more_comments(self.comments)
+        skipped = []
+        size = self.MORE_CHILDREN_LIMIT
+
+        # Imported here to keep multiprocessing out of praw's import time
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(max_workers, initializer)
+        try:
+            while more_comments and remaining != 0:
+                continued, children, seen = [], [], set()
+                while more_comments:
+                    item = heappop(more_comments)
+                    if len(item.children) == 0 or 0 < item.count < threshold:
+                        heappush(skipped, item)  # It wasn't replaced
+                        continue
+
+                    if item.count == 0:
+                        n_requests = (-(-len(children) // size) +
+                                      len(continued) + 1)
+                        if remaining is not None and n_requests > remaining:
+                            heappush(more_comments, item)  # It wasn't replaced
+                            break
+                        continued.append(item)
+                        continue
+
+                    ids = [x for x in item.children if x not in seen and
+                           't1_{0}'.format(x) not in self._comments_by_id]
+                    if remaining is not None:
+                        free = ((remaining - len(continued)) * size -
+                                len(children))
+                        if len(ids) > free:
+                            # Load as many of the children as will fit, and
+                            # leave the rest behind in the MoreComments
+                            taken, ids = ids[:max(free, 0)], ids[max(free, 0):]
+                            children.extend(taken)
+                            seen.update(taken)
+                            item.children = ids
+                            item.count = max(item.count - len(taken), len(ids))
+                            heappush(more_comments, item)  # It wasn't replaced
+                            break
+                    children.extend(ids)
+                    seen.update(ids)
+
+                tasks = [(self._fetch_more_children, children[i:i + size])
+                         for i in range(0, len(children), size)]
+                tasks.extend((self._fetch_continued, item)
+                             for item in continued)
+                if not tasks:
+                    break
+                if remaining is not None:
+                    remaining -= len(tasks)
+
+                for new_comments in pool.map(_call, tasks):
+                    # Re-add new MoreComment objects to the heap
+                    for more in self._extract_more_comments(new_comments):
+                        more._update_submission(self)  # pylint: disable=W0212
+                        heappush(more_comments, more)
+                    # Insert the new comments into the tree
+                    for comment in new_comments:
+                        self._insert_comment(comment)
+        finally:
+            pool.close()
+            pool.join()
+
+        self._replaced_more = True
+        return more_comments + skipped
+
+    def _fetch_more_children(self, children):
+        """Return the comments for a list of child ids in one request."""
+        data = {'children': ','.join(children),
+                'link_id': self.fullname,
+                'r': str(self.subreddit)}
+        if self._comment_sort:
+            data['where'] = self._comment_sort
+        url = self.reddit_session.config['morechildren']
+        response = self.reddit_session.request_json(url, data=data)
+        return response['data']['things']
+
+    @staticmethod
+    def _fetch_continued(item):
+        """Return the comments behind a "continue this thread" link."""
+        # pylint: disable=W0212
+        return list(item._continue_comments(update=False))
+
     def set_flair(self, *args, **kwargs):
         """Set flair for this submission.
 
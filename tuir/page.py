@@ -5,15 +5,18 @@ import re
 import os
 import sys
 import time
+import curses
 import logging
 from functools import wraps
+from itertools import chain
 
 import six
-from kitchen.text.display import textual_width
 
 from . import docs
+from . import profiler
 from .clipboard import copy as clipboard_copy
-from .objects import Controller, Command
+from .display import textual_width
+from .objects import Controller, Command, Navigator, WriteQueue
 from .exceptions import TemporaryFileError, ProgramError
 from .__version__ import __version__
 
@@ -30,6 +33,10 @@ def logged_in(f):
         if not self.reddit.is_oauth_session():
             self.term.show_notification('Not logged in')
             return None
+        if getattr(self.content, 'saved_at', None):
+            # The rows restored from a snapshot aren't linked to reddit
+            self.term.show_notification('Not available for a saved copy')
+            return None
         return f(self, *args, **kwargs)
     return wrapped_method
 
@@ -57,7 +64,9 @@ class PageStack(object):
 
     @staticmethod
     def pop():
-        return PageStack.stack.pop()
+        page = PageStack.stack.pop()
+        page.close()
+        return page
 
     @staticmethod
     def size():
@@ -80,6 +89,7 @@ class PageStack(object):
 
     def _stay_within_max_size(self):
         if len(PageStack.stack) > self.max_size:
+            PageStack.stack[0].close()
             PageStack.stack = PageStack.stack[1:]
 
 
@@ -88,6 +98,16 @@ class Page(object):
     BANNER = None
     FOOTER = None
 
+    # How often to check for content that's loading in the background (ms)
+    POLL_INTERVAL = 100
+
+    # Votes, saves, and hides are sent in the background, this is shared by
+    # all of the pages so that the requests are sent in the order they're made
+    writes = WriteQueue()
+
+    # Saved copies of comment threads, see cache.SnapshotStore
+    snapshots = None
+
     def __init__(self, reddit, term, config, oauth):
         self.reddit = reddit
         self.term = term
@@ -100,9 +120,61 @@ class Page(object):
         self._row = 0
         self._subwindows = None
 
+        # Used to skip the full redraw when only the cursor has moved, see
+        # Page.draw(). _cursor_moved is True if the cursor moved without
+        # scrolling the page, and False if the page needs to be laid out again.
+        self._cursor_moved = None
+        self._drawn_layout = None
+        self._drawn_cursor_index = None
+        # The rate limiter status that's displayed in the footer
+        self._drawn_status = ''
+
+        # Set on pages that were restored from a saved session, called to
+        # download the latest content the first time the page is shown
+        self._resume = None
+
     def refresh_content(self, order=None, name=None):
         raise NotImplementedError
 
+    def close(self):
+        """
+        Called when the page is taken off of the stack, or when tuir exits
+        while the page is still open.
+        """
+        pass
+
+    def to_session(self):
+        """
+        Return the state of the page in a form that can be serialized to JSON
+        and passed back to the page's constructor as `session`, or None if
+        the page can't be restored.
+        """
+        return None
+
+    def _session_state(self, **state):
+        content = self.content.to_snapshot()
+        content['saved'] = self.content.saved_at or time.time()
+        state.update(
+            page=self.name,
+            content=content,
+            nav={'page_index': self.nav.page_index,
+                 'cursor_index': self.nav.cursor_index,
+                 'inverted': self.nav.inverted,
+                 'top_item_height': self.nav.top_item_height})
+        return state
+
+    def _restore_nav(self, state, page_index=0):
+        """
+        Put the cursor back where it was in the saved session, unless the
+        saved position is no longer part of the content.
+        """
+        nav = Navigator(self.content.get, **state)
+        low, high = self.content.range
+        if not (low <= nav.page_index <= high and
+                low <= nav.absolute_index <= high):
+            nav = Navigator(self.content.get, page_index=page_index)
+        return nav
+
     def _draw_item(self, win, data, inverted):
         raise NotImplementedError
 
@@ -117,8 +189,67 @@ class Page(object):
         Draw the page and wait for user input.
         """
         self.draw()
-        ch = self.term.stdscr.getch()
-        self.controller.trigger(ch)
+        if self._resume is not None:
+            self.content.revalidate(self._resume)
+            self._resume = None
+        ch = self._getch()
+        if ch != -1:
+            self.controller.trigger(ch)
+
+    def _getch(self):
+        """
+        Block until the next key press. While the content is loading something
+        in the background, check for results every POLL_INTERVAL milliseconds
+        and return -1 as soon as they have been applied, so that the page can
+        be redrawn.
+        """
+        while (self.content.pending or self.writes.pending or
+               self._requests_pending()):
+            self.term.stdscr.timeout(self.POLL_INTERVAL)
+            try:
+                ch = self.term.stdscr.getch()
+            finally:
+                self.term.stdscr.timeout(-1)
+            if ch != -1:
+                return ch
+            if self._update_content():
+                return -1
+            self._update_footer()
+        self._update_footer()
+        return self.term.stdscr.getch()
+
+    def _requests_pending(self):
+        return bool(self.reddit and self.reddit.handler.pending)
+
+    def _get_status(self):
+        return self.reddit.handler.status() if self.reddit else ''
+
+    def _update_footer(self):
+        """
+        Redraw only the footer if requests have started or stopped being held
+        back by the rate limiter since it was last drawn.
+        """
+        if self._get_status() == self._drawn_status:
+            return
+        n_rows, n_cols = self.term.stdscr.getmaxyx()
+        if n_rows < self.term.MIN_HEIGHT or n_cols < self.term.MIN_WIDTH:
+            return
+        self._row = n_rows - 1
+        self._draw_footer()
+        self.term.stdscr.refresh()
+
+    def _update_content(self):
+        """
+        Apply any background results to the content. If items were added or
+        removed above the cursor, shift the page so that the cursor stays on
+        the same item.
+        """
+        changes = self.content.update()
+        for index, n_rows in changes:
+            if index is not None and index < self.nav.absolute_index:
+                self.nav.page_index += n_rows
+        rolled_back = self.writes.update(self.term.loader)
+        return bool(changes) or rolled_back
 
     @PageController.register(Command('REFRESH'))
     def reload_page(self):
@@ -260,15 +391,9 @@ class Page(object):
         elif getattr(data['object'], 'archived'):
             self.term.show_notification("Voting disabled for archived post", style='Error')
         elif data['likes']:
-            with self.term.loader('Clearing vote'):
-                data['object'].clear_vote()
-            if not self.term.loader.exception:
-                data['likes'] = None
+            self.writes.submit(data, 'likes', None)
         else:
-            with self.term.loader('Voting'):
-                data['object'].upvote()
-            if not self.term.loader.exception:
-                data['likes'] = True
+            self.writes.submit(data, 'likes', True)
 
     @PageController.register(Command('DOWNVOTE'))
     @logged_in
@@ -282,15 +407,9 @@ class Page(object):
         elif getattr(data['object'], 'archived'):
             self.term.show_notification("Voting disabled for archived post", style='Error')
         elif data['likes'] or data['likes'] is None:
-            with self.term.loader('Voting'):
-                data['object'].downvote()
-            if not self.term.loader.exception:
-                data['likes'] = False
+            self.writes.submit(data, 'likes', False)
         else:
-            with self.term.loader('Clearing vote'):
-                data['object'].clear_vote()
-            if not self.term.loader.exception:
-                data['likes'] = None
+            self.writes.submit(data, 'likes', None)
 
     @PageController.register(Command('OPEN_SUBREDDIT'))
     def open_subreddit(self):
@@ -325,16 +444,8 @@ class Page(object):
         data = self.get_selected_item()
         if 'saved' not in data:
             self.term.flash()
-        elif not data['saved']:
-            with self.term.loader('Saving'):
-                data['object'].save()
-            if not self.term.loader.exception:
-                data['saved'] = True
         else:
-            with self.term.loader('Unsaving'):
-                data['object'].unsave()
-            if not self.term.loader.exception:
-                data['saved'] = False
+            self.writes.submit(data, 'saved', not data['saved'])
 
     @PageController.register(Command('LOGIN'))
     def login(self):
@@ -526,7 +637,7 @@ class Page(object):
         else:
             html = data.get('html')
             if html:
-                extracted_links = self.content.extract_links(html)
+                extracted_links = self.content.get_links(data)
                 if not extracted_links:
                     # Only one selection to choose from, so just pick it
                     link = permalink
@@ -685,7 +796,11 @@ class Page(object):
 
     def draw(self):
         """
-        Clear the terminal screen and redraw all of the sub-windows
+        Clear the terminal screen and redraw all of the sub-windows.
+
+        If the last command only moved the cursor within the current page, the
+        layout from the previous draw is reused and only the previously
+        selected and the newly selected items are repainted.
         """
         n_rows, n_cols = self.term.stdscr.getmaxyx()
         if n_rows < self.term.MIN_HEIGHT or n_cols < self.term.MIN_WIDTH:
@@ -693,13 +808,50 @@ class Page(object):
             # small at startup because self._subwindows will never be populated
             return
 
-        self._row = 0
-        self._draw_header()
-        self._draw_banner()
-        self._draw_content()
-        self._draw_footer()
-        self.term.clear_screen()
-        self.term.stdscr.refresh()
+        cursor_moved, self._cursor_moved = self._cursor_moved, None
+        if cursor_moved and self._drawn_layout == self._get_layout():
+            with profiler.span('draw.cursor'):
+                self._draw_cursor()
+            return
+
+        with profiler.span('draw', page=type(self).__name__):
+            self._row = 0
+            with profiler.span('draw.header'):
+                self._draw_header()
+            with profiler.span('draw.banner'):
+                self._draw_banner()
+            with profiler.span('draw.content'):
+                self._draw_content()
+            with profiler.span('draw.footer'):
+                self._draw_footer()
+            with profiler.span('draw.refresh'):
+                self.term.clear_screen()
+                self.term.stdscr.refresh()
+
+        self._drawn_layout = self._get_layout()
+        self._drawn_cursor_index = self.nav.cursor_index
+        profiler.mark('first page drawn')
+
+    def _get_layout(self):
+        """
+        Return everything that determines where the subwindows were placed
+        during the last full draw.
+        """
+        return (self.term.stdscr.getmaxyx(), self.term.theme, self.content,
+                self.nav.page_index, self.nav.inverted,
+                self.nav.top_item_height)
+
+    def _draw_cursor(self):
+        """
+        Move the cursor highlight from the previously selected subwindow to
+        the currently selected one, without touching the rest of the screen.
+        """
+        for index in {self._drawn_cursor_index, self.nav.cursor_index}:
+            self._draw_subwindow(index)
+        self._drawn_cursor_index = self.nav.cursor_index
+
+        self.term.stdscr.noutrefresh()
+        curses.doupdate()
 
     def _draw_header(self):
         """
@@ -815,18 +967,67 @@ class Page(object):
         window.erase()
         win_n_rows, win_n_cols = window.getmaxyx()
 
-        self._subwindows = []
         page_index, cursor_index, inverted = self.nav.position
-        step = self.nav.step
+        items = self.content.iterate(page_index, self.nav.step, win_n_cols - 2)
+        layout, cancel_inverted = self._layout_content(
+            items, win_n_rows, inverted, self.nav.top_item_height)
 
-        # If not inverted, align the first submission with the top and draw
-        # downwards. If inverted, align the first submission with the bottom
-        # and draw upwards.
+        if cancel_inverted and self.nav.inverted:
+            # In some cases we need to make sure that the screen is NOT
+            # inverted, e.g. when the content doesn't fill up the page. This
+            # can't be determined ahead of time because it depends on the size
+            # of the terminal. The items that were already measured are reused
+            # and drawn top-down, followed by the items below them.
+            measured = [data for data, _, _, _ in layout]
+            self.nav.flip(len(measured) - 1)
+            items = chain(
+                reversed(measured),
+                self.content.iterate(page_index + 1, 1, win_n_cols - 2))
+            layout, _ = self._layout_content(items, win_n_rows, False, None)
+
+        # Only create the curses windows once the placement has been decided
+        self._subwindows = []
+        for data, subwin_n_rows, subwin_inverted, start in layout:
+            subwin_n_cols = win_n_cols - data['h_offset']
+            subwindow = window.derwin(subwin_n_rows, subwin_n_cols, start, data['h_offset'])
+            self._subwindows.append((subwindow, data, subwin_inverted))
+
+        if self.nav.cursor_index >= len(self._subwindows):
+            # Don't allow the cursor to go over the number of subwindows
+            # This could happen if the window is resized and the cursor index is
+            # pushed out of bounds
+            self.nav.cursor_index = len(self._subwindows) - 1
+
+        # Now that the windows are setup, we can take a second pass through
+        # to draw the text onto each subwindow
+        for index in range(len(self._subwindows)):
+            self._draw_subwindow(index)
+
+        self._row += win_n_rows
+
+    @staticmethod
+    def _layout_content(items, win_n_rows, inverted, top_item_height):
+        """
+        Measure the content items and decide where each one will be placed on
+        the screen.
+
+        If not inverted, align the first item with the top and draw downwards.
+        If inverted, align the first item with the bottom and draw upwards.
+
+        Returns:
+            layout (list): A (data, n_rows, inverted, start_row) tuple for
+                each item that will be displayed.
+            cancel_inverted (bool): True if the items didn't fill up the page,
+                in which case the page should not be drawn inverted.
+        """
+        layout = []
         cancel_inverted = True
+        step = -1 if inverted else 1
         current_row = (win_n_rows - 1) if inverted else 0
         available_rows = win_n_rows
-        top_item_height = None if inverted else self.nav.top_item_height
-        for data in self.content.iterate(page_index, step, win_n_cols - 2):
+        if inverted:
+            top_item_height = None
+        for data in items:
             subwin_n_rows = min(available_rows, data['n_rows'])
             subwin_inverted = inverted
             if top_item_height is not None:
@@ -836,10 +1037,8 @@ class Page(object):
                 subwin_n_rows = min(subwin_n_rows, top_item_height)
                 subwin_inverted = True
                 top_item_height = None
-            subwin_n_cols = win_n_cols - data['h_offset']
             start = current_row - subwin_n_rows + 1 if inverted else current_row
-            subwindow = window.derwin(subwin_n_rows, subwin_n_cols, start, data['h_offset'])
-            self._subwindows.append((subwindow, data, subwin_inverted))
+            layout.append((data, subwin_n_rows, subwin_inverted, start))
             available_rows -= (subwin_n_rows + 1)  # Add one for the blank line
             current_row += step * (subwin_n_rows + 1)
             if available_rows <= 0:
@@ -847,39 +1046,26 @@ class Page(object):
                 cancel_inverted = False
                 break
 
-        if len(self._subwindows) == 1:
+        if len(layout) == 1:
             # Never draw inverted if only one subwindow. The top of the
             # subwindow should always be aligned with the top of the screen.
             cancel_inverted = True
 
-        if cancel_inverted and self.nav.inverted:
-            # In some cases we need to make sure that the screen is NOT
-            # inverted. Unfortunately, this currently means drawing the whole
-            # page over again. Could not think of a better way to pre-determine
-            # if the content will fill up the page, given that it is dependent
-            # on the size of the terminal.
-            self.nav.flip((len(self._subwindows) - 1))
-            self._draw_content()
-            return
-
-        if self.nav.cursor_index >= len(self._subwindows):
-            # Don't allow the cursor to go over the number of subwindows
-            # This could happen if the window is resized and the cursor index is
-            # pushed out of bounds
-            self.nav.cursor_index = len(self._subwindows) - 1
+        return layout, cancel_inverted
 
-        # Now that the windows are setup, we can take a second pass through
-        # to draw the text onto each subwindow
-        for index, (win, data, inverted) in enumerate(self._subwindows):
-            if self.nav.absolute_index >= 0 and index == self.nav.cursor_index:
-                win.bkgd(str(' '), self.term.attr('Selected'))
-                with self.term.theme.turn_on_selected():
-                    self._draw_item(win, data, inverted)
-            else:
-                win.bkgd(str(' '), self.term.attr('Normal'))
+    def _draw_subwindow(self, index):
+        """
+        Draw a single item from the content page onto its subwindow.
+        """
+        win, data, inverted = self._subwindows[index]
+        win.erase()
+        if self.nav.absolute_index >= 0 and index == self.nav.cursor_index:
+            win.bkgd(str(' '), self.term.attr('Selected'))
+            with self.term.theme.turn_on_selected():
                 self._draw_item(win, data, inverted)
-
-        self._row += win_n_rows
+        else:
+            win.bkgd(str(' '), self.term.attr('Normal'))
+            self._draw_item(win, data, inverted)
 
     def _draw_footer(self):
         """
@@ -892,15 +1078,26 @@ class Page(object):
 
         text = self.FOOTER.strip()
         self.term.add_line(window, text, 0, 0)
+
+        # Let the user know when requests are being held back by the rate
+        # limiter, instead of leaving them wondering why nothing is loading
+        status = self._drawn_status = self._get_status()
+        if status and len(text) + len(status) + 2 <= n_cols - 1:
+            self.term.add_line(window, status, 0, n_cols - len(status) - 1)
         self._row += 1
 
     def _move_cursor(self, direction):
-        # Note: ACS_VLINE doesn't like changing the attribute, so disregard the
-        # redraw flag and opt to always redraw
         valid, redraw = self.nav.move(direction, len(self._subwindows))
         if not valid:
             self.term.flash()
 
+        # If the page scrolled, the whole screen will need to be laid out
+        # again. Otherwise only the old and new cursor positions are redrawn.
+        if self._cursor_moved is None:
+            self._cursor_moved = not redraw
+        else:
+            self._cursor_moved = self._cursor_moved and not redraw
+
     def _move_page(self, direction):
         valid, redraw = self.nav.move_page(direction, len(self._subwindows)-1)
         if not valid:
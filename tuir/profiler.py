@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Timing instrumentation for the code paths that the UI waits on, enabled with
+the --profile command line option.
+
+Each timed span is written to the output file as a line of JSON as soon as it
+finishes. Spans that run inside of another span on the same thread are added
+to the parent's record, which is what splits a page draw into the header,
+banner, content and footer, and a content lookup into the time spent on the
+network and the time spent stripping and wrapping the results. A summary of
+every span and counter is printed when the program exits.
+
+When profiling is turned off, each span costs a single global lookup.
+
+The --startup-profile option separately records how long each module takes to
+import and when tuir reaches each step of starting up, e.g. the first draw.
+"""
+from __future__ import unicode_literals
+from __future__ import division
+
+import sys
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+import six
+
+_logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_local = threading.local()
+_output = None
+_start_time = None
+_durations = OrderedDict()
+_nested = {}
+_counters = OrderedDict()
+
+# Recorded by time_imports() and mark()
+_import_start = None
+_imports = []
+_marks = OrderedDict()
+
+
+def enable(filename):
+    """
+    Start recording spans to the given file, replacing anything that was
+    recorded before.
+    """
+    global _output, _start_time
+    with _lock:
+        if _output is not None:
+            _output.close()
+        _output = open(filename, 'w')
+        _start_time = time.time()
+        _durations.clear()
+        _nested.clear()
+        _counters.clear()
+    _logger.info('Profiling to %s', filename)
+
+
+def disable():
+    """
+    Stop recording and write the summary as the last line of the file.
+    """
+    global _output
+    with _lock:
+        if _output is None:
+            return
+        _output.write(json.dumps({'summary': _summary_dict()}) + '\n')
+        _output.close()
+        _output = None
+
+
+def is_enabled():
+    return _output is not None
+
+
+class _Span(object):
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.nested = {}
+        self.start = None
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.time() - self.start
+
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            parent = stack[-1].nested
+            parent[self.name] = parent.get(self.name, 0) + duration
+
+        record = OrderedDict([
+            ('name', self.name),
+            ('start', round(self.start - _start_time, 6)),
+            ('duration', round(duration, 6)),
+            ('thread', threading.current_thread().name)])
+        record.update(self.fields)
+        if self.nested:
+            record['nested'] = dict(
+                (k, round(v, 6)) for k, v in self.nested.items())
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+
+        with _lock:
+            if _output is None:
+                # Profiling was turned off while the span was running
+                return
+            _output.write(json.dumps(record) + '\n')
+            _durations.setdefault(self.name, []).append(duration)
+            nested = _nested.setdefault(self.name, {})
+            for name, value in self.nested.items():
+                nested[name] = nested.get(name, 0) + value
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **fields):
+    """
+    Return a context manager that times the enclosed block.
+
+    Params:
+        name (str): The name that the span will be grouped by in the summary.
+        **fields: Extra values to add to the span's record, e.g. a url.
+    """
+    if _output is None:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def timed(name):
+    """
+    Decorator that times every call to the wrapped function as a span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _output is None:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+    Increment the named counter, e.g. for cache hits.
+    """
+    if _output is None:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def _summary_dict():
+    spans = OrderedDict()
+    for name, durations in _durations.items():
+        total = sum(durations)
+        spans[name] = OrderedDict([
+            ('count', len(durations)),
+            ('total', round(total, 6)),
+            ('mean', round(total / len(durations), 6)),
+            ('p95', round(_percentile(durations, 0.95), 6)),
+            ('max', round(max(durations), 6)),
+            ('nested', dict((k, round(v, 6))
+                            for k, v in _nested.get(name, {}).items()))])
+    return OrderedDict([('spans', spans), ('counters', dict(_counters))])
+
+
+def summary():
+    """
+    Return a human readable summary of everything that has been recorded.
+    """
+    with _lock:
+        data = _summary_dict()
+
+    lines = ['{0:<20} {1:>7} {2:>10} {3:>10} {4:>10}  {5}'.format(
+        'span', 'count', 'mean ms', 'p95 ms', 'max ms', 'breakdown')]
+    for name, stats in data['spans'].items():
+        breakdown = []
+        nested_total = 0
+        for child, value in sorted(stats['nested'].items()):
+            nested_total += value
+            breakdown.append('{0} {1:.0%}'.format(child, value / stats['total']
+                                                  if stats['total'] else 0))
+        if breakdown:
+            other = stats['total'] - nested_total
+            breakdown.append('other {0:.0%}'.format(
+                other / stats['total'] if stats['total'] else 0))
+        lines.append('{0:<20} {1:>7} {2:>10.2f} {3:>10.2f} {4:>10.2f}  {5}'.format(
+            name, stats['count'], stats['mean'] * 1000, stats['p95'] * 1000,
+            stats['max'] * 1000, ', '.join(breakdown)))
+
+    counters = data['counters']
+    for name, value in sorted(counters.items()):
+        lines.append('{0:<20} {1:>7}'.format(name, value))
+
+    hits, misses = counters.get('http.cache_hit', 0), counters.get(
+        'http.cache_miss', 0)
+    if hits + misses:
+        lines.append('HTTP cache hit rate: {0:.0%} of {1} requests'.format(
+            hits / (hits + misses), hits + misses))
+    return '\n'.join(lines)
+
+
+def report(stream):
+    """
+    Finish recording and print the summary to the given stream.
+    """
+    if _output is None:
+        return
+    filename = _output.name
+    text = summary()
+    disable()
+    stream.write(six.text_type('{0}\n\nProfile written to {1}\n').format(
+        text, filename))
+
+
+def time_imports():
+    """
+    Start timing every module that's imported for the first time. This needs
+    to be called before the modules that are being measured are imported.
+    """
+    global _import_start
+    if _import_start is not None:
+        return
+    _import_start = time.time()
+
+    original_import = six.moves.builtins.__import__
+    local = threading.local()
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = _resolve_import(name, globals, fromlist, level)
+        if module is None or module in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+
+        # Added before the import runs so that the list stays in the order
+        # of the import tree, with each module above the ones that it loads
+        record = [module, getattr(local, 'depth', 0), None]
+        _imports.append(record)
+        local.depth = record[1] + 1
+        start = time.time()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            local.depth = record[1]
+            record[2] = time.time() - start
+
+    six.moves.builtins.__import__ = timed_import
+
+
+def _resolve_import(name, globals, fromlist, level):
+    """
+    Return the full name of the first module that the import statement will
+    load, or None if everything that it refers to is already loaded.
+    """
+    if level > 0:
+        package = (globals or {}).get('__package__') or ''
+        package = package.rsplit('.', level - 1)[0]
+        name = '{0}.{1}'.format(package, name) if name else package
+
+    if name not in sys.modules:
+        return name
+    for item in fromlist or ():
+        submodule = '{0}.{1}'.format(name, item)
+        if item != '*' and submodule not in sys.modules:
+            return submodule
+    return None
+
+
+def mark(name):
+    """
+    Record the time since time_imports() was called, the first time that
+    tuir gets to the named step of starting up.
+    """
+    if _import_start is None or name in _marks:
+        return
+    _marks[name] = time.time() - _import_start
+
+
+def startup_report(stream, threshold=0.001):
+    """
+    Print the import tree for every module that took longer than `threshold`
+    seconds to import, including the modules that it imported in turn, and
+    the time that each step of starting up was reached.
+    """
+    if _import_start is None:
+        return
+
+    lines = ['{0:<50} {1:>10}'.format('import', 'ms')]
+    total = 0
+    for module, depth, duration in _imports:
+        if duration is None:
+            # Still being imported on another thread
+            continue
+        if depth == 0:
+            total += duration
+        if duration >= threshold:
+            lines.append('{0:<50} {1:>10.2f}'.format(
+                '  ' * depth + module, duration * 1000))
+    lines.append('{0:<50} {1:>10.2f}'.format(
+        'total ({0} modules)'.format(len(_imports)), total * 1000))
+    lines.append('')
+    for name, elapsed in _marks.items():
+        lines.append('{0:<50} {1:>10.2f}'.format(name, elapsed * 1000))
+    stream.write(six.text_type('\n').join(lines) + '\n')
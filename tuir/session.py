@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Save the stack of open pages when tuir exits, so that the next launch can
+pick up where the user left off, enabled with the resume_session option.
+
+Each page is saved with the rows that it had loaded and the position of the
+cursor. On the next launch the pages are rebuilt from the saved rows without
+making any requests, so the first screen can be drawn right away. The latest
+version of each page is downloaded in the background the first time that it's
+shown.
+"""
+from __future__ import unicode_literals
+
+import time
+import logging
+
+from .subreddit_page import SubredditPage
+from .submission_page import SubmissionPage
+
+_logger = logging.getLogger(__name__)
+
+# Sessions that were saved in a different format are ignored
+VERSION = 1
+
+# The pages that can be restored, by Page.name
+PAGES = dict((cls.name, cls) for cls in (SubredditPage, SubmissionPage))
+
+
+def dump(pages):
+    """
+    Return the state of the given pages, in the order that they were opened.
+    Pages that can't be restored, like the inbox, are left out.
+    """
+    states = []
+    for page in pages:
+        state = page.to_session()
+        if state is not None:
+            states.append(state)
+    return {'version': VERSION, 'saved': time.time(), 'pages': states}
+
+
+def restore(reddit, term, config, oauth, session):
+    """
+    Rebuild the pages from a session that was saved by dump(). Any page that
+    can't be restored is skipped, instead of stopping tuir from launching.
+
+    Returns:
+        pages (list): The restored pages, in the order that they were opened.
+    """
+    if not session or session.get('version') != VERSION:
+        return []
+
+    pages = []
+    for state in session['pages']:
+        cls = PAGES.get(state.get('page'))
+        if cls is None:
+            continue
+        try:
+            pages.append(cls(reddit, term, config, oauth, session=state))
+        except Exception as e:
+            _logger.warning('Unable to restore %s page: %s - %s',
+                            state['page'], type(e).__name__, e)
+    _logger.info('Restored %s of %s pages from the last session',
+                 len(pages), len(session['pages']))
+    return pages
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from functools import partial
+
 from . import docs
 from .content import SubmissionContent
 from .page import Page, PageController, logged_in
@@ -17,22 +19,82 @@ class SubmissionPage(Page):
 
     name = 'submission'
 
-    def __init__(self, reddit, term, config, oauth, url=None, submission=None):
+    def __init__(self, reddit, term, config, oauth, url=None, submission=None,
+                 session=None):
+        """
+        Params:
+            session (dict): If given, the page is restored from a saved
+                session (see to_session()) instead of the url or submission.
+        """
         super(SubmissionPage, self).__init__(reddit, term, config, oauth)
 
         self.controller = SubmissionController(self, keymap=config.keymap)
 
-        if url:
+        snapshot = None
+        if session is not None:
+            url, snapshot = session['url'], session['content']
+        elif url and self.snapshots is not None:
+            snapshot = self.snapshots.get(url)
+
+        if snapshot is not None:
+            # Display the saved copy right away and replace it with the latest
+            # version once it has been downloaded
+            self.content = SubmissionContent(
+                None, term.loader, snapshot=snapshot,
+                max_comment_cols=config['max_comment_cols'])
+            load = partial(
+                SubmissionContent.from_url, reddit, url,
+                order=self.content.order,
+                max_comment_cols=config['max_comment_cols'],
+                expand_comments=config['expand_comments'])
+            if session is not None:
+                # Wait until the page is shown, see Page.wait()
+                self._resume = load
+            elif not config['offline']:
+                self.content.revalidate(load)
+        elif url:
             self.content = SubmissionContent.from_url(
                 reddit, url, term.loader,
-                max_comment_cols=config['max_comment_cols'])
+                max_comment_cols=config['max_comment_cols'],
+                expand_comments=config['expand_comments'])
         else:
             self.content = SubmissionContent(
                 submission, term.loader,
-                max_comment_cols=config['max_comment_cols'])
+                max_comment_cols=config['max_comment_cols'],
+                expand_comments=config['expand_comments'])
 
         # Start at the submission post, which is indexed as -1
-        self.nav = Navigator(self.content.get, page_index=-1)
+        if session is not None:
+            self.nav = self._restore_nav(session['nav'], page_index=-1)
+        else:
+            self.nav = Navigator(self.content.get, page_index=-1)
+
+    def close(self):
+        self._save_snapshot()
+
+    def to_session(self):
+        return self._session_state(url=self.content.name)
+
+    def _save_snapshot(self):
+        """
+        Save a copy of the thread, unless it was restored from a snapshot and
+        the latest version hasn't loaded yet. The comments that haven't been
+        displayed are stripped when the snapshot is written, on a background
+        thread.
+        """
+        if self.snapshots is None or self.content.saved_at:
+            return
+        self.snapshots.submit(self.content.to_snapshot(strip=False),
+                              prepare=SubmissionContent.finish_snapshot)
+
+    def _update_content(self):
+        changed = super(SubmissionPage, self)._update_content()
+        if changed:
+            if self.nav.absolute_index > self.content.range[1]:
+                # The latest version of a thread that was displayed from a
+                # snapshot can have fewer comments than the saved copy
+                self.nav = Navigator(self.content.get, page_index=-1)
+        return changed
 
     def refresh_content(self, order=None, name=None):
         """
@@ -49,7 +111,8 @@ class SubmissionPage(Page):
         with self.term.loader('Refreshing page'):
             self.content = SubmissionContent.from_url(
                 self.reddit, url, self.term.loader, order=order,
-                max_comment_cols=self.config['max_comment_cols'])
+                max_comment_cols=self.config['max_comment_cols'],
+                expand_comments=self.config['expand_comments'])
         if not self.term.loader.exception:
             self.nav = Navigator(self.content.get, page_index=-1)
 
@@ -85,9 +148,10 @@ class SubmissionPage(Page):
         # want to make sure that when we re-draw the page, the cursor stays at
         # its current absolute position on the screen. In order to do this,
         # apply a fixed offset if, while inverted, we either try to hide the
-        # bottom comment or toggle any of the middle comments.
-        if self.nav.inverted:
-            data = self.content.get(current_index)
+        # bottom comment or toggle any of the middle comments. Comments that
+        # are still loading in the background don't change size yet.
+        data = self.content.get(current_index)
+        if self.nav.inverted and not data.get('loading'):
             if data['hidden'] or self.nav.cursor_index != 0:
                 window = self._subwindows[-1][0]
                 n_rows, _ = window.getmaxyx()
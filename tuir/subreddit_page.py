@@ -3,6 +3,8 @@ from __future__ import unicode_literals
 
 import re
 import time
+import curses
+from functools import partial
 
 try:
     from urllib.parse import urlparse
@@ -11,6 +13,7 @@ except ImportError:
 
 from . import docs
 from .content import SubredditContent
+from .display import textual_width
 from .page import Page, PageController, logged_in
 from .objects import Navigator, Command
 from .exceptions import TemporaryFileError
@@ -31,20 +34,45 @@ class SubredditPage(Page):
     FORMAT_LIST = ''
     name = 'subreddit'
 
-    def __init__(self, reddit, term, config, oauth, name):
+    def __init__(self, reddit, term, config, oauth, name=None, session=None):
         """
         Params:
             name (string): Name of subreddit to open
+            session (dict): If given, the page is restored from a saved
+                session (see to_session()) instead of opening `name`.
         """
         super(SubredditPage, self).__init__(reddit, term, config, oauth)
 
         self.controller = SubredditController(self, keymap=config.keymap)
-        self.content = SubredditContent.from_name(reddit, self.config, name, term.loader)
-        self.nav = Navigator(self.content.get)
+        if session is not None:
+            # Display the saved copy right away, the latest version is
+            # downloaded when the page is first shown, see Page.wait()
+            snapshot = session['content']
+            self.content = SubredditContent(
+                self.config, snapshot['name'], iter(()), term.loader,
+                order=snapshot['order'], query=snapshot['query'],
+                snapshot=snapshot, handler=reddit.handler)
+            self._resume = partial(
+                SubredditContent.from_name, reddit, self.config,
+                snapshot['name'], order=snapshot['order'],
+                query=snapshot['query'])
+            self.nav = self._restore_nav(session['nav'])
+        else:
+            if config['offline']:
+                self.content = SubredditContent.from_snapshots(
+                    self.config, self.snapshots, term.loader)
+            else:
+                self.content = SubredditContent.from_name(
+                    reddit, self.config, name, term.loader)
+            self.nav = Navigator(self.content.get)
         self.toggled_subreddit = None
 
         self.FORMAT_LIST = self._create_format_list()
 
+        # Compiled versions of FORMAT_LIST, see _get_format_renderer()
+        self._renderers = {}
+        self._renderer_theme = None
+
     # Split this out to a function mostly to simplify testing
     def _create_format_list(self):
         if self.config['subreddit_format']:
@@ -60,6 +88,9 @@ class SubredditPage(Page):
         else:
             return None
 
+    def to_session(self):
+        return self._session_state()
+
     def refresh_content(self, order=None, name=None):
         """
         Re-download all submissions and reset the page index
@@ -80,9 +111,13 @@ class SubredditPage(Page):
             order = None
 
         with self.term.loader('Refreshing page'):
-            self.content = SubredditContent.from_name(
-                self.reddit, self.config, name,
-                self.term.loader, order=order, query=query)
+            if self.config['offline']:
+                self.content = SubredditContent.from_snapshots(
+                    self.config, self.snapshots, self.term.loader)
+            else:
+                self.content = SubredditContent.from_name(
+                    self.reddit, self.config, name,
+                    self.term.loader, order=order, query=query)
         if not self.term.loader.exception:
             self.nav = Navigator(self.content.get)
 
@@ -240,20 +275,17 @@ class SubredditPage(Page):
         data = self.get_selected_item()
         if not hasattr(data["object"], 'hide'):
             self.term.flash()
-        elif data['hidden']:
-            with self.term.loader('Unhiding'):
-                data['object'].unhide()
-                data['hidden'] = False
         else:
-            with self.term.loader('Hiding'):
-                data['object'].hide()
-                data['hidden'] = True
+            self.writes.submit(data, 'hidden', not data['hidden'])
 
-    def _submission_attr(self, data):
-        if data['url_full'] in self.config.history:
-            return self.term.attr('SubmissionTitleSeen')
-        else:
-            return self.term.attr('SubmissionTitle')
+    def _draw_content(self):
+        super(SubredditPage, self)._draw_content()
+
+        # Start looking up the media links that are on the screen, so they
+        # can be opened right away
+        self.term.prefetch_mimetypes([
+            data['url_full'] for _, data, _ in self._subwindows
+            if data['url_type'] == 'external'])
 
     def _url_str(self, data):
         # Both of these url_types indicate a URL of a subreddit/comment, and
@@ -264,233 +296,226 @@ class SubredditPage(Page):
         else:
             return urlparse(data['url_full']).hostname
 
-    def _url_attr(self, data):
-        if data['url_full'] in self.config.history:
-            return self.term.attr('LinkSeen')
-        else:
-            return self.term.attr('Link')
+    def _get_format_renderer(self):
+        """
+        Return the compiled version of FORMAT_LIST for the current theme.
 
-    def _gold_str(self, data):
-        if data['gold'] > 1:
-            return self.term.gilded + 'x{}'.format(data['gold'])
-        elif data['gold'] == 1:
-            return self.term.gilded
-        else:
-            return ''
+        The theme attributes are looked up when the format is compiled, so a
+        separate renderer is needed for the selected and unselected versions
+        of each item. All of them are thrown away when the theme changes.
+        """
+        theme = self.term.theme
+        if self._renderer_theme is not theme:
+            self._renderers = {}
+            self._renderer_theme = theme
+
+        key = (theme.selected, self.config['ascii'])
+        renderer = self._renderers.get(key)
+        if renderer is None:
+            renderer = self._compile_format(self.FORMAT_LIST)
+            self._renderers[key] = renderer
+        return renderer
+
+    def _compile_format(self, format_list):
+        """
+        Turn each item in the format list into a function that draws it.
+
+        Returns a list of (draw, is_space) tuples, where draw is None for a
+        newline. Each draw function is called as
+        draw(win, data, row, col, max_cols) and returns True if it printed
+        anything other than a space.
+        """
+        term = self.term
+        clean, add_line, add_space = term.clean, term.add_line, term.add_space
+        config = self.config
+
+        def put(win, text, row, col, max_cols, attr, cleaned=None, width=0):
+            # Same as Terminal.add_line(), but text that never changes can be
+            # cleaned ahead of time
+            if col is None:
+                col = win.getyx()[1]
+            n_cols = max_cols - col - 1
+            if n_cols <= 0:
+                return
+            try:
+                if cleaned is None or width > n_cols:
+                    cleaned = clean(text, n_cols)
+                if attr is None:
+                    win.addstr(row, col, cleaned)
+                else:
+                    win.addstr(row, col, cleaned, attr)
+            except (curses.error, ValueError, TypeError):
+                # Let add_line() log the error
+                add_line(win, text, row, col, attr)
+
+        def constant(text):
+            return text, clean(text), textual_width(text)
+
+        def field(get_text, attr=None, get_attr=None):
+            def draw(win, data, row, col, max_cols):
+                put(win, get_text(data), row, col, max_cols,
+                    get_attr(data) if get_attr else attr)
+                return True
+            return draw
+
+        title_attrs = (term.attr('SubmissionTitle'),
+                       term.attr('SubmissionTitleSeen'))
+        link_attrs = (term.attr('Link'), term.attr('LinkSeen'))
+
+        def title_attr(data):
+            return title_attrs[data['url_full'] in config.history]
+
+        def url_attr(data):
+            return link_attrs[data['url_full'] in config.history]
+
+        arrows = {}
+        for likes in (None, True, False):
+            arrow, attr = term.get_arrow(likes)
+            arrows[likes] = constant(arrow) + (attr,)
+
+        def draw_vote(win, data, row, col, max_cols):
+            likes = data['likes']
+            text, cleaned, width, attr = arrows[
+                None if likes is None else bool(likes)]
+            put(win, text, row, col, max_cols, attr, cleaned, width)
+            return True
+
+        gilded = term.gilded
+
+        def gold_str(data):
+            if data['gold'] > 1:
+                return gilded + 'x{}'.format(data['gold'])
+            elif data['gold'] == 1:
+                return gilded
+            else:
+                return ''
+
+        def flag(check, get_text, attr):
+            def draw(win, data, row, col, max_cols):
+                if not check(data):
+                    return False
+                put(win, get_text(data), row, col, max_cols, attr)
+                return True
+            return draw
+
+        def flag_text(text, attr):
+            text, cleaned, width = constant(text)
+
+            def draw(win, data, row, col, max_cols):
+                put(win, text, row, col, max_cols, attr, cleaned, width)
+            return draw
+
+        # The flags drawn by %F, in order
+        flags = [
+            ('flair', field(lambda data: data['flair'],
+                            term.attr('SubmissionFlair'))),
+            ('saved', flag_text('[saved]', term.attr('Saved'))),
+            ('hidden', flag_text('[hidden]', term.attr('Hidden'))),
+            ('stickied', flag_text('[stickied]', term.attr('Stickied'))),
+            ('gold', field(gold_str, term.attr('Gold'))),
+            ('nsfw', flag_text('NSFW', term.attr('NSFW'))),
+        ]
+
+        def draw_flags(win, data, row, col, max_cols):
+            # Draw every flag that applies, with a space in between each one
+            present = [draw for key, draw in flags if data[key]]
+            for i, draw in enumerate(present):
+                if i:
+                    add_space(win)
+                draw(win, data, row, col, max_cols)
+            return bool(present)
+
+        def comment_count(data):
+            # Saved comments don't have a comment count
+            if data['comments'] is None:
+                return ''
+            return str(data['comments'])
+
+        def literal(text, attr):
+            text, cleaned, width = constant(text)
+            is_space = text == ' '
+
+            def draw(win, data, row, col, max_cols):
+                put(win, text, row, col, max_cols, attr, cleaned, width)
+                return not is_space
+            return draw
+
+        def check_flag(key, draw_text):
+            def draw(win, data, row, col, max_cols):
+                if not data[key]:
+                    return False
+                draw_text(win, data, row, col, max_cols)
+                return True
+            return draw
+
+        items = {
+            '%i': field(lambda data: str(data['index']), get_attr=title_attr),
+            '%t': field(lambda data: data['title'], get_attr=title_attr),
+            '%s': field(lambda data: str(data['score']),
+                        term.attr('Score')),
+            '%v': draw_vote,
+            '%c': field(comment_count, term.attr('CommentCount')),
+            '%r': field(lambda data: data['created'], term.attr('Created')),
+            '%R': field(lambda data: data['created_exact'],
+                        term.attr('Created')),
+            '%e': field(lambda data: data['edited'], term.attr('Created')),
+            '%E': field(lambda data: data['edited_exact'],
+                        term.attr('Created')),
+            '%a': field(lambda data: data['author'],
+                        term.attr('SubmissionAuthor')),
+            '%S': field(lambda data: '/r/' + data['subreddit'],
+                        term.attr('SubmissionSubreddit')),
+            '%u': field(self._url_str, get_attr=url_attr),
+            '%U': field(lambda data: data['url'], get_attr=url_attr),
+            '%f': check_flag(*flags[0]),
+            '%A': check_flag(*flags[1]),
+            '%h': check_flag(*flags[2]),
+            '%T': check_flag(*flags[3]),
+            '%g': flag(lambda data: data['gold'] > 0, gold_str,
+                       term.attr('Gold')),
+            '%n': check_flag(*flags[5]),
+            '%F': draw_flags,
+        }
+
+        renderer = []
+        for item in format_list:
+            if item == '\n':
+                renderer.append((None, False))
+            elif item in items:
+                renderer.append((items[item], False))
+            else:
+                # Write something else that isn't in the data dict. Certain
+                # "separator" characters use the Separator attribute.
+                if item in self.FORMAT_SEP:
+                    attr = term.attr('Separator')
+                else:
+                    attr = None
+                renderer.append((literal(item, attr), item == ' '))
+        return renderer
 
     def _draw_item_format(self, win, data, valid_rows, offset):
         first = True
+        max_cols = win.getmaxyx()[1]
 
         # Remember whether or not the last character printed was a space. If it
         # was, printing more spaces should be avoided.
         last_was_space = False
 
-        for item in self.FORMAT_LIST:
-            col = 1 if first else None
-
-            # We don't want to print consecutive spaces, so check if a space
-            # was the last character printed, and skip this iteration if a
-            # space is to be printed
-            if last_was_space and item == ' ':
-                # coverage reports this as never executing, despite
-                # test_subreddit_page__draw_item_format testing for it, and pdb
-                # confirming the line is executed
-                continue
-
-            last_was_space = True
-
-            if item == "%i":
-                self.term.add_line(win, str(data['index']),
-                                   row=offset, col=col,
-                                   attr=self._submission_attr(data))
-                last_was_space = False
-            elif item == "%t":
-                self.term.add_line(win, data['title'],
-                                   row=offset, col=col,
-                                   attr=self._submission_attr(data))
-                last_was_space = False
-            elif item == "%s":
-                self.term.add_line(win, str(data['score']),
-                                   row=offset, col=col,
-                                   attr=self.term.attr('Score'))
-                last_was_space = False
-            elif item == "%v":
-                arrow = self.term.get_arrow(data['likes'])
-
-                self.term.add_line(win, arrow[0],
-                                   row=offset, col=col,
-                                   attr=arrow[1])
-                last_was_space = False
-            elif item == "%c":
-                self.term.add_line(win, data['comments'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('CommentCount'))
-                last_was_space = False
-            elif item == "%r":
-                self.term.add_line(win, data['created'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('Created'))
-                last_was_space = False
-            elif item == "%R":
-                self.term.add_line(win, data['created_exact'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('Created'))
-                last_was_space = False
-            elif item == "%e":
-                self.term.add_line(win, data['edited'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('Created'))
-                last_was_space = False
-            elif item == "%E":
-                self.term.add_line(win, data['edited_exact'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('Created'))
-                last_was_space = False
-            elif item == "%a":
-                self.term.add_line(win, data['author'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('SubmissionAuthor'))
-                last_was_space = False
-            elif item == "%S":
-                self.term.add_line(win, "/r/" + data['subreddit'],
-                                   row=offset, col=col,
-                                   attr=self.term.attr('SubmissionSubreddit'))
-                last_was_space = False
-            elif item == "%u":
-                self.term.add_line(win, self._url_str(data),
-                                   row=offset, col=col,
-                                   attr=self._url_attr(data))
-                last_was_space = False
-            elif item == "%U":
-                self.term.add_line(win, data['url'],
-                                   row=offset, col=col,
-                                   attr=self._url_attr(data))
-                last_was_space = False
-            elif item == "%A":
-                if data['saved']:
-                    self.term.add_line(win, '[saved]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Saved'))
-
-                    last_was_space = False
-            elif item == "%h":
-                if data['hidden']:
-                    self.term.add_line(win, '[hidden]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Hidden'))
-
-                    last_was_space = False
-            elif item == "%T":
-                if data['stickied']:
-                    self.term.add_line(win, '[stickied]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Stickied'))
-
-                    last_was_space = False
-            elif item == "%g":
-                if data['gold'] > 0:
-                    self.term.add_line(win, self._gold_str(data),
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Gold'))
-                    last_was_space = False
-
-            elif item == "%n":
-                if data['nsfw']:
-                    self.term.add_line(win, 'NSFW',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('NSFW'))
-
-                    last_was_space = False
-            elif item == "%f":
-                if data['flair']:
-                    self.term.add_line(win, data['flair'],
-                                       row=offset, col=col,
-                                       attr=self.term.attr('SubmissionFlair'))
-
-                    last_was_space = False
-            elif item == "%F":
-                if data['flair']:
-                    self.term.add_line(win, data['flair'],
-                                       row=offset, col=col,
-                                       attr=self.term.attr('SubmissionFlair'))
-
-                    # These ugly if's write a space if necessary. It is
-                    # necessary if there are more flairlike strings to write.
-                    if (data['saved'] or data['hidden'] or
-                        data['stickied'] or data['gold'] or
-                        data['nsfw']):
-                        self.term.add_space(win)
-
-                    last_was_space = False
-
-                if data['saved']:
-                    self.term.add_line(win, '[saved]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Saved'))
-
-                    if (data['hidden'] or data['stickied'] or
-                        data['gold'] or data['nsfw']):
-                        self.term.add_space(win)
-
-                    last_was_space = False
-
-                if data['hidden']:
-                    self.term.add_line(win, '[hidden]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Hidden'))
-
-                    if (data['stickied'] or data['gold'] or
-                        data['nsfw']):
-                        self.term.add_space(win)
-
-                    last_was_space = False
-
-                if data['stickied']:
-                    self.term.add_line(win, '[stickied]',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Stickied'))
-
-                    if data['gold'] or data['nsfw']:
-                        self.term.add_space(win)
-
-                    last_was_space = False
-
-                if data['gold']:
-                    self.term.add_line(win, self._gold_str(data),
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Gold'))
-
-                    if data['nsfw']:
-                        self.term.add_space(win)
-
-                    last_was_space = False
-
-                if data['nsfw']:
-                    self.term.add_line(win, 'NSFW',
-                                       row=offset, col=col,
-                                       attr=self.term.attr('NSFW'))
-
-                    last_was_space = False
-            elif item == "\n":
+        for draw, is_space in self._get_format_renderer():
+            if draw is None:
                 first = True
                 offset += 1
-
+                last_was_space = True
                 continue
-            else: # Write something else that isn't in the data dict
-                # Make certain "separator" characters use the Separator
-                # attribute
-                if item in self.FORMAT_SEP:
-                    self.term.add_line(win, item,
-                                       row=offset, col=col,
-                                       attr=self.term.attr('Separator'))
-                else:
-                    self.term.add_line(win, item,
-                                       row=offset, col=col,
-                                       attr=None)
 
-                if item != ' ':
-                    last_was_space = False
+            # We don't want to print consecutive spaces, so check if a space
+            # was the last character printed, and skip this item if a space is
+            # to be printed
+            if last_was_space and is_space:
+                continue
 
+            printed = draw(win, data, offset, 1 if first else None, max_cols)
+            last_was_space = not printed
             first = False
 
     def _draw_item_default(self, win, data, n_rows, n_cols, valid_rows, offset):
@@ -14,17 +14,17 @@ import webbrowser
 import subprocess
 import curses.ascii
 from curses import textpad
-from multiprocessing import Process
 from contextlib import contextmanager
 from tempfile import NamedTemporaryFile
+from collections import OrderedDict
 
 import six
-from kitchen.text.display import textual_width_chop
 
-from . import exceptions, mime_parsers, content
+from . import exceptions, content
+from .display import textual_width_chop
 from .docs import TOKEN
 from .theme import Theme, ThemeList
-from .objects import LoadScreen
+from .objects import LoadScreen, MimeQueue
 
 try:
     # Fix only needed for versions prior to python 3.6
@@ -48,6 +48,9 @@ class Terminal(object):
     MIN_HEIGHT = 10
     MIN_WIDTH = 20
 
+    # Number of strings to remember in Terminal.clean()
+    CLEAN_CACHE_SIZE = 4096
+
     # ASCII codes
     ESCAPE = 27
     RETURN = 10
@@ -60,14 +63,28 @@ class Terminal(object):
         self.loader = LoadScreen(self)
         self.theme = None  # Initialized by term.set_theme()
         self.theme_list = ThemeList()
+        # Results of the MIME parsers, see cache.MimeCache
+        self.mime_cache = None
+        self.mime_queue = MimeQueue(self.resolve_mimetype)
 
         self._display = None
+        self._clean_cache = OrderedDict()
         self._mailcap_dict = self._load_mailcaps()
         self._term = os.environ.get('TERM')
 
+    @property
+    def mime_parsers(self):
+        """
+        The MIME parsers are imported the first time that a link is opened,
+        they pull in BeautifulSoup which is slow to load on startup.
+        """
+        from . import mime_parsers
+
         # This is a hack, the MIME parsers should be stateless
         # but we need to load the imgur credentials from the config
-        mime_parsers.ImgurApiMIMEParser.CLIENT_ID = config['imgur_client_id']
+        client_id = self.config['imgur_client_id']
+        mime_parsers.ImgurApiMIMEParser.CLIENT_ID = client_id
+        return mime_parsers
 
     def _load_mailcaps(self):
         mailcap_file = self.config.MAILCAP
@@ -264,11 +281,26 @@ class Terminal(object):
             &amp;amp; -> returned directly from reddit's api
             &amp;     -> returned after PRAW decodes the html characters
             &         -> returned after our second pass, this is the true value
+
+        The same strings are drawn over and over again on every refresh, so
+        the most recent results are kept in an LRU cache.
         """
 
         if n_cols is not None and n_cols <= 0:
             return ''
 
+        key = (string, n_cols, self.config['ascii'])
+        try:
+            retval = self._clean_cache.pop(key)
+        except KeyError:
+            retval = self._clean(string, n_cols)
+            if len(self._clean_cache) >= self.CLEAN_CACHE_SIZE:
+                self._clean_cache.popitem(last=False)
+        self._clean_cache[key] = retval
+        return retval
+
+    def _clean(self, string, n_cols):
+
         if isinstance(string, six.text_type):
             string = unescape(string)
 
@@ -556,37 +588,75 @@ class Terminal(object):
             entry (dict): The full mailcap entry for the corresponding command
         """
 
-        for parser in mime_parsers.parsers:
+        # The url may have already been looked up in the background
+        self.mime_queue.wait(url)
+        try:
+            modified_url, content_type = self.resolve_mimetype(url)
+        except Exception as e:
+            # If Imgur decides to change its html layout, let it fail
+            # silently in the background instead of crashing.
+            _logger.warning('MIME parser for %s raised an exception', url)
+            _logger.exception(e)
+            raise exceptions.MailcapEntryNotFound()
+        if not content_type:
+            _logger.info('Content type could not be determined')
+            raise exceptions.MailcapEntryNotFound()
+        elif content_type == 'text/html':
+            _logger.info('Content type text/html, deferring to browser')
+            raise exceptions.MailcapEntryNotFound()
+
+        command, entry = mailcap.findmatch(
+            self._mailcap_dict, content_type, filename=modified_url)
+        if not entry:
+            _logger.info('Could not find a valid mailcap entry')
+            raise exceptions.MailcapEntryNotFound()
+
+        return command, entry
+
+    def resolve_mimetype(self, url):
+        """
+        Run the url through the first MIME parser that matches it. The result
+        is saved to the mime_cache, unless it only came from the file
+        extension, which doesn't need a request to check.
+
+        Params:
+            url (text): URL that will be checked
+
+        Returns:
+            modified_url (text): The url (or filename) to open with the
+                mailcap command. It may be the same as the original url, but
+                it could also be updated to point to a different page.
+            content_type (text): The mime-type, or None if no parser matched
+                the url or the type couldn't be determined.
+        """
+        if self.mime_cache is not None:
+            cached = self.mime_cache.get(url)
+            if cached is not None:
+                _logger.debug('MIME cache hit: %s', url)
+                return cached
+
+        for parser in self.mime_parsers.parsers:
             if parser.pattern.match(url):
-                # modified_url may be the same as the original url, but it
-                # could also be updated to point to a different page, or it
-                # could refer to the location of a temporary file with the
-                # page's downloaded content.
-                try:
-                    modified_url, content_type = parser.get_mimetype(url)
-                except Exception as e:
-                    # If Imgur decides to change its html layout, let it fail
-                    # silently in the background instead of crashing.
-                    _logger.warning('parser %s raised an exception', parser)
-                    _logger.exception(e)
-                    raise exceptions.MailcapEntryNotFound()
-                if not content_type:
-                    _logger.info('Content type could not be determined')
-                    raise exceptions.MailcapEntryNotFound()
-                elif content_type == 'text/html':
-                    _logger.info('Content type text/html, deferring to browser')
-                    raise exceptions.MailcapEntryNotFound()
-
-                command, entry = mailcap.findmatch(
-                    self._mailcap_dict, content_type, filename=modified_url)
-                if not entry:
-                    _logger.info('Could not find a valid mailcap entry')
-                    raise exceptions.MailcapEntryNotFound()
-
-                return command, entry
-
-        # No parsers matched the url
-        raise exceptions.MailcapEntryNotFound()
+                modified_url, content_type = parser.get_mimetype(url)
+                break
+        else:
+            return url, None
+
+        if (self.mime_cache is not None and
+                parser is not self.mime_parsers.BaseMIMEParser):
+            self.mime_cache.set(url, modified_url, content_type)
+        return modified_url, content_type
+
+    def prefetch_mimetypes(self, urls):
+        """
+        Look up the given media links in the background, if the mime_prefetch
+        option is enabled. Replaces any links that are still waiting from the
+        last call. This is called on every draw, so the mime_cache is only
+        checked by the background thread.
+        """
+        if self.mime_cache is None or not self.config['mime_prefetch']:
+            return
+        self.mime_queue.submit(urls)
 
     def open_browser(self, url):
         """
@@ -646,6 +716,8 @@ class Terminal(object):
                         os.dup2(stdout, 1)
                         os.dup2(stderr, 2)
 
+                from multiprocessing import Process
+
                 p = Process(target=open_url_silent, args=(url,))
                 p.start()
                 # Give the browser 7 seconds to open a new tab. Because the
@@ -988,11 +1060,12 @@ class Terminal(object):
     def attr(self, element):
         """
         Shortcut for fetching the color + attribute code for an element.
-        """
-        # The theme must be initialized before calling this
-        assert self.theme is not None
 
-        return self.theme.get(element)
+        This is called for every string that's drawn, so it reads the table
+        that was built by Theme.bind_curses() directly instead of going
+        through Theme.get().
+        """
+        return self.theme.attributes[element]
 
     @staticmethod
     def check_theme(theme):
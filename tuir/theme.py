@@ -157,8 +157,14 @@ class Theme(object):
 
         self._color_pair_map = None
         self._attribute_map = None
+        self._selected_map = None
         self._selected = None
 
+        # The table of resolved curses attributes that get() and
+        # Terminal.attr() read from, either the normal or the selected
+        # attribute map depending on if turn_on_selected() is active
+        self.attributes = None
+
         self.required_color_pairs = 0
         self.required_colors = 0
 
@@ -218,6 +224,13 @@ class Theme(object):
                     self.required_colors = marker
                     break
 
+    @property
+    def selected(self):
+        """
+        True while inside of a turn_on_selected() block.
+        """
+        return bool(self._selected)
+
     @property
     def display_string(self):
         return '{0} ({1})'.format(self.name, self.source)
@@ -233,6 +246,7 @@ class Theme(object):
         """
         self._color_pair_map = {}
         self._attribute_map = {}
+        self._selected_map = {}
 
         for element, item in self.elements.items():
             fg, bg, attrs = item
@@ -250,19 +264,26 @@ class Theme(object):
                 attrs |= self._color_pair_map[color_pair]
 
             self._attribute_map[element] = attrs
+            if element.startswith('@'):
+                # The selected version of the element is looked up under the
+                # element's plain name, so get() doesn't need to build the
+                # "@" prefixed key every time an item is highlighted
+                self._selected_map[element[1:]] = attrs
+
+        self.attributes = self._selected_map if self._selected else \
+            self._attribute_map
 
     def get(self, element, selected=False):
         """
         Returns the curses attribute code for the given element.
         """
-        if self._attribute_map is None:
+        if self.attributes is None:
             raise RuntimeError('Attempted to access theme attribute before '
                                'calling initialize_curses_theme()')
 
-        if selected or self._selected:
-            element = '@{0}'.format(element)
-
-        return self._attribute_map[element]
+        if selected:
+            return self._selected_map[element]
+        return self.attributes[element]
 
     @contextmanager
     def turn_on_selected(self):
@@ -284,10 +305,12 @@ class Theme(object):
         assert self._selected is None
 
         self._selected = True
+        self.attributes = self._selected_map
         try:
             yield
         finally:
             self._selected = None
+            self.attributes = self._attribute_map
 
     @classmethod
     def list_themes(cls, path=Config.THEMES):
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+The HTTP session that is shared by everything in tuir that talks to the
+network.
+
+Reddit API requests and the MIME parsers that look up media links both go
+through the same connection pool, so a server that has already been
+contacted once during the session doesn't need a new TCP connection and TLS
+handshake for every request.
+"""
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+
+_lock = threading.Lock()
+_session = None
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Create a new requests session that keeps up to `pool_size` connections
+    alive for each host, and up to `pool_size` hosts at a time.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the shared session, creating it with the default pool size if it
+    hasn't been configured yet.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+def configure(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Replace the shared session with one that uses the given pool size.
+    """
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = build_session(pool_size)
+        return _session
+
+
+def connection_stats(session=None):
+    """
+    Return the number of requests and the number of new connections that have
+    been made to each host that is still in the connection pool.
+
+    Returns:
+        stats (dict): A mapping of "scheme://host:port" to a tuple of
+            (n_requests, n_connections). Any requests beyond the number of
+            connections were able to reuse a kept-alive connection.
+    """
+    session = session or get_session()
+
+    stats = {}
+    for adapter in set(session.adapters.values()):
+        pools = getattr(adapter, 'poolmanager', None)
+        if pools is None:
+            continue
+        for key in pools.pools.keys():
+            pool = pools.pools.get(key)
+            if pool is None:
+                continue
+            host = '{0}://{1}:{2}'.format(pool.scheme, pool.host, pool.port)
+            n_requests, n_connections = stats.get(host, (0, 0))
+            stats[host] = (n_requests + pool.num_requests,
+                           n_connections + pool.num_connections)
+    return stats
+
+
+def log_connection_stats(session=None):
+    """
+    Write the connection reuse statistics for each host to the log.
+    """
+    for host, (n_requests, n_connections) in sorted(
+            connection_stats(session).items()):
+        _logger.info('Connections to %s: %s requests, %s new connections',
+                     host, n_requests, n_connections)